@@ -5,6 +5,7 @@ Identifica problemas de tipos mistos e dados inconsistentes
 import pandas as pd
 import sys
 from pathlib import Path
+from carregamento import carregar_planilha, compactar_tipos, consolidar_dados, relatorio_memoria
 
 def analisar_planilha(caminho_arquivo):
     """
@@ -16,34 +17,18 @@ def analisar_planilha(caminho_arquivo):
     print(f"\n📁 Arquivo: {caminho_arquivo}\n")
     
     try:
-        # Ler todas as abas
-        xls = pd.ExcelFile(caminho_arquivo)
-        print(f"📊 Total de abas: {len(xls.sheet_names)}")
-        print(f"📋 Abas encontradas: {', '.join(xls.sheet_names)}\n")
-        
-        # Consolidar dados (mesmo processo do dashboard)
-        dados_consolidados = []
-        
-        for aba in xls.sheet_names:
-            if aba.startswith("Dia"):
-                try:
-                    df = pd.read_excel(xls, sheet_name=aba)
-                    df['Dia'] = aba
-                    dados_consolidados.append(df)
-                    print(f"✅ Aba '{aba}': {len(df)} registros")
-                except Exception as e:
-                    print(f"❌ Erro ao ler aba '{aba}': {e}")
-        
-        if not dados_consolidados:
+        # Ler todas as abas "Dia" pelo carregador comum, com os valores como estão na planilha
+        try:
+            df_consolidado, todas_abas, mes_do_arquivo = carregar_planilha(caminho_arquivo, consolidar=False, ignorar_erros=True)
+        except ValueError:
             print("\n⚠️ Nenhuma aba 'Dia' encontrada!")
             return
         
-        # Concatenar todos
-        df_consolidado = pd.concat(dados_consolidados, ignore_index=True)
+        print(f"📊 Total de abas: {len(todas_abas)}")
+        print(f"📋 Abas encontradas: {', '.join(todas_abas)}\n")
         
-        # Remover Unnamed: 0 se existir
-        if 'Unnamed: 0' in df_consolidado.columns:
-            df_consolidado = df_consolidado.drop(columns=['Unnamed: 0'])
+        for aba, quantidade in df_consolidado['Dia'].value_counts(sort=False).items():
+            print(f"✅ Aba '{aba}': {quantidade} registros")
         
         print(f"\n{'=' * 80}")
         print("📊 ESTATÍSTICAS GERAIS")
@@ -199,42 +184,55 @@ def analisar_planilha(caminho_arquivo):
         print("📋 ANÁLISE POR ABA (para identificar origem do problema)")
         print("=" * 80)
         
-        for aba in xls.sheet_names:
-            if aba.startswith("Dia"):
-                try:
-                    df_aba = pd.read_excel(xls, sheet_name=aba)
-                    # Verificar se 'Especialidade' existe (pode estar como string ou int)
-                    coluna_esp_aba = None
-                    for col in df_aba.columns:
-                        if str(col) == 'Especialidade':
-                            coluna_esp_aba = col
-                            break
+        # Os dados já estão em memória: separar por aba em vez de reler o arquivo
+        for aba, df_aba in df_consolidado.groupby('Dia', sort=False):
+            try:
+                # Verificar se 'Especialidade' existe (pode estar como string ou int)
+                coluna_esp_aba = None
+                for col in df_aba.columns:
+                    if str(col) == 'Especialidade':
+                        coluna_esp_aba = col
+                        break
+                
+                if coluna_esp_aba is not None:
+                    col_esp_aba = df_aba[coluna_esp_aba]
+                    tipos_aba = set()
                     
-                    if coluna_esp_aba is not None:
-                        col_esp_aba = df_aba[coluna_esp_aba]
-                        tipos_aba = set()
-                        
-                        for valor in col_esp_aba.dropna():
-                            tipos_aba.add(type(valor).__name__)
+                    for valor in col_esp_aba.dropna():
+                        tipos_aba.add(type(valor).__name__)
+                    
+                    print(f"\n📌 Aba: '{aba}'")
+                    # Converter tipos para string antes de ordenar
+                    tipos_str_aba = sorted([str(t) for t in tipos_aba])
+                    print(f"   Tipos encontrados: {', '.join(tipos_str_aba)}")
+                    
+                    if len(tipos_aba) > 1:
+                        print(f"   ⚠️ PROBLEMA: Esta aba tem tipos mistos!")
                         
-                        print(f"\n📌 Aba: '{aba}'")
-                        # Converter tipos para string antes de ordenar
-                        tipos_str_aba = sorted([str(t) for t in tipos_aba])
-                        print(f"   Tipos encontrados: {', '.join(tipos_str_aba)}")
+                        # Mostrar exemplos
+                        valores_int = [v for v in col_esp_aba.dropna() if isinstance(v, (int, float))]
+                        valores_str = [v for v in col_esp_aba.dropna() if isinstance(v, str)]
                         
-                        if len(tipos_aba) > 1:
-                            print(f"   ⚠️ PROBLEMA: Esta aba tem tipos mistos!")
-                            
-                            # Mostrar exemplos
-                            valores_int = [v for v in col_esp_aba.dropna() if isinstance(v, (int, float))]
-                            valores_str = [v for v in col_esp_aba.dropna() if isinstance(v, str)]
-                            
-                            if valores_int:
-                                print(f"      Valores numéricos: {valores_int[:5]}")
-                            if valores_str:
-                                print(f"      Valores string: {valores_str[:5]}")
-                except Exception as e:
-                    print(f"   ❌ Erro ao analisar aba '{aba}': {e}")
+                        if valores_int:
+                            print(f"      Valores numéricos: {valores_int[:5]}")
+                        if valores_str:
+                            print(f"      Valores string: {valores_str[:5]}")
+            except Exception as e:
+                print(f"   ❌ Erro ao analisar aba '{aba}': {e}")
+        
+        # ========== USO DE MEMÓRIA ==========
+        print("\n" + "=" * 80)
+        print("💾 USO DE MEMÓRIA (DataFrame do dashboard, antes e depois dos tipos compactos)")
+        print("=" * 80)
+        try:
+            df_texto = consolidar_dados(df_consolidado.copy(), mes_do_arquivo, compactar=False)
+            relatorio = relatorio_memoria(df_texto, compactar_tipos(df_texto.copy()))
+            print(relatorio.to_string(index=False))
+            total = relatorio.iloc[-1]
+            if total['Depois (KB)'] > 0:
+                print(f"\n   Redução: {total['Antes (KB)'] / total['Depois (KB)']:.1f}x")
+        except Exception as e:
+            print(f"   ❌ Erro ao calcular o uso de memória: {e}")
         
         # ========== RECOMENDAÇÃO ==========
         print("\n" + "=" * 80)
@@ -0,0 +1,107 @@
+"""
+Benchmark do cruzamento "passou pelo técnico"
+
+Compara a verificação linha a linha antiga (apply + filtro booleano em todos
+os técnicos para cada médico) com a junção por hash do módulo cruzamento,
+em dados sintéticos de tamanho crescente, e mostra o tempo por 1000
+atendimentos: na junção por hash ele fica praticamente constante
+(crescimento linear). A conferência dos resultados com a versão linha a
+linha fica nos testes (tests/test_cruzamento.py).
+
+No fim compara o tempo de avaliar 1 e 10 regras de percurso de uma vez
+(avaliar_regras): as chaves são codificadas uma vez só, então 10 regras
+custam pouco mais que uma.
+
+Uso: python benchmark_cruzamento.py [maior quantidade de atendimentos]
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from cruzamento import avaliar_regras, marcar_passou_pelo_tecnico
+
+# A versão linha a linha só é medida até este tamanho (cresce com o quadrado)
+LIMITE_POR_LINHA = 8000
+
+
+def gerar_atendimentos(quantidade, dias=22, semente=0):
+    """Gera atendimentos sintéticos de médicos e técnicos (metade de cada)"""
+    rng = np.random.default_rng(semente)
+    pacientes = max(quantidade // 4, 10)
+    df = pd.DataFrame({
+        'Número Prontuário': rng.integers(1, pacientes, quantidade),
+        'Dia_Atendimento': [f"Dia {dia:02d}" for dia in rng.integers(1, dias + 1, quantidade)],
+        'Tipo': rng.choice(['Médico', 'Técnico'], quantidade),
+    })
+    return df[df['Tipo'] == 'Médico'].copy(), df[df['Tipo'] == 'Técnico'].copy()
+
+
+def cruzar_por_linha(df_medicos, df_tecnicos):
+    """Implementação antiga, usada como referência"""
+    def verificar_passou_tecnico(row):
+        return len(df_tecnicos[
+            (df_tecnicos['Número Prontuário'] == row['Número Prontuário']) &
+            (df_tecnicos['Dia_Atendimento'] == row['Dia_Atendimento'])
+        ]) > 0
+
+    return df_medicos.apply(verificar_passou_tecnico, axis=1)
+
+
+def medir(funcao, *args):
+    """Executa a função e devolve (resultado, segundos)"""
+    inicio = time.perf_counter()
+    resultado = funcao(*args)
+    return resultado, time.perf_counter() - inicio
+
+
+def executar(maximo=1_000_000):
+    tamanhos = []
+    tamanho = 1000
+    while tamanho <= maximo:
+        tamanhos.append(tamanho)
+        tamanho *= 4
+
+    print(f"{'Atendimentos':>12} | {'Por linha (s)':>13} | {'Hash (s)':>9} | {'Hash ms/1000':>12}")
+    print("-" * 59)
+
+    for tamanho in tamanhos:
+        df_medicos, df_tecnicos = gerar_atendimentos(tamanho)
+        _, tempo_hash = medir(marcar_passou_pelo_tecnico, df_medicos, df_tecnicos)
+
+        if tamanho <= LIMITE_POR_LINHA:
+            _, tempo_linha = medir(cruzar_por_linha, df_medicos, df_tecnicos)
+            texto_linha = f"{tempo_linha:13.3f}"
+        else:
+            texto_linha = f"{'-':>13}"
+
+        print(f"{tamanho:>12,} | {texto_linha} | {tempo_hash:9.4f} | "
+              f"{tempo_hash / tamanho * 1_000_000:12.3f}")
+
+
+def executar_regras(tamanho, quantidade_regras=(1, 10), semente=0):
+    """Mede avaliar_regras com quantidades diferentes de regras"""
+    rng = np.random.default_rng(semente)
+    especialidades = [f"ESPECIALIDADE {indice}" for indice in range(11)]
+    df = pd.DataFrame({
+        'Número Prontuário': rng.integers(1, max(tamanho // 4, 10), tamanho),
+        'Dia_Atendimento': [f"Dia {dia:02d}" for dia in rng.integers(1, 23, tamanho)],
+        'Profissional': rng.choice([f"PROFISSIONAL {indice}" for indice in range(50)], tamanho),
+        'Especialidade': rng.choice(especialidades, tamanho),
+        'Status': 'ATENDIMENTO FINALIZADO',
+    })
+
+    print(f"\n{'Regras':>6} | {'Atendimentos':>12} | {'Tempo (s)':>9}")
+    print("-" * 34)
+    for quantidade in quantidade_regras:
+        regras = [(f"Regra {indice}", especialidades[indice + 1], especialidades[0])
+                  for indice in range(quantidade)]
+        _, tempo = medir(avaliar_regras, df, regras)
+        print(f"{quantidade:>6} | {tamanho:>12,} | {tempo:9.3f}")
+
+
+if __name__ == "__main__":
+    maximo = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    executar(maximo)
+    executar_regras(maximo)
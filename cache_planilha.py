@@ -0,0 +1,286 @@
+"""
+Cache em disco dos dados consolidados, indexado pelo hash SHA-256 do arquivo
+
+Guarda também as abas lidas individualmente, indexadas pela impressão digital
+de cada aba (ver leitor_xlsx.impressoes_abas), para que uma nova versão do
+mesmo arquivo só precise ler as abas novas ou alteradas, e uma cópia de cada
+arquivo enviado ao dashboard, indexada pelo hash (registrar_arquivo), para que
+as sessões guardem apenas o hash e não o conteúdo do arquivo.
+"""
+import hashlib
+import json
+import os
+import threading
+from io import BytesIO
+
+import pandas as pd
+import pyarrow as pa
+
+# Pasta onde ficam os arquivos de cache (pode ser alterada por variável de ambiente)
+PASTA_CACHE = os.environ.get('DASHBOARD_CACHE_DIR', '.cache_dados')
+
+# Incrementar sempre que o formato do DataFrame consolidado mudar,
+# para que caches antigos sejam ignorados
+VERSAO_CACHE = 5
+
+# Subpasta com as abas lidas individualmente
+PASTA_CACHE_ABAS = os.path.join(PASTA_CACHE, 'abas')
+
+# Subpasta com os arquivos enviados, um por hash
+PASTA_ARQUIVOS = os.path.join(PASTA_CACHE, 'arquivos')
+
+TAMANHO_BLOCO = 1024 * 1024
+
+
+def calcular_hash(arquivo):
+    """
+    Calcula o hash SHA-256 do conteúdo do arquivo
+
+    Args:
+        arquivo: bytes, caminho do arquivo ou objeto com método read()
+
+    Returns:
+        String hexadecimal com o hash
+    """
+    sha = hashlib.sha256()
+
+    if isinstance(arquivo, (bytes, bytearray)):
+        sha.update(arquivo)
+    elif isinstance(arquivo, (str, os.PathLike)):
+        with open(arquivo, 'rb') as f:
+            for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''):
+                sha.update(bloco)
+    else:
+        # Objeto tipo arquivo (UploadedFile, BytesIO): preservar a posição de leitura
+        posicao = arquivo.tell()
+        arquivo.seek(0)
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), b''):
+            sha.update(bloco)
+        arquivo.seek(posicao)
+
+    return sha.hexdigest()
+
+
+def _caminhos_cache(hash_arquivo):
+    """Retorna os caminhos do Parquet com os dados e do JSON com os metadados"""
+    base = os.path.join(PASTA_CACHE, f"{hash_arquivo}_v{VERSAO_CACHE}")
+    return base + '.parquet', base + '.json'
+
+
+def ler_metadados_cache(hash_arquivo):
+    """
+    Lê apenas os metadados do cache (abas e mês), sem carregar os dados
+
+    Returns:
+        Dicionário com 'abas', 'mes' e 'impressoes' ou None se não houver cache
+    """
+    caminho_dados, caminho_meta = _caminhos_cache(hash_arquivo)
+
+    if not (os.path.exists(caminho_dados) and os.path.exists(caminho_meta)):
+        return None
+
+    try:
+        with open(caminho_meta, encoding='utf-8') as f:
+            metadados = json.load(f)
+        metadados.setdefault('mes', None)
+        metadados.setdefault('impressoes', {})
+        return metadados
+    except Exception:
+        return None
+
+
+def ler_cache(hash_arquivo):
+    """
+    Lê o DataFrame consolidado do cache, se existir
+
+    Os metadados vêm do mesmo JSON lido aqui, sem uma segunda leitura que
+    poderia não encontrar o cache (ex.: apagado por outra sessão).
+
+    Returns:
+        Tupla (DataFrame, lista de abas, mês ou None) ou (None, None, None)
+        se não houver cache válido
+    """
+    caminho_dados, caminho_meta = _caminhos_cache(hash_arquivo)
+
+    if not (os.path.exists(caminho_dados) and os.path.exists(caminho_meta)):
+        return None, None, None
+
+    try:
+        with open(caminho_meta, encoding='utf-8') as f:
+            metadados = json.load(f)
+        df = pd.read_parquet(caminho_dados)
+        return df, metadados['abas'], metadados.get('mes')
+    except Exception:
+        # Cache corrompido ou incompatível: ignorar e reprocessar o arquivo
+        return None, None, None
+
+
+def salvar_cache(hash_arquivo, df, abas, mes=None, impressoes=None):
+    """
+    Salva o DataFrame consolidado, a lista de abas, o mês e as impressões
+    digitais das abas no cache
+
+    A gravação é feita em arquivos temporários e depois renomeada, para que
+    outra sessão nunca leia um cache pela metade.
+
+    Returns:
+        True se o cache foi salvo, False caso contrário
+    """
+    caminho_dados, caminho_meta = _caminhos_cache(hash_arquivo)
+
+    try:
+        os.makedirs(PASTA_CACHE, exist_ok=True)
+
+        temp_dados = f"{caminho_dados}.{os.getpid()}.tmp"
+        temp_meta = f"{caminho_meta}.{os.getpid()}.tmp"
+
+        df.to_parquet(temp_dados, index=False)
+        with open(temp_meta, 'w', encoding='utf-8') as f:
+            json.dump({'abas': list(abas), 'mes': mes, 'impressoes': impressoes or {}},
+                      f, ensure_ascii=False)
+
+        os.replace(temp_dados, caminho_dados)
+        os.replace(temp_meta, caminho_meta)
+        return True
+    except Exception:
+        # Ex.: coluna com tipos mistos que o Parquet não aceita. O cache é
+        # apenas uma otimização, então o carregamento segue normalmente.
+        for temp in (f"{caminho_dados}.{os.getpid()}.tmp", f"{caminho_meta}.{os.getpid()}.tmp"):
+            if os.path.exists(temp):
+                os.remove(temp)
+        return False
+
+
+def _caminho_cache_aba(impressao):
+    """Caminho do arquivo com os dados de uma aba lida"""
+    return os.path.join(PASTA_CACHE_ABAS, f"{impressao}_v{VERSAO_CACHE}.arrow")
+
+
+def _coluna_arrow(buffer):
+    """
+    Converte o buffer de uma coluna em um array Arrow sem mudar o tipo de nenhum valor
+
+    Coluna com um único tipo Python vira um array comum; com tipos mistos
+    (ex.: 123 e '123', datas e texto) vira uma união densa com um filho por
+    tipo, para que a inferência de tipos da aba (leitor_xlsx._inferir_tipo)
+    dê o mesmo resultado com os dados do cache.
+    """
+    tipos = list(dict.fromkeys(type(valor) for valor in buffer))
+    if len([tipo for tipo in tipos if tipo is not type(None)]) <= 1:
+        return pa.array(buffer)
+
+    codigos = {tipo: codigo for codigo, tipo in enumerate(tipos)}
+    filhos = [[] for _ in tipos]
+    tipos_linhas = []
+    posicoes = []
+    for valor in buffer:
+        codigo = codigos[type(valor)]
+        tipos_linhas.append(codigo)
+        posicoes.append(len(filhos[codigo]))
+        filhos[codigo].append(valor)
+
+    return pa.UnionArray.from_dense(pa.array(tipos_linhas, pa.int8()), pa.array(posicoes, pa.int32()),
+                                    [pa.array(filho) for filho in filhos])
+
+
+def ler_cache_aba(impressao):
+    """
+    Lê do cache os dados de uma aba já lida antes
+
+    Returns:
+        Tupla (nomes das colunas, buffers por coluna) ou None se não houver cache
+    """
+    caminho = _caminho_cache_aba(impressao)
+    if not os.path.exists(caminho):
+        return None
+
+    try:
+        with pa.memory_map(caminho) as f:
+            tabela = pa.ipc.open_file(f).read_all()
+        nomes = json.loads(tabela.schema.metadata[b'nomes'])
+        return nomes, [coluna.to_pylist() for coluna in tabela.columns]
+    except Exception:
+        return None
+
+
+def salvar_cache_aba(impressao, nomes, buffers):
+    """
+    Salva os dados de uma aba lida (nomes das colunas e buffers por coluna)
+
+    Os valores são guardados exatamente como vieram da planilha (inclusive
+    colunas com tipos mistos) em um arquivo Arrow IPC, com os nomes das
+    colunas em JSON nos metadados. A pasta de cache também recebe os arquivos
+    enviados ao dashboard, então o formato não pode executar código ao ser
+    lido (como o pickle executaria).
+
+    Returns:
+        True se o cache foi salvo, False caso contrário
+    """
+    caminho = _caminho_cache_aba(impressao)
+    temp = f"{caminho}.{os.getpid()}.tmp"
+
+    try:
+        tabela = pa.Table.from_arrays([_coluna_arrow(buffer) for buffer in buffers],
+                                      names=[str(i) for i in range(len(buffers))])
+        tabela = tabela.replace_schema_metadata({'nomes': json.dumps(nomes, ensure_ascii=False)})
+
+        os.makedirs(PASTA_CACHE_ABAS, exist_ok=True)
+        with pa.OSFile(temp, 'wb') as f, pa.ipc.new_file(f, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+        os.replace(temp, caminho)
+        return True
+    except Exception:
+        # Ex.: número maior que int64 ou nome de coluna que não vai para JSON
+        if os.path.exists(temp):
+            os.remove(temp)
+        return False
+
+
+def caminho_arquivo(hash_arquivo):
+    """
+    Caminho da cópia do arquivo registrado com este hash
+
+    Returns:
+        Caminho do arquivo ou None se ele não estiver registrado
+    """
+    caminho = os.path.join(PASTA_ARQUIVOS, f"{hash_arquivo}.xlsx")
+    return caminho if os.path.exists(caminho) else None
+
+
+def registrar_arquivo(arquivo):
+    """
+    Guarda uma cópia do arquivo enviado, com o nome igual ao hash do conteúdo
+
+    O conteúdo é lido em blocos uma única vez: o hash é calculado enquanto a
+    cópia é gravada. Um arquivo já registrado não é gravado de novo.
+
+    Args:
+        arquivo: Objeto tipo arquivo (UploadedFile, BytesIO) ou bytes
+
+    Returns:
+        Hash SHA-256 do arquivo, que identifica o arquivo em caminho_arquivo()
+    """
+    if isinstance(arquivo, (bytes, bytearray)):
+        arquivo = BytesIO(arquivo)
+
+    os.makedirs(PASTA_ARQUIVOS, exist_ok=True)
+    temp = os.path.join(PASTA_ARQUIVOS, f"recebendo.{os.getpid()}.{threading.get_ident()}.tmp")
+
+    sha = hashlib.sha256()
+    posicao = arquivo.tell()
+    arquivo.seek(0)
+    try:
+        with open(temp, 'wb') as f:
+            for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), b''):
+                sha.update(bloco)
+                f.write(bloco)
+        hash_arquivo = sha.hexdigest()
+
+        if caminho_arquivo(hash_arquivo) is None:
+            os.replace(temp, os.path.join(PASTA_ARQUIVOS, f"{hash_arquivo}.xlsx"))
+    finally:
+        arquivo.seek(posicao)
+        if os.path.exists(temp):
+            os.remove(temp)
+
+    return hash_arquivo
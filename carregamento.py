@@ -0,0 +1,298 @@
+"""
+Carregamento dos dados das abas "Dia" do Excel, usado pelo dashboard e pelos scripts
+
+carregar_planilha() devolve o DataFrame consolidado de um arquivo passando
+pelos caches (memória do processo, cache em disco do arquivo inteiro e cache
+por aba), então qualquer ferramenta que leia o mesmo arquivo aproveita o
+trabalho já feito pelas outras.
+"""
+import re
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from cache_planilha import calcular_hash, ler_cache, salvar_cache
+from leitor_xlsx import MESES, impressoes_abas, ler_planilha
+from cruzamento import CHAVES_PERCURSO, PERCURSOS, marcar_percursos
+from especialidades import classificar_especialidades
+from status_atendimento import consolidar_status, marcar_realizados
+
+# Quantidade de arquivos mantidos na memória do processo
+MAX_ARQUIVOS_MEMORIA = 4
+
+# (hash, consolidar, ignorar_erros) -> (DataFrame, abas, mês)
+_memoria = OrderedDict()
+
+# Colunas com poucos valores distintos, guardadas como categorias (códigos inteiros)
+COLUNAS_CATEGORICAS = ['Profissional', 'Especialidade', 'Status', 'Status_Consolidado', 'Mês']
+
+# A planilha só informa o mês: as datas são montadas neste ano (bissexto, para
+# aceitar 29 de fevereiro), então meses de anos diferentes não se distinguem
+ANO_REFERENCIA = 2000
+
+# Colunas calculadas na carga, ao lado de Status_Consolidado: papel da
+# especialidade (categoria) e indicadores booleanos
+COLUNAS_INDICADORES = ['Papel', 'Realizado'] + list(PERCURSOS)
+
+
+def extrair_dia_aba(nome_aba):
+    """Extrai o número do dia do nome da aba (ex: 'Dia 01' -> 1, 'Dia 24' -> 24)"""
+    match = re.search(r'[Dd]ia\s*(\d+)', nome_aba)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def adicionar_colunas_dia(df, coluna_aba='Dia'):
+    """
+    Adiciona Dia_Numero e Dia_Atendimento ('Dia 01') a partir do nome da aba
+
+    O dia é extraído uma vez por aba, não por linha. Abas sem número de dia
+    ficam com Dia_Numero vazio e Dia_Atendimento igual ao nome da aba.
+    """
+    abas = df[coluna_aba]
+    if isinstance(abas.dtype, pd.CategoricalDtype):
+        # Usar os valores da categoria, para que Dia_Numero/Dia_Atendimento não virem categorias
+        abas = abas.astype(object)
+
+    dias_por_aba = {aba: extrair_dia_aba(str(aba)) for aba in abas.unique()}
+    df['Dia_Numero'] = abas.map(dias_por_aba)
+    df['Dia_Atendimento'] = abas.map({
+        aba: f"Dia {dia_numero:02d}" if dia_numero else aba
+        for aba, dia_numero in dias_por_aba.items()
+    })
+    return df
+
+
+def adicionar_data_atendimento(df, coluna_aba='Dia'):
+    """
+    Adiciona Data_Atendimento: número do dia no ano (ex.: 1º de fevereiro -> 32)
+
+    Combina o dia da aba (extrair_dia_aba) com a coluna Mês, então a diferença
+    entre duas datas é a distância em dias, inclusive entre meses. Sem a coluna
+    Mês (ou sem nenhum mês identificado) vale só o dia; linhas de mês não
+    identificado no meio de outros meses ou de abas sem número de dia ficam vazias.
+    O cálculo é feito por aba e por mês distintos, não por linha.
+    """
+    codigo_aba, abas = pd.factorize(df[coluna_aba])
+    dia_por_aba = np.array([extrair_dia_aba(str(aba)) or np.nan for aba in abas] + [np.nan], dtype=float)
+    data = dia_por_aba[codigo_aba]
+
+    if 'Mês' in df.columns:
+        codigo_mes, meses = pd.factorize(df['Mês'])
+        inicio_por_mes = [date(ANO_REFERENCIA, MESES.index(mes) + 1, 1).timetuple().tm_yday - 1
+                          if mes in MESES else np.nan for mes in meses]
+        if not all(np.isnan(inicio) for inicio in inicio_por_mes):
+            data = data + np.array(inicio_por_mes + [np.nan], dtype=float)[codigo_mes]
+
+    df['Data_Atendimento'] = pd.array(data, dtype='Int64')
+    return df
+
+
+def adicionar_indicadores(df):
+    """
+    Adiciona as colunas Papel (especialidades.py), Realizado e de percurso (cruzamento.PERCURSOS)
+
+    Calculadas uma vez para todas as linhas, numa única passada: o dashboard,
+    a aba de cruzamento e o cruzaratendimento.py filtram e somam essas colunas
+    em vez de refazer o cruzamento. A chave é (prontuário, mês, aba), então
+    o resultado vale também com vários meses e com parte dos dias.
+    """
+    df['Papel'] = classificar_especialidades(df['Especialidade'])
+    df['Realizado'] = marcar_realizados(df['Status'])
+    chaves = [coluna for coluna in CHAVES_PERCURSO if coluna in df.columns]
+    for coluna, valores in marcar_percursos(df, chaves=chaves).items():
+        df[coluna] = valores
+    return df
+
+
+def consolidar_dados(df_consolidado, mes_do_arquivo, compactar=True):
+    """
+    Adiciona a coluna Mês, limpa os dados e cria as colunas Status_Consolidado,
+    Papel, Realizado e de percurso (ver adicionar_indicadores)
+
+    Com compactar=True os tipos das colunas são reduzidos (ver compactar_tipos).
+    """
+    # Adicionar coluna Mês se foi identificado
+    df_consolidado['Mês'] = mes_do_arquivo if mes_do_arquivo else 'Não informado'
+
+    # Remover coluna Unnamed: 0 se existir
+    if 'Unnamed: 0' in df_consolidado.columns:
+        df_consolidado = df_consolidado.drop(columns=['Unnamed: 0'])
+
+    # Limpar dados: tratar valores NaN e converter para string para evitar tipos mistos
+    df_consolidado['Profissional'] = df_consolidado['Profissional'].fillna('Não informado')
+    df_consolidado['Profissional'] = df_consolidado['Profissional'].astype(str).replace('nan', 'Não informado')
+
+    df_consolidado['Especialidade'] = df_consolidado['Especialidade'].fillna('Não informado')
+    df_consolidado['Especialidade'] = df_consolidado['Especialidade'].astype(str).replace('nan', 'Não informado')
+
+    # Consolidar status: criar nova coluna Status_Consolidado (regras em status_atendimento.csv)
+    df_consolidado['Status_Consolidado'] = consolidar_status(df_consolidado['Status'])
+
+    if compactar:
+        df_consolidado = compactar_tipos(df_consolidado)
+
+    return adicionar_indicadores(df_consolidado)
+
+
+def _ordem_dia(aba):
+    """Chave de ordenação das abas: número do dia e depois o nome"""
+    dia_numero = extrair_dia_aba(str(aba))
+    return (dia_numero if dia_numero is not None else float('inf'), str(aba))
+
+
+def _como_categoria(serie, ordenar=sorted, ordenada=False):
+    """
+    Converte a coluna em categoria, com as categorias ordenadas
+
+    As categorias ficam na mesma ordem em qualquer arquivo (não dependem da
+    ordem das linhas). Colunas com tipos misturados que não podem ser
+    ordenados ficam como estão.
+    """
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Já é categoria (ex.: lida do histórico): só ajusta a ordem das categorias
+        try:
+            categorias = list(ordenar(serie.cat.categories))
+        except TypeError:
+            return serie
+        if categorias == list(serie.cat.categories) and serie.cat.ordered == ordenada:
+            return serie
+        return serie.cat.set_categories(categorias, ordered=ordenada)
+    try:
+        categorias = ordenar(serie.dropna().unique())
+    except TypeError:
+        return serie
+    return serie.astype(pd.CategoricalDtype(categorias, ordered=ordenada))
+
+
+def _compactar_prontuario(serie):
+    """Prontuário como inteiro se todos os valores forem números inteiros, senão como texto"""
+    numeros = pd.to_numeric(serie, errors='coerce')
+    if numeros.notna().sum() == serie.notna().sum() and (numeros.dropna() % 1 == 0).all():
+        # Sem valores vazios não é preciso o tipo inteiro com máscara de nulos
+        return numeros.astype('int64' if numeros.notna().all() else 'Int64')
+    return serie.astype('string[pyarrow]')
+
+
+def compactar_tipos(df):
+    """
+    Reduz a memória do DataFrame consolidado
+
+    - Profissional, Especialidade, Status, Status_Consolidado e Mês viram
+      categorias: cada linha guarda um código inteiro, e isin/groupby/==
+      comparam códigos em vez de textos
+    - Dia vira categoria ordenada pelo número do dia
+    - Número Prontuário vira inteiro ou texto do Arrow
+
+    Returns:
+        O próprio DataFrame, com as colunas convertidas
+    """
+    for coluna in COLUNAS_CATEGORICAS:
+        if coluna in df.columns:
+            df[coluna] = _como_categoria(df[coluna])
+
+    if 'Dia' in df.columns:
+        df['Dia'] = _como_categoria(df['Dia'], ordenar=lambda abas: sorted(abas, key=_ordem_dia), ordenada=True)
+
+    if 'Número Prontuário' in df.columns:
+        df['Número Prontuário'] = _compactar_prontuario(df['Número Prontuário'])
+
+    return df
+
+
+def relatorio_memoria(df_antes, df_depois):
+    """
+    Compara o uso de memória, coluna a coluna, de dois DataFrames
+
+    Returns:
+        DataFrame com o tipo e a memória (KB) de cada coluna antes e depois,
+        e uma linha final com o total
+    """
+    antes = df_antes.memory_usage(deep=True, index=False)
+    depois = df_depois.memory_usage(deep=True, index=False)
+
+    relatorio = pd.DataFrame({
+        'Coluna': [str(coluna) for coluna in df_antes.columns],
+        'Tipo antes': [str(df_antes[coluna].dtype) for coluna in df_antes.columns],
+        'Antes (KB)': [antes[coluna] / 1024 for coluna in df_antes.columns],
+        'Tipo depois': [str(df_depois[coluna].dtype) if coluna in df_depois.columns else '-'
+                        for coluna in df_antes.columns],
+        'Depois (KB)': [depois.get(coluna, 0) / 1024 for coluna in df_antes.columns],
+    })
+    total = pd.DataFrame([{
+        'Coluna': 'Total', 'Tipo antes': '', 'Antes (KB)': antes.sum() / 1024,
+        'Tipo depois': '', 'Depois (KB)': depois.sum() / 1024,
+    }])
+    return pd.concat([relatorio, total], ignore_index=True).round(1)
+
+
+def _guardar_memoria(chave, resultado):
+    """Guarda o resultado na memória do processo, descartando o mais antigo"""
+    _memoria[chave] = resultado
+    _memoria.move_to_end(chave)
+    while len(_memoria) > MAX_ARQUIVOS_MEMORIA:
+        _memoria.popitem(last=False)
+
+
+def carregar_planilha(arquivo, consolidar=True, ignorar_erros=False, workers=None):
+    """
+    Carrega as abas "Dia" do arquivo no DataFrame padrão do projeto
+
+    A coluna 'Dia' traz o nome da aba de origem e a coluna "Unnamed: 0" é
+    removida. Com consolidar=True o DataFrame passa também por
+    consolidar_dados() (Mês, limpeza e Status_Consolidado), igual ao dashboard.
+
+    O resultado fica na memória do processo (pelo hash do arquivo); o DataFrame
+    consolidado também é guardado em disco, no mesmo cache do dashboard, e as
+    abas lidas vão para o cache por aba.
+
+    Args:
+        arquivo: Caminho do arquivo ou objeto tipo arquivo
+        consolidar: Se False, devolve os valores como lidos da planilha
+            (útil para diagnosticar tipos mistos)
+        ignorar_erros: Se True, abas com erro são avisadas e ignoradas
+        workers: Processos para ler as abas em paralelo (None usa o padrão)
+
+    Returns:
+        Tupla (DataFrame, lista com todas as abas, mês ou None). O DataFrame é
+        uma cópia e pode ser alterado livremente.
+
+    Raises:
+        ValueError: Se o arquivo não tiver abas "Dia" que possam ser lidas
+    """
+    if hasattr(arquivo, 'read'):
+        arquivo.seek(0)
+        arquivo = arquivo.read()
+
+    hash_arquivo = calcular_hash(arquivo)
+    chave = (hash_arquivo, consolidar, ignorar_erros)
+
+    if chave not in _memoria:
+        resultado = None
+
+        # Arquivo já consolidado antes (por este módulo ou pelo dashboard)
+        if consolidar:
+            df_cache, abas, mes = ler_cache(hash_arquivo)
+            if df_cache is not None:
+                resultado = (df_cache, abas, mes)
+
+        if resultado is None:
+            df, abas, mes = ler_planilha(arquivo, coluna_aba='Dia', ignorar_erros=ignorar_erros,
+                                         workers=workers, usar_cache=True)
+            if 'Unnamed: 0' in df.columns:
+                df = df.drop(columns=['Unnamed: 0'])
+
+            if consolidar:
+                df = consolidar_dados(df, mes)
+                # Com abas ignoradas por erro o DataFrame não representa o arquivo inteiro
+                if not ignorar_erros:
+                    salvar_cache(hash_arquivo, df, abas, mes, impressoes_abas(arquivo))
+            resultado = (df, abas, mes)
+
+        _guardar_memoria(chave, resultado)
+
+    df, abas, mes = _memoria[chave]
+    return df.copy(), list(abas), mes
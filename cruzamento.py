@@ -0,0 +1,306 @@
+"""
+Cruzamento de atendimentos: verifica, para cada atendimento de uma lista,
+se o mesmo paciente tem atendimento em outra lista no mesmo dia
+
+Usado pelo dashboard e pelo cruzaratendimento.py. A verificação é feita com
+uma junção por hash nas chaves (prontuário, dia): as chaves da segunda lista
+viram um índice e cada atendimento da primeira é procurado nele, em tempo
+proporcional ao total de linhas e não ao produto das duas listas.
+
+Com uma janela de dias (ex.: técnico até 2 dias antes do médico) a junção é
+"as-of": as duas listas são ordenadas pela data e cada atendimento procura o
+último atendimento do mesmo prontuário até aquela data (pd.merge_asof), em
+O(n log n) mesmo com vários meses.
+
+As regras de percurso (papel A exige passagem pelo papel B no mesmo dia; os
+papéis vêm de especialidades.py) ficam na tabela regras_percurso.csv e são
+avaliadas juntas por avaliar_regras: as chaves e os papéis são codificados uma única vez
+e cada regra custa apenas algumas operações vetorizadas sobre esses códigos.
+"""
+import csv
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from especialidades import PAPEL_MEDICO_ESF, PAPEL_TECNICO_ENFERMAGEM_ESF, classificar_especialidades, papel_canonico
+from status_atendimento import marcar_realizados
+
+# Chave que identifica o mesmo paciente no mesmo dia
+CHAVES_CRUZAMENTO = ['Número Prontuário', 'Dia_Atendimento']
+
+# Mesma chave nos dados consolidados, antes de criar Dia_Atendimento (a aba é o dia)
+CHAVES_PERCURSO = ['Número Prontuário', 'Mês', 'Dia']
+
+# Indicadores de percurso calculados para cada linha na carga dos dados:
+# coluna -> (papel da linha, papel exigido no mesmo dia)
+PERCURSOS = {
+    'Passou_Pelo_Tecnico': (PAPEL_MEDICO_ESF, PAPEL_TECNICO_ENFERMAGEM_ESF),
+    'Seguiu_Para_Medico': (PAPEL_TECNICO_ENFERMAGEM_ESF, PAPEL_MEDICO_ESF),
+}
+
+# Coluna com a data numérica (em dias) usada na janela (ver adicionar_data_atendimento)
+COLUNA_DATA = 'Data_Atendimento'
+
+# Tabela com as regras de percurso (pode ser alterada por variável de ambiente)
+TABELA_REGRAS = os.environ.get(
+    'DASHBOARD_TABELA_REGRAS',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'regras_percurso.csv')
+)
+
+
+def marcar_encontrados(df_origem, df_destino, chaves=CHAVES_CRUZAMENTO):
+    """
+    Indica, para cada linha de df_origem, se existe linha em df_destino com as mesmas chaves
+
+    Linhas com alguma chave vazia nunca são encontradas (como na comparação
+    com ==). Valores de tipos diferentes (ex.: 123 e '123') não se igualam.
+
+    Args:
+        df_origem: Atendimentos a verificar
+        df_destino: Atendimentos procurados
+        chaves: Colunas que precisam coincidir
+
+    Returns:
+        Série booleana com o mesmo índice de df_origem
+    """
+    if len(df_origem) == 0 or len(df_destino) == 0 or any(chave not in df_destino.columns for chave in chaves):
+        return pd.Series(False, index=df_origem.index, dtype=bool)
+
+    chaves_destino = pd.MultiIndex.from_frame(df_destino[chaves].dropna())
+    encontrados = pd.MultiIndex.from_frame(df_origem[chaves]).isin(chaves_destino)
+
+    # Chave vazia não casa com nada
+    encontrados &= df_origem[chaves].notna().all(axis=1).to_numpy()
+
+    return pd.Series(encontrados, index=df_origem.index, dtype=bool)
+
+
+def marcar_encontrados_janela(df_origem, df_destino, dias, chave=CHAVES_CRUZAMENTO[0], coluna_data=COLUNA_DATA):
+    """
+    Indica, para cada linha de df_origem, se existe linha em df_destino com a
+    mesma chave no mesmo dia ou até `dias` dias antes
+
+    As duas listas são ordenadas pela data e unidas com pd.merge_asof agrupado
+    pela chave (para cada linha, o último destino até a data da origem).
+    Linhas com chave ou data vazia nunca são encontradas; chaves de tipos
+    diferentes se comparam como em marcar_encontrados.
+
+    Args:
+        df_origem: Atendimentos a verificar
+        df_destino: Atendimentos procurados
+        dias: Tamanho da janela em dias (0 = mesmo dia)
+        chave: Coluna que identifica o paciente
+        coluna_data: Coluna com a data numérica em dias
+
+    Returns:
+        Série booleana com o mesmo índice de df_origem
+    """
+    encontrados = np.zeros(len(df_origem), dtype=bool)
+    colunas = [chave, coluna_data]
+    if len(df_origem) == 0 or len(df_destino) == 0 or any(coluna not in df_destino.columns for coluna in colunas):
+        return pd.Series(encontrados, index=df_origem.index, dtype=bool)
+
+    origem = df_origem[colunas].reset_index(drop=True).rename_axis('Posicao').reset_index().dropna()
+    destino = df_destino[colunas].dropna().drop_duplicates()
+    destino['Data_Destino'] = destino[coluna_data]
+
+    # merge_asof exige a coluna de ordenação sem vazios e do mesmo tipo dos dois lados
+    origem[coluna_data] = origem[coluna_data].astype('int64')
+    destino[coluna_data] = destino[coluna_data].astype('int64')
+    # e a chave também do mesmo tipo: com tipos diferentes (ex.: int64 e texto,
+    # Int64 e int64) compara como objetos, com o == do Python (como marcar_encontrados)
+    if origem[chave].dtype != destino[chave].dtype:
+        origem[chave] = origem[chave].astype(object)
+        destino[chave] = destino[chave].astype(object)
+
+    unidos = pd.merge_asof(
+        origem.sort_values(coluna_data, kind='stable'),
+        destino.sort_values(coluna_data, kind='stable'),
+        on=coluna_data,
+        by=chave,
+        direction='backward',
+        tolerance=int(dias),
+        allow_exact_matches=True
+    )
+    encontrados[unidos.loc[unidos['Data_Destino'].notna(), 'Posicao'].to_numpy()] = True
+
+    return pd.Series(encontrados, index=df_origem.index, dtype=bool)
+
+
+def marcar_passou_pelo_tecnico(df_medicos, df_tecnicos, janela_dias=0):
+    """
+    Indica, para cada atendimento médico, se o paciente passou pelo técnico
+    no mesmo dia (ou até janela_dias dias antes)
+
+    Com janela_dias=0 equivale a procurar, para cada linha de df_medicos, uma
+    linha de df_tecnicos com o mesmo Número Prontuário e o mesmo
+    Dia_Atendimento. Com janela maior a comparação usa a coluna
+    Data_Atendimento (ver carregamento.adicionar_data_atendimento).
+
+    Returns:
+        Série booleana com o mesmo índice de df_medicos
+    """
+    if janela_dias:
+        return marcar_encontrados_janela(df_medicos, df_tecnicos, janela_dias)
+    return marcar_encontrados(df_medicos, df_tecnicos, CHAVES_CRUZAMENTO)
+
+
+@lru_cache(maxsize=4)
+def _ler_regras(caminho, modificado_em):
+    """Lê a tabela de regras (em cache até o arquivo ser modificado)"""
+    with open(caminho, encoding='utf-8', newline='') as f:
+        return tuple(
+            (linha['Regra'].strip(),
+             papel_canonico(linha['Papel']),
+             papel_canonico(linha['Exige_Papel']))
+            for linha in csv.DictReader(f)
+            if linha['Regra'] and linha['Regra'].strip()
+        )
+
+
+def ler_regras(caminho=None):
+    """
+    Lê as regras de percurso
+
+    Returns:
+        Tupla de regras (nome, papel, papel exigido), com os nomes oficiais
+        dos papéis (ver especialidades.PAPEIS)
+    """
+    caminho = caminho or TABELA_REGRAS
+    return _ler_regras(caminho, os.path.getmtime(caminho))
+
+
+def _avaliar(df, regras, chaves):
+    """
+    Avalia as regras sobre df (ver avaliar_regras)
+
+    Returns:
+        Lista de (nome da regra, posições das linhas avaliadas, vetor Passou)
+    """
+    realizado = (df['Realizado'] if 'Realizado' in df.columns else marcar_realizados(df['Status'])).to_numpy()
+
+    # Código da chave (prontuário, dia) de cada linha; chave vazia fica com -1
+    # e nunca casa. Deslocado de 1 para a posição 0 dos vetores ser "nenhuma".
+    codigo_chave = df.groupby(chaves, sort=False, observed=True).ngroup()
+    codigo_chave = codigo_chave.fillna(-1).to_numpy(dtype=np.int64) + 1
+    total_chaves = codigo_chave.max() + 1
+
+    # Código do papel de cada linha (coluna Papel da carga ou classificada agora)
+    papeis = df['Papel'].astype('category') if 'Papel' in df.columns else classificar_especialidades(df['Especialidade'])
+    codigo_papel = papeis.cat.codes.to_numpy()
+    nomes_papeis = np.array(list(papeis.cat.categories) + [''], dtype=object)
+
+    def linhas_da(papel):
+        return realizado & (nomes_papeis == papel)[codigo_papel]
+
+    # Chaves em que cada papel exigido foi atendido
+    presenca = {}
+    for exigido in {exigido for _, _, exigido in regras}:
+        vetor = np.zeros(total_chaves, dtype=bool)
+        vetor[codigo_chave[linhas_da(exigido)]] = True
+        vetor[0] = False
+        presenca[exigido] = vetor
+
+    avaliadas = []
+    for nome, papel, exigido in regras:
+        linhas = np.flatnonzero(linhas_da(papel))
+        avaliadas.append((nome, linhas, presenca[exigido][codigo_chave[linhas]]))
+    return avaliadas
+
+
+def avaliar_regras(df, regras=None, chaves=CHAVES_CRUZAMENTO):
+    """
+    Avalia todas as regras de percurso de uma vez
+
+    Para cada atendimento REALIZADO do papel de uma regra, verifica se o mesmo
+    paciente tem, no mesmo dia, atendimento REALIZADO do papel exigido. As
+    chaves (prontuário, dia) e os papéis são codificados uma única vez; para
+    cada papel exigido é montado um vetor com as chaves em que ele aparece, e
+    cada regra só consulta esse vetor.
+
+    Args:
+        df: DataFrame com as colunas de chaves, Profissional, Especialidade
+            (ou Papel) e Status
+        regras: Regras (nome, papel, papel exigido); None usa
+            a tabela TABELA_REGRAS
+        chaves: Colunas que identificam o mesmo paciente no mesmo dia
+
+    Returns:
+        DataFrame com uma linha por atendimento avaliado em cada regra:
+        Regra, Linha (índice em df), Profissional e Passou
+    """
+    regras = ler_regras() if regras is None else regras
+    colunas = ['Regra', 'Linha', 'Profissional', 'Passou']
+    if len(df) == 0 or not regras:
+        return pd.DataFrame(columns=colunas).astype({'Passou': bool})
+
+    profissionais = df['Profissional'].to_numpy()
+    partes = [
+        pd.DataFrame({
+            'Regra': nome,
+            'Linha': df.index[linhas],
+            'Profissional': profissionais[linhas],
+            'Passou': passou,
+        }, columns=colunas)
+        for nome, linhas, passou in _avaliar(df, regras, chaves)
+    ]
+    return pd.concat(partes, ignore_index=True)
+
+
+def marcar_percursos(df, percursos=PERCURSOS, chaves=CHAVES_PERCURSO):
+    """
+    Indicadores de percurso de cada linha (ex.: Passou_Pelo_Tecnico)
+
+    Uma coluna por percurso: True nas linhas REALIZADAS do papel do percurso
+    cujo paciente teve, no mesmo dia, atendimento REALIZADO do papel exigido;
+    False em todas as outras.
+
+    Args:
+        df: DataFrame com as colunas de chaves, Especialidade (ou Papel) e Status
+        percursos: {coluna: (papel, papel exigido)}
+        chaves: Colunas que identificam o mesmo paciente no mesmo dia
+
+    Returns:
+        DataFrame booleano com o mesmo índice de df
+    """
+    indicadores = pd.DataFrame(
+        {coluna: np.zeros(len(df), dtype=bool) for coluna in percursos}, index=df.index
+    )
+    if len(df) == 0:
+        return indicadores
+
+    regras = [(coluna, papel, exigido) for coluna, (papel, exigido) in percursos.items()]
+    for coluna, linhas, passou in _avaliar(df, regras, chaves):
+        valores = indicadores[coluna].to_numpy(copy=True)
+        valores[linhas] = passou
+        indicadores[coluna] = valores
+    return indicadores
+
+
+def gerar_estatisticas_regras(df_regras):
+    """
+    Estatísticas por profissional de cada regra de percurso
+
+    Args:
+        df_regras: Resultado de avaliar_regras
+
+    Returns:
+        Dicionário {regra: DataFrame indexado por Profissional com
+        Total_Atendimentos, Passou, Nao_Passou, Percentual_Passou e
+        Percentual_Nao_Passou}, na ordem das regras
+    """
+    estatisticas = {}
+    for regra, df_regra in df_regras.groupby('Regra', sort=False):
+        stats = df_regra.groupby('Profissional', observed=True).agg(
+            Total_Atendimentos=('Passou', 'count'),
+            Passou=('Passou', 'sum')
+        )
+        stats['Passou'] = stats['Passou'].astype(int)
+        stats['Nao_Passou'] = stats['Total_Atendimentos'] - stats['Passou']
+        stats['Percentual_Passou'] = (stats['Passou'] / stats['Total_Atendimentos'] * 100).round(2)
+        stats['Percentual_Nao_Passou'] = (stats['Nao_Passou'] / stats['Total_Atendimentos'] * 100).round(2)
+        estatisticas[regra] = stats.sort_values('Total_Atendimentos', ascending=False)
+
+    return estatisticas
@@ -1,79 +1,62 @@
 """
 Módulo para cruzar atendimentos: identificar pacientes que foram ao médico
 sem passar pelo técnico no mesmo dia
+
+Uso:
+    python cruzaratendimento.py arquivo.xlsx [dias de janela] [--dpi N] [--formato png|svg|pdf]
+                                [--dados parquet|csv]
+    python cruzaratendimento.py --lote <pasta ou padrão> [...] [--janela N] [--workers N] [--saida pasta]
+                                [--dpi N] [--formato png|svg|pdf] [--dados parquet|csv]
+
+No modo lote os arquivos são processados em paralelo (um processo por
+arquivo), cada um na sua subpasta de saída, e no fim é gerada uma planilha
+de resumo com todos os arquivos.
+
+Os gráficos são gerados por graficos_cruzamento: os que não mudaram desde a
+última execução não são desenhados de novo.
 """
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib
-matplotlib.use('Agg')  # Para não precisar de interface gráfica
-import seaborn as sns
 from datetime import datetime
-import re
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stderr, redirect_stdout
+from glob import glob, has_magic
+from carregamento import adicionar_colunas_dia, adicionar_data_atendimento, adicionar_indicadores, carregar_planilha
+from cruzamento import avaliar_regras, gerar_estatisticas_regras, marcar_passou_pelo_tecnico
+from escritor_xlsx import FORMATOS_DADOS, escrever_planilha, salvar_dados
+from especialidades import PAPEL_MEDICO_ESF, PAPEL_TECNICO_ENFERMAGEM_ESF, classificar_especialidades
+from graficos_cruzamento import DPI_PADRAO, FORMATOS, gerar_graficos_por_medico
+from leitor_xlsx import WORKERS_PADRAO
+from status_atendimento import listar_status, marcar_realizados
 
-# Configurar estilo dos gráficos
-try:
-    plt.style.use('seaborn-v0_8-darkgrid')
-except:
-    try:
-        plt.style.use('seaborn-darkgrid')
-    except:
-        plt.style.use('default')
-sns.set_palette("husl")
-
-
-def extrair_dia_aba(nome_aba):
-    """Extrai o número do dia do nome da aba (ex: 'Dia 01' -> 1, 'Dia 24' -> 24)"""
-    match = re.search(r'[Dd]ia\s*(\d+)', nome_aba)
-    if match:
-        return int(match.group(1))
-    return None
 
-
-def carregar_dados(arquivo):
+def carregar_dados(arquivo, workers=None):
     """
     Carrega e consolida dados de todas as abas 'Dia' do arquivo Excel
     
     Args:
         arquivo: Caminho para o arquivo Excel ou nome do arquivo
+        workers: Quantidade de processos para ler as abas em paralelo
+                 (None usa a variável de ambiente LEITOR_XLSX_WORKERS ou o número de CPUs)
         
     Returns:
         DataFrame com todos os dados consolidados
     """
     try:
-        # Ler todas as abas
-        xls = pd.ExcelFile(arquivo)
-        
-        # Consolidar dados de todas as abas "Dia"
-        dados_consolidados = []
+        # Ler todas as abas "Dia" pelo carregador comum (abas com erro são ignoradas).
+        # Os valores ficam como lidos da planilha, sem a limpeza do dashboard.
+        df_consolidado, _, mes = carregar_planilha(arquivo, consolidar=False, ignorar_erros=True, workers=workers)
         
-        for aba in xls.sheet_names:
-            if aba.startswith("Dia"):
-                try:
-                    df = pd.read_excel(xls, sheet_name=aba)
-                    # Adicionar coluna com o nome completo da aba
-                    df['Aba'] = aba
-                    # Extrair o número do dia
-                    dia_numero = extrair_dia_aba(aba)
-                    if dia_numero:
-                        df['Dia_Numero'] = dia_numero
-                        df['Dia_Atendimento'] = f"Dia {dia_numero:02d}"
-                    else:
-                        df['Dia_Numero'] = None
-                        df['Dia_Atendimento'] = aba
-                    dados_consolidados.append(df)
-                except Exception as e:
-                    print(f"⚠️ Erro ao ler {aba}: {e}")
+        # Mês do arquivo (célula A1), usado no resumo do modo lote
+        if 'Mês' not in df_consolidado.columns:
+            df_consolidado['Mês'] = mes if mes else 'Não informado'
         
-        if not dados_consolidados:
-            raise ValueError("Nenhuma aba 'Dia' encontrada no arquivo!")
+        # Dia_Numero e Dia_Atendimento a partir do nome da aba
+        adicionar_colunas_dia(df_consolidado, coluna_aba='Dia')
         
-        # Concatenar todos
-        df_consolidado = pd.concat(dados_consolidados, ignore_index=True)
-        
-        # Remover coluna Unnamed: 0 se existir
-        if 'Unnamed: 0' in df_consolidado.columns:
-            df_consolidado = df_consolidado.drop(columns=['Unnamed: 0'])
+        # Papel, Realizado e indicadores de percurso (ex.: Passou_Pelo_Tecnico), uma vez para todas as linhas
+        adicionar_indicadores(df_consolidado)
         
         return df_consolidado
     
@@ -81,31 +64,36 @@ def carregar_dados(arquivo):
         raise Exception(f"Erro ao carregar arquivo: {e}")
 
 
-def cruzar_atendimentos(df):
+def cruzar_atendimentos(df, janela_dias=0):
     """
     Cruza os atendimentos para identificar quais pacientes foram ao médico
-    sem passar pelo técnico no mesmo dia
+    sem passar pelo técnico no mesmo dia (ou nos janela_dias dias anteriores)
     
     IMPORTANTE: Considera apenas atendimentos REALIZADOS (status: 
     'ATENDIMENTO FINALIZADO' ou 'REALIZANDO PROCEDIMENTO/EXAME')
     
     Args:
         df: DataFrame com todos os dados consolidados
+        janela_dias: Quantos dias antes do médico o técnico ainda conta (0 = mesmo dia)
         
     Returns:
         DataFrame com atendimentos médicos e informação se passou pelo técnico
     """
-    # Definir especialidades de técnico e médico
-    especialidade_tecnico = 'TÉCNICO DE ENFERMAGEM DA ESTRATÉGIA DE SAÚDE DA FAMÍLIA'
-    especialidade_medico = 'MÉDICO DA ESTRATÉGIA DE SAÚDE DA FAMÍLIA'
+    # Papéis de técnico e médico (especialidades.py: comparação sem acentos/maiúsculas)
+    papel = df['Papel'] if 'Papel' in df.columns else classificar_especialidades(df['Especialidade'])
+    
+    # Data numérica (dia + mês) para comparar atendimentos de dias diferentes
+    if janela_dias and 'Data_Atendimento' not in df.columns:
+        adicionar_data_atendimento(df)
     
-    # Status que indicam atendimento realizado
-    status_realizados = ['ATENDIMENTO FINALIZADO', 'REALIZANDO PROCEDIMENTO/EXAME']
+    # Status que indicam atendimento realizado (tabela status_atendimento.csv);
+    # já vem calculado por carregar_dados
+    realizado = df['Realizado'] if 'Realizado' in df.columns else marcar_realizados(df['Status'])
     
     # Filtrar apenas atendimentos de médico que foram REALIZADOS
     df_medicos = df[
-        (df['Especialidade'] == especialidade_medico) &
-        (df['Status'].isin(status_realizados))
+        (papel == PAPEL_MEDICO_ESF) &
+        realizado
     ].copy()
     
     if len(df_medicos) == 0:
@@ -113,26 +101,16 @@ def cruzar_atendimentos(df):
     
     # Filtrar atendimentos de técnico que foram REALIZADOS
     df_tecnicos = df[
-        (df['Especialidade'] == especialidade_tecnico) &
-        (df['Status'].isin(status_realizados))
+        (papel == PAPEL_TECNICO_ENFERMAGEM_ESF) &
+        realizado
     ].copy()
     
-    # Criar chave de identificação: Prontuário + Dia_Atendimento
-    # Função para verificar se passou pelo técnico
-    def verificar_passou_tecnico(row):
-        prontuario = row['Número Prontuário']
-        dia_atendimento = row['Dia_Atendimento']
-        
-        # Verificar se existe atendimento do técnico para o mesmo paciente no mesmo dia
-        passou = len(df_tecnicos[
-            (df_tecnicos['Número Prontuário'] == prontuario) &
-            (df_tecnicos['Dia_Atendimento'] == dia_atendimento)
-        ]) > 0
-        
-        return passou
-    
-    # Aplicar verificação
-    df_medicos['Passou_Pelo_Tecnico'] = df_medicos.apply(verificar_passou_tecnico, axis=1)
+    # Mesmo dia: o indicador Passou_Pelo_Tecnico já vem calculado por carregar_dados.
+    # Senão, verificar pela chave Prontuário + Dia_Atendimento se existe atendimento
+    # do técnico para o mesmo paciente no mesmo dia (junção pelas chaves) ou, com
+    # janela, nos dias anteriores (junção as-of pela data)
+    if janela_dias or 'Passou_Pelo_Tecnico' not in df_medicos.columns:
+        df_medicos['Passou_Pelo_Tecnico'] = marcar_passou_pelo_tecnico(df_medicos, df_tecnicos, janela_dias)
     
     return df_medicos
 
@@ -169,130 +147,21 @@ def gerar_estatisticas_por_medico(df_medicos_cruzados):
     return stats
 
 
-def gerar_graficos_por_medico(stats, pasta_saida='graficos'):
-    """
-    Gera gráficos para cada médico mostrando:
-    - Total de atendimentos
-    - Quantidade que passou pelo técnico
-    - Quantidade que não passou pelo técnico
-    
-    Args:
-        stats: DataFrame com estatísticas por médico
-        pasta_saida: Pasta onde salvar os gráficos
-    """
-    # Criar pasta de saída se não existir
-    os.makedirs(pasta_saida, exist_ok=True)
-    
-    # Gerar gráfico para cada médico
-    for medico in stats.index:
-        medico_stats = stats.loc[medico]
-        
-        # Preparar dados para o gráfico
-        categorias = ['Passou pelo\nTécnico', 'Não passou pelo\nTécnico']
-        valores = [
-            medico_stats['Passou_Pelo_Tecnico'],
-            medico_stats['Nao_Passou_Pelo_Tecnico']
-        ]
-        cores = ['#2ecc71', '#e74c3c']  # Verde para passou, vermelho para não passou
-        
-        # Criar figura
-        fig, ax = plt.subplots(figsize=(10, 6))
-        
-        # Criar gráfico de barras
-        bars = ax.bar(categorias, valores, color=cores, alpha=0.8, edgecolor='black', linewidth=1.5)
-        
-        # Adicionar valores nas barras
-        for i, (bar, valor) in enumerate(zip(bars, valores)):
-            altura = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., altura + max(valores)*0.01,
-                   f'{int(valor)}\n({medico_stats["Percentual_Passou"] if i == 0 else medico_stats["Percentual_Nao_Passou"]}%)',
-                   ha='center', va='bottom', fontsize=12, fontweight='bold')
-        
-        # Configurações do gráfico
-        ax.set_ylabel('Quantidade de Atendimentos', fontsize=12, fontweight='bold')
-        ax.set_title(f'Atendimentos Médicos - {medico}\n'
-                    f'Total: {int(medico_stats["Total_Atendimentos"])} atendimentos',
-                    fontsize=14, fontweight='bold', pad=20)
-        ax.grid(axis='y', alpha=0.3, linestyle='--')
-        ax.set_ylim(0, max(valores) * 1.2)
-        
-        # Adicionar linha indicando total
-        ax.axhline(y=medico_stats['Total_Atendimentos'], color='blue', linestyle='--', 
-                  linewidth=2, alpha=0.5, label=f'Total: {int(medico_stats["Total_Atendimentos"])}')
-        ax.legend(loc='upper right')
-        
-        plt.tight_layout()
-        
-        # Salvar gráfico
-        # Limpar nome do arquivo (remover caracteres inválidos)
-        nome_arquivo = re.sub(r'[<>:"/\\|?*]', '_', medico)
-        caminho_grafico = os.path.join(pasta_saida, f'{nome_arquivo}.png')
-        plt.savefig(caminho_grafico, dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        print(f"✅ Gráfico salvo: {caminho_grafico}")
-    
-    # Gerar gráfico consolidado com todos os médicos
-    gerar_grafico_consolidado(stats, pasta_saida)
-
-
-def gerar_grafico_consolidado(stats, pasta_saida='graficos'):
-    """
-    Gera gráfico consolidado mostrando todos os médicos
-    
-    Args:
-        stats: DataFrame com estatísticas por médico
-        pasta_saida: Pasta onde salvar o gráfico
-    """
-    # Preparar dados
-    medicos = stats.index.tolist()
-    passou = stats['Passou_Pelo_Tecnico'].tolist()
-    nao_passou = stats['Nao_Passou_Pelo_Tecnico'].tolist()
-    
-    # Criar figura
-    fig, ax = plt.subplots(figsize=(14, 8))
-    
-    x = range(len(medicos))
-    width = 0.6
-    
-    # Criar barras empilhadas
-    bars1 = ax.bar(x, passou, width, label='Passou pelo Técnico', color='#2ecc71', alpha=0.8, edgecolor='black')
-    bars2 = ax.bar(x, nao_passou, width, bottom=passou, label='Não passou pelo Técnico', 
-                   color='#e74c3c', alpha=0.8, edgecolor='black')
-    
-    # Adicionar valores nas barras
-    for i, (p, np, total) in enumerate(zip(passou, nao_passou, stats['Total_Atendimentos'])):
-        ax.text(i, total + max(stats['Total_Atendimentos']) * 0.01,
-               f'Total: {int(total)}', ha='center', va='bottom', fontsize=10, fontweight='bold')
-    
-    # Configurações
-    ax.set_xlabel('Médico', fontsize=12, fontweight='bold')
-    ax.set_ylabel('Quantidade de Atendimentos', fontsize=12, fontweight='bold')
-    ax.set_title('Cruzamento de Atendimentos - Todos os Médicos\n'
-                f'Total de atendimentos médicos: {int(stats["Total_Atendimentos"].sum())}',
-                fontsize=14, fontweight='bold', pad=20)
-    ax.set_xticks(x)
-    ax.set_xticklabels(medicos, rotation=45, ha='right', fontsize=10)
-    ax.legend(loc='upper right', fontsize=11)
-    ax.grid(axis='y', alpha=0.3, linestyle='--')
-    
-    plt.tight_layout()
-    
-    # Salvar
-    caminho = os.path.join(pasta_saida, 'Todos_Medicos.png')
-    plt.savefig(caminho, dpi=300, bbox_inches='tight')
-    plt.close()
-    
-    print(f"✅ Gráfico consolidado salvo: {caminho}")
-
-
-def gerar_planilha_saida(df_medicos_cruzados, nome_arquivo_saida='cruzamento_atendimentos.xlsx'):
+def gerar_planilha_saida(df_medicos_cruzados, nome_arquivo_saida='cruzamento_atendimentos.xlsx', estatisticas_regras=None,
+                         formato_dados=None):
     """
     Gera planilha Excel com pacientes que não passaram pelo técnico
     
+    A planilha é gravada em modo streaming (escritor_xlsx), sem montar a pasta
+    de trabalho inteira em memória.
+    
     Args:
         df_medicos_cruzados: DataFrame com atendimentos médicos já cruzados
         nome_arquivo_saida: Nome do arquivo de saída
+        estatisticas_regras: Resultado de gerar_estatisticas_regras (opcional),
+            salvo na aba "Regras de Percurso"
+        formato_dados: 'parquet' ou 'csv' para gravar também todos os atendimentos
+            médicos em um arquivo ao lado da planilha (<nome>_atendimentos.<formato>)
     """
     # Filtrar apenas os que NÃO passaram pelo técnico
     df_nao_passou = df_medicos_cruzados[df_medicos_cruzados['Passou_Pelo_Tecnico'] == False].copy()
@@ -316,45 +185,68 @@ def gerar_planilha_saida(df_medicos_cruzados, nome_arquivo_saida='cruzamento_ate
     # Ordenar por médico e dia
     df_saida = df_saida.sort_values(['Médico', 'Dia de Atendimento', 'Paciente'])
     
-    # Salvar em Excel
-    with pd.ExcelWriter(nome_arquivo_saida, engine='openpyxl') as writer:
-        # Aba com pacientes que não passaram pelo técnico
-        df_saida.to_excel(writer, sheet_name='Pacientes para Investigação', index=False)
-        
-        # Aba com estatísticas gerais
-        stats = gerar_estatisticas_por_medico(df_medicos_cruzados)
-        stats_renomeado = stats.reset_index()
-        stats_renomeado = stats_renomeado.rename(columns={
-            'Profissional': 'Médico',
+    # Aba com pacientes que não passaram pelo técnico
+    abas = {'Pacientes para Investigação': df_saida}
+    
+    # Aba com estatísticas gerais
+    stats = gerar_estatisticas_por_medico(df_medicos_cruzados)
+    stats_renomeado = stats.reset_index()
+    stats_renomeado = stats_renomeado.rename(columns={
+        'Profissional': 'Médico',
+        'Total_Atendimentos': 'Total de Atendimentos',
+        'Passou_Pelo_Tecnico': 'Passou pelo Técnico',
+        'Nao_Passou_Pelo_Tecnico': 'Não Passou pelo Técnico',
+        'Percentual_Passou': '% Passou pelo Técnico',
+        'Percentual_Nao_Passou': '% Não Passou pelo Técnico'
+    })
+    abas['Estatísticas por Médico'] = stats_renomeado
+    
+    # Aba com todos os atendimentos médicos (para referência)
+    df_todos = df_medicos_cruzados[['Paciente', 'Número Prontuário', 'Dia_Atendimento', 
+                                   'Profissional', 'Status', 'Passou_Pelo_Tecnico']]
+    df_todos = df_todos.rename(columns={
+        'Paciente': 'Paciente',
+        'Número Prontuário': 'Prontuário',
+        'Dia_Atendimento': 'Dia de Atendimento',
+        'Profissional': 'Médico',
+        'Status': 'Status do Atendimento',
+        'Passou_Pelo_Tecnico': 'Passou pelo Técnico'
+    })
+    df_todos = df_todos.sort_values(['Médico', 'Dia de Atendimento', 'Paciente'])
+    abas['Todos Atendimentos Médicos'] = df_todos
+    
+    # Aba com as estatísticas de todas as regras de percurso
+    if estatisticas_regras:
+        df_regras = pd.concat(
+            [stats.reset_index().assign(Regra=regra) for regra, stats in estatisticas_regras.items()],
+            ignore_index=True
+        )
+        df_regras = df_regras[['Regra', 'Profissional', 'Total_Atendimentos', 'Passou', 'Nao_Passou',
+                               'Percentual_Passou', 'Percentual_Nao_Passou']].rename(columns={
             'Total_Atendimentos': 'Total de Atendimentos',
-            'Passou_Pelo_Tecnico': 'Passou pelo Técnico',
-            'Nao_Passou_Pelo_Tecnico': 'Não Passou pelo Técnico',
-            'Percentual_Passou': '% Passou pelo Técnico',
-            'Percentual_Nao_Passou': '% Não Passou pelo Técnico'
-        })
-        stats_renomeado.to_excel(writer, sheet_name='Estatísticas por Médico', index=False)
-        
-        # Aba com todos os atendimentos médicos (para referência)
-        df_todos = df_medicos_cruzados[['Paciente', 'Número Prontuário', 'Dia_Atendimento', 
-                                       'Profissional', 'Status', 'Passou_Pelo_Tecnico']].copy()
-        df_todos = df_todos.rename(columns={
-            'Paciente': 'Paciente',
-            'Número Prontuário': 'Prontuário',
-            'Dia_Atendimento': 'Dia de Atendimento',
-            'Profissional': 'Médico',
-            'Status': 'Status do Atendimento',
-            'Passou_Pelo_Tecnico': 'Passou pelo Técnico'
+            'Nao_Passou': 'Não Passou',
+            'Percentual_Passou': '% Passou',
+            'Percentual_Nao_Passou': '% Não Passou'
         })
-        df_todos = df_todos.sort_values(['Médico', 'Dia de Atendimento', 'Paciente'])
-        df_todos.to_excel(writer, sheet_name='Todos Atendimentos Médicos', index=False)
+        abas['Regras de Percurso'] = df_regras
+    
+    # Salvar em Excel
+    escrever_planilha(nome_arquivo_saida, abas)
     
     print(f"✅ Planilha salva: {nome_arquivo_saida}")
     print(f"   - Total de pacientes para investigação: {len(df_nao_passou)}")
     
+    # Todos os atendimentos também em Parquet/CSV (saídas grandes demais para abrir no Excel)
+    if formato_dados:
+        nome_dados = f"{os.path.splitext(nome_arquivo_saida)[0]}_atendimentos.{formato_dados}"
+        salvar_dados(df_todos, nome_dados, formato_dados)
+        print(f"✅ Dados salvos: {nome_dados}")
+    
     return nome_arquivo_saida
 
 
-def processar_arquivo(arquivo, pasta_graficos='graficos', nome_planilha_saida='cruzamento_atendimentos.xlsx'):
+def processar_arquivo(arquivo, pasta_graficos='graficos', nome_planilha_saida='cruzamento_atendimentos.xlsx', janela_dias=0,
+                      workers=None, dpi=DPI_PADRAO, formato_graficos='png', formato_dados=None):
     """
     Função principal que processa o arquivo completo
     
@@ -362,6 +254,12 @@ def processar_arquivo(arquivo, pasta_graficos='graficos', nome_planilha_saida='c
         arquivo: Caminho para o arquivo Excel
         pasta_graficos: Pasta onde salvar os gráficos
         nome_planilha_saida: Nome do arquivo Excel de saída
+        janela_dias: Quantos dias antes do médico o técnico ainda conta (0 = mesmo dia)
+        workers: Quantidade de processos para ler as abas e desenhar os gráficos
+        dpi: Resolução dos gráficos
+        formato_graficos: 'png', 'svg' ou 'pdf' (um único PDF com todos os gráficos)
+        formato_dados: 'parquet' ou 'csv' para gravar também os atendimentos médicos
+            ao lado da planilha (ver gerar_planilha_saida)
         
     Returns:
         Tupla com (df_medicos_cruzados, stats)
@@ -372,20 +270,20 @@ def processar_arquivo(arquivo, pasta_graficos='graficos', nome_planilha_saida='c
     
     # 1. Carregar dados
     print("📂 Carregando dados...")
-    df = carregar_dados(arquivo)
+    df = carregar_dados(arquivo, workers)
     print(f"   ✅ {len(df)} registros carregados")
     
     # Informar sobre filtro de status
-    status_realizados = ['ATENDIMENTO FINALIZADO', 'REALIZANDO PROCEDIMENTO/EXAME']
+    status_realizados = listar_status(realizado=True)
     print(f"\n⚠️ FILTRO APLICADO: Apenas atendimentos REALIZADOS serão considerados")
     print(f"   Status considerados: {', '.join(status_realizados)}")
     
     # Mostrar distribuição de status antes do filtro
     if 'Status' in df.columns:
-        total_medicos = len(df[df['Especialidade'] == 'MÉDICO DA ESTRATÉGIA DE SAÚDE DA FAMÍLIA'])
+        total_medicos = len(df[df['Papel'] == PAPEL_MEDICO_ESF])
         medicos_realizados = len(df[
-            (df['Especialidade'] == 'MÉDICO DA ESTRATÉGIA DE SAÚDE DA FAMÍLIA') &
-            (df['Status'].isin(status_realizados))
+            (df['Papel'] == PAPEL_MEDICO_ESF) &
+            df['Realizado']
         ])
         print(f"   - Total de atendimentos médicos: {total_medicos}")
         print(f"   - Atendimentos médicos REALIZADOS: {medicos_realizados} ({medicos_realizados/total_medicos*100:.1f}%)")
@@ -393,7 +291,9 @@ def processar_arquivo(arquivo, pasta_graficos='graficos', nome_planilha_saida='c
     
     # 2. Cruzar atendimentos
     print("\n🔍 Cruzando atendimentos...")
-    df_medicos_cruzados = cruzar_atendimentos(df)
+    if janela_dias:
+        print(f"   Técnico no mesmo dia ou até {janela_dias} dia(s) antes do médico")
+    df_medicos_cruzados = cruzar_atendimentos(df, janela_dias)
     print(f"   ✅ {len(df_medicos_cruzados)} atendimentos médicos REALIZADOS encontrados")
     
     total_nao_passou = len(df_medicos_cruzados[df_medicos_cruzados['Passou_Pelo_Tecnico'] == False])
@@ -406,13 +306,21 @@ def processar_arquivo(arquivo, pasta_graficos='graficos', nome_planilha_saida='c
     stats = gerar_estatisticas_por_medico(df_medicos_cruzados)
     print(f"   ✅ Estatísticas geradas para {len(stats)} médico(s)")
     
+    # Todas as regras de percurso (tabela regras_percurso.csv) de uma vez
+    print("\n📐 Avaliando regras de percurso...")
+    estatisticas_regras = gerar_estatisticas_regras(avaliar_regras(df))
+    for regra, stats_regra in estatisticas_regras.items():
+        total = stats_regra['Total_Atendimentos'].sum()
+        passou = stats_regra['Passou'].sum()
+        print(f"   - {regra}: {passou}/{total} ({passou/total*100:.1f}%)")
+    
     # 4. Gerar gráficos
     print(f"\n📈 Gerando gráficos na pasta '{pasta_graficos}'...")
-    gerar_graficos_por_medico(stats, pasta_graficos)
+    gerar_graficos_por_medico(stats, pasta_graficos, dpi, formato_graficos, workers)
     
     # 5. Gerar planilha de saída
     print(f"\n📄 Gerando planilha de saída...")
-    gerar_planilha_saida(df_medicos_cruzados, nome_planilha_saida)
+    gerar_planilha_saida(df_medicos_cruzados, nome_planilha_saida, estatisticas_regras, formato_dados)
     
     print(f"\n{'='*70}")
     print("✅ PROCESSAMENTO CONCLUÍDO!")
@@ -421,21 +329,258 @@ def processar_arquivo(arquivo, pasta_graficos='graficos', nome_planilha_saida='c
     return df_medicos_cruzados, stats
 
 
+# ========== PROCESSAMENTO EM LOTE ==========
+
+def listar_planilhas(entradas):
+    """
+    Arquivos .xlsx das pastas e padrões indicados (ex.: 'dados', 'dados/*/*.xlsx')
+
+    Returns:
+        Lista ordenada e sem repetições; arquivos temporários do Excel (~$) são ignorados
+    """
+    arquivos = set()
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            arquivos.update(glob(os.path.join(entrada, '*.xlsx')))
+        elif has_magic(entrada):
+            arquivos.update(glob(entrada))
+        else:
+            # Arquivo citado diretamente: se não existir, o erro aparece no resumo
+            arquivos.add(entrada)
+    return sorted(arquivo for arquivo in arquivos if not os.path.basename(arquivo).startswith('~$'))
+
+
+def _pastas_saida(arquivos, pasta_saida):
+    """Subpasta de saída de cada arquivo (nome do arquivo; com sufixo se o nome se repetir)"""
+    pastas = {}
+    usados = {}
+    for arquivo in arquivos:
+        nome = os.path.splitext(os.path.basename(arquivo))[0]
+        usados[nome] = usados.get(nome, 0) + 1
+        if usados[nome] > 1:
+            nome = f"{nome}_{usados[nome]}"
+        pastas[arquivo] = os.path.join(pasta_saida, nome)
+    return pastas
+
+
+def _processar_no_lote(arquivo, pasta_arquivo, janela_dias, dpi=DPI_PADRAO, formato_graficos='png', formato_dados=None):
+    """
+    Executado em cada processo do lote: processa um arquivo e devolve o seu resumo
+
+    Erros ficam registrados no resumo, sem interromper os outros arquivos. As
+    mensagens do processamento vão para processamento.log na pasta do arquivo.
+
+    Returns:
+        Tupla (dicionário de resumo, estatísticas por médico ou None)
+    """
+    inicio = time.perf_counter()
+    resumo = {'Arquivo': arquivo, 'Mês': '', 'Atendimentos Médicos': 0, 'Passou pelo Técnico': 0,
+              'Não Passou pelo Técnico': 0, 'Situação': 'OK', 'Erro': '', 'Pasta de Saída': pasta_arquivo}
+    stats = None
+    try:
+        os.makedirs(pasta_arquivo, exist_ok=True)
+        with open(os.path.join(pasta_arquivo, 'processamento.log'), 'w', encoding='utf-8') as log, \
+                redirect_stdout(log), redirect_stderr(log):
+            # Um processo por arquivo: as abas de cada arquivo são lidas sem outro pool
+            df_medicos, stats = processar_arquivo(
+                arquivo,
+                pasta_graficos=os.path.join(pasta_arquivo, 'graficos'),
+                nome_planilha_saida=os.path.join(pasta_arquivo, 'cruzamento_atendimentos.xlsx'),
+                janela_dias=janela_dias,
+                workers=1,
+                dpi=dpi,
+                formato_graficos=formato_graficos,
+                formato_dados=formato_dados
+            )
+        passou = int(df_medicos['Passou_Pelo_Tecnico'].sum())
+        resumo.update({
+            'Mês': str(df_medicos['Mês'].iloc[0]),
+            'Atendimentos Médicos': len(df_medicos),
+            'Passou pelo Técnico': passou,
+            'Não Passou pelo Técnico': len(df_medicos) - passou,
+        })
+    except Exception as e:
+        resumo.update({'Situação': 'Erro', 'Erro': f"{type(e).__name__}: {e}"})
+        stats = None
+
+    resumo['Tempo (s)'] = round(time.perf_counter() - inicio, 2)
+    return resumo, stats
+
+
+def gerar_resumo_lote(resumos, estatisticas, nome_arquivo_saida):
+    """
+    Gera a planilha de resumo do lote
+
+    Args:
+        resumos: Lista de dicionários de resumo (um por arquivo)
+        estatisticas: {arquivo: estatísticas por médico} dos arquivos processados
+        nome_arquivo_saida: Caminho da planilha
+    """
+    df_resumo = pd.DataFrame(resumos)
+    df_resumo['% Passou pelo Técnico'] = (
+        df_resumo['Passou pelo Técnico'] / df_resumo['Atendimentos Médicos'].where(df_resumo['Atendimentos Médicos'] > 0) * 100
+    ).round(2)
+    meses = df_resumo.set_index('Arquivo')['Mês'].to_dict()
+
+    partes = [
+        stats.reset_index().assign(Arquivo=arquivo, **{'Mês': meses.get(arquivo, '')})
+        for arquivo, stats in estatisticas.items()
+    ]
+    df_medicos = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=['Arquivo', 'Mês', 'Profissional'])
+    df_medicos = df_medicos.rename(columns={
+        'Profissional': 'Médico',
+        'Total_Atendimentos': 'Total de Atendimentos',
+        'Passou_Pelo_Tecnico': 'Passou pelo Técnico',
+        'Nao_Passou_Pelo_Tecnico': 'Não Passou pelo Técnico',
+        'Percentual_Passou': '% Passou pelo Técnico',
+        'Percentual_Nao_Passou': '% Não Passou pelo Técnico'
+    })
+    colunas = ['Arquivo', 'Mês', 'Médico']
+    df_medicos = df_medicos[colunas + [coluna for coluna in df_medicos.columns if coluna not in colunas]]
+
+    return escrever_planilha(nome_arquivo_saida, {
+        'Resumo por Arquivo': df_resumo,
+        'Estatísticas por Médico': df_medicos,
+    })
+
+
+def processar_lote(entradas, pasta_saida='saida_cruzamento', workers=None, janela_dias=0, dpi=DPI_PADRAO,
+                   formato_graficos='png', formato_dados=None):
+    """
+    Processa vários arquivos em paralelo (um processo por arquivo)
+
+    Cada arquivo gera a sua planilha e os seus gráficos em pasta_saida/<nome do
+    arquivo>/. Um arquivo com erro não interrompe os outros: o erro aparece no
+    resumo. No fim são gerados resumo_cruzamento.xlsx (todos os arquivos) e um
+    relatório de tempo.
+
+    Args:
+        entradas: Pastas, arquivos ou padrões (glob) com os arquivos .xlsx
+        pasta_saida: Pasta onde salvar as saídas
+        workers: Quantidade de processos (None usa LEITOR_XLSX_WORKERS ou o número de CPUs)
+        janela_dias: Quantos dias antes do médico o técnico ainda conta (0 = mesmo dia)
+        dpi: Resolução dos gráficos
+        formato_graficos: 'png', 'svg' ou 'pdf'
+        formato_dados: 'parquet' ou 'csv' para gravar também os atendimentos de cada arquivo
+
+    Returns:
+        DataFrame com o resumo de cada arquivo
+    """
+    arquivos = listar_planilhas(entradas)
+    if not arquivos:
+        raise ValueError(f"Nenhum arquivo .xlsx encontrado em: {', '.join(entradas)}")
+
+    workers = max(1, min(workers or WORKERS_PADRAO, len(arquivos)))
+    pastas = _pastas_saida(arquivos, pasta_saida)
+    os.makedirs(pasta_saida, exist_ok=True)
+
+    print(f"\n{'='*70}")
+    print(f"PROCESSANDO {len(arquivos)} ARQUIVO(S) COM {workers} PROCESSO(S)")
+    print(f"{'='*70}\n")
+
+    inicio = time.perf_counter()
+    resumos = {}
+    estatisticas = {}
+
+    def registrar(arquivo, resumo, stats):
+        resumos[arquivo] = resumo
+        if stats is not None:
+            estatisticas[arquivo] = stats
+        icone = '✅' if resumo['Situação'] == 'OK' else '❌'
+        detalhe = resumo['Mês'] if resumo['Situação'] == 'OK' else resumo['Erro']
+        print(f"{icone} [{len(resumos)}/{len(arquivos)}] {arquivo} ({resumo['Tempo (s)']:.1f}s) - {detalhe}")
+
+    if workers == 1:
+        for arquivo in arquivos:
+            registrar(arquivo, *_processar_no_lote(arquivo, pastas[arquivo], janela_dias, dpi,
+                                                 formato_graficos, formato_dados))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futuros = {
+                executor.submit(_processar_no_lote, arquivo, pastas[arquivo], janela_dias, dpi, formato_graficos,
+                                formato_dados): arquivo
+                for arquivo in arquivos
+            }
+            for futuro in as_completed(futuros):
+                arquivo = futuros[futuro]
+                try:
+                    resumo, stats = futuro.result()
+                except Exception as e:
+                    # O processo do arquivo terminou de forma anormal (ex.: falta de memória)
+                    resumo = {'Arquivo': arquivo, 'Mês': '', 'Atendimentos Médicos': 0, 'Passou pelo Técnico': 0,
+                              'Não Passou pelo Técnico': 0, 'Situação': 'Erro',
+                              'Erro': f"{type(e).__name__}: {e}", 'Pasta de Saída': pastas[arquivo], 'Tempo (s)': 0.0}
+                    stats = None
+                registrar(arquivo, resumo, stats)
+
+    tempo_total = time.perf_counter() - inicio
+
+    # Resumo na ordem dos arquivos (não na ordem em que terminaram)
+    lista_resumos = [resumos[arquivo] for arquivo in arquivos]
+    nome_resumo = gerar_resumo_lote(lista_resumos, {arquivo: estatisticas[arquivo] for arquivo in arquivos
+                                                   if arquivo in estatisticas},
+                                    os.path.join(pasta_saida, 'resumo_cruzamento.xlsx'))
+
+    # Relatório de tempo
+    df_resumo = pd.DataFrame(lista_resumos)
+    com_erro = int((df_resumo['Situação'] != 'OK').sum())
+    soma_tempos = df_resumo['Tempo (s)'].sum()
+    print(f"\n{'='*70}")
+    print("⏱️ RELATÓRIO DE TEMPO")
+    print(f"{'='*70}")
+    for resumo in sorted(lista_resumos, key=lambda resumo: resumo['Tempo (s)'], reverse=True):
+        print(f"   {resumo['Tempo (s)']:8.2f}s  {resumo['Arquivo']}")
+    print(f"\n   Arquivos: {len(arquivos)} ({len(arquivos) - com_erro} ok, {com_erro} com erro)")
+    print(f"   Tempo total: {tempo_total:.2f}s (soma dos arquivos: {soma_tempos:.2f}s, "
+          f"ganho com paralelismo: {soma_tempos / tempo_total if tempo_total > 0 else 1:.1f}x)")
+    print(f"   Resumo salvo em: {nome_resumo}")
+
+    return df_resumo
+
+
 if __name__ == "__main__":
-    # Exemplo de uso
+    # Exemplo de uso: python cruzaratendimento.py arquivo.xlsx [dias de janela]
+    import argparse
     import sys
     
-    if len(sys.argv) > 1:
-        arquivo = sys.argv[1]
-    else:
-        arquivo = input("Digite o nome do arquivo Excel: ").strip()
+    # Modo lote: python cruzaratendimento.py --lote <pasta ou padrão> [...] [opções]
+    if len(sys.argv) > 1 and sys.argv[1] == '--lote':
+        parser = argparse.ArgumentParser(prog='cruzaratendimento.py --lote',
+                                         description='Processa vários arquivos em paralelo')
+        parser.add_argument('entradas', nargs='+', help='Pastas, arquivos ou padrões (ex.: dados/*.xlsx)')
+        parser.add_argument('--janela', type=int, default=0, help='Dias antes do médico em que o técnico ainda conta')
+        parser.add_argument('--workers', type=int, default=None, help='Quantidade de processos')
+        parser.add_argument('--saida', default='saida_cruzamento', help='Pasta das saídas')
+        parser.add_argument('--dpi', type=int, default=DPI_PADRAO, help='Resolução dos gráficos')
+        parser.add_argument('--formato', choices=FORMATOS, default='png', help='Formato dos gráficos')
+        parser.add_argument('--dados', choices=FORMATOS_DADOS, help='Gravar também os atendimentos em Parquet ou CSV')
+        argumentos = parser.parse_args(sys.argv[2:])
+        
+        try:
+            df_resumo = processar_lote(argumentos.entradas, argumentos.saida, argumentos.workers, argumentos.janela,
+                                       argumentos.dpi, argumentos.formato, argumentos.dados)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        sys.exit(1 if (df_resumo['Situação'] != 'OK').any() else 0)
+    
+    parser = argparse.ArgumentParser(prog='cruzaratendimento.py', description='Cruza os atendimentos de um arquivo')
+    parser.add_argument('arquivo', nargs='?', help='Arquivo Excel')
+    parser.add_argument('janela', nargs='?', type=int, default=0, help='Dias antes do médico em que o técnico ainda conta')
+    parser.add_argument('--dpi', type=int, default=DPI_PADRAO, help='Resolução dos gráficos')
+    parser.add_argument('--formato', choices=FORMATOS, default='png', help='Formato dos gráficos')
+    parser.add_argument('--dados', choices=FORMATOS_DADOS, help='Gravar também os atendimentos em Parquet ou CSV')
+    argumentos = parser.parse_args()
+    
+    arquivo = argumentos.arquivo or input("Digite o nome do arquivo Excel: ").strip()
     
     if not arquivo:
         print("❌ Nome do arquivo não fornecido!")
         sys.exit(1)
     
     try:
-        df_medicos, stats = processar_arquivo(arquivo)
+        df_medicos, stats = processar_arquivo(arquivo, janela_dias=argumentos.janela, dpi=argumentos.dpi,
+                                              formato_graficos=argumentos.formato, formato_dados=argumentos.dados)
         
         print("\n📋 RESUMO DAS ESTATÍSTICAS:")
         print("=" * 70)
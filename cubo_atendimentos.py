@@ -0,0 +1,124 @@
+"""
+Cubo de contagens dos atendimentos, usado pelos gráficos e métricas do dashboard
+
+O cubo tem uma linha por combinação de Mês × Dia × Profissional × Papel ×
+Especialidade × Status_Consolidado que aparece nos dados, com a quantidade
+de atendimentos (groupby com observed=True, então só entram as combinações
+existentes). Ele é montado uma vez por conjunto de dados; os filtros da
+sidebar e cada gráfico filtram e somam o cubo, que tem bem menos linhas
+que os dados, em vez de percorrer os atendimentos. Papel depende só da
+Especialidade, então não aumenta o cubo.
+
+As colunas continuam categóricas, então filtros (isin) e somas (groupby)
+comparam códigos, como no DataFrame consolidado.
+"""
+import pandas as pd
+
+DIMENSOES_CUBO = ['Mês', 'Dia', 'Profissional', 'Papel', 'Especialidade', 'Status_Consolidado']
+
+COLUNA_QUANTIDADE = 'Quantidade'
+
+# Status consolidados usados nas métricas principais
+STATUS_REALIZADO = 'Atendimento realizado'
+STATUS_FALTOSO = 'Faltoso'
+STATUS_EVADIDO = 'Evadido'
+
+
+def montar_cubo(df, dimensoes=DIMENSOES_CUBO):
+    """
+    Quantidade de atendimentos por combinação das dimensões
+
+    Args:
+        df: DataFrame consolidado
+        dimensoes: Colunas do cubo (as que não existirem em df são ignoradas)
+
+    Returns:
+        DataFrame com as dimensões e a coluna Quantidade
+    """
+    dimensoes = [coluna for coluna in dimensoes if coluna in df.columns]
+    # dropna=False: linhas com alguma dimensão vazia também entram nos totais
+    return (df.groupby(dimensoes, observed=True, dropna=False, sort=False)
+              .size()
+              .reset_index(name=COLUNA_QUANTIDADE))
+
+
+def filtrar_cubo(cubo, filtros):
+    """
+    Linhas do cubo que atendem aos filtros ({coluna: valores selecionados})
+
+    Equivale a filtrar os atendimentos e montar o cubo de novo.
+    """
+    condicao = pd.Series(True, index=cubo.index)
+    for coluna, valores in filtros.items():
+        condicao &= cubo[coluna].isin(valores)
+    return cubo[condicao]
+
+
+def contar(cubo, por=None, **condicoes):
+    """
+    Soma das quantidades do cubo
+
+    Args:
+        cubo: Cubo (ou parte dele, já filtrada)
+        por: Coluna ou lista de colunas para agrupar (None = total)
+        **condicoes: Valor exigido em cada coluna (ex.: Status_Consolidado='Faltoso')
+
+    Returns:
+        Total (int) sem por; senão Série com a quantidade por grupo, na mesma
+        ordem e com os mesmos grupos de df.groupby(por, observed=True).size()
+    """
+    for coluna, valor in condicoes.items():
+        cubo = cubo[cubo[coluna] == valor]
+
+    if por is None:
+        return int(cubo[COLUNA_QUANTIDADE].sum())
+
+    return cubo.groupby(por, observed=True)[COLUNA_QUANTIDADE].sum()
+
+
+def indicadores(cubo):
+    """
+    Métricas principais do dashboard, em uma única passada pelo cubo
+
+    Um groupby por Profissional × Status_Consolidado dá a tabela cruzada;
+    os totais por status e o total geral saem das somas dessa tabela.
+
+    Args:
+        cubo: Cubo já filtrado
+
+    Returns:
+        Dicionário com realizados, faltosos, evadidos, registros, dias,
+        media_por_dia, percentual_faltosos, percentual_evadidos e
+        por_profissional (DataFrame: uma linha por profissional, na ordem das
+        categorias, uma coluna por status e a coluna Total)
+    """
+    cruzada = (cubo.groupby(['Profissional', 'Status_Consolidado'], observed=True, dropna=False)[COLUNA_QUANTIDADE]
+                   .sum()
+                   .unstack(fill_value=0)
+                   .rename_axis(columns=None))
+    por_status = cruzada.sum()
+    cruzada['Total'] = cruzada.sum(axis=1)
+
+    def total_status(status):
+        return int(por_status.get(status, 0))
+
+    registros = int(cruzada['Total'].sum())
+    realizados = total_status(STATUS_REALIZADO)
+    faltosos = total_status(STATUS_FALTOSO)
+    evadidos = total_status(STATUS_EVADIDO)
+    dias = cubo['Dia'].nunique()
+
+    # Linhas sem profissional contam nos totais, mas não na tabela por profissional
+    por_profissional = cruzada[cruzada.index.notna()]
+
+    return {
+        'realizados': realizados,
+        'faltosos': faltosos,
+        'evadidos': evadidos,
+        'registros': registros,
+        'dias': dias,
+        'media_por_dia': (realizados / dias) if dias > 0 else 0,
+        'percentual_faltosos': (faltosos / registros * 100) if registros > 0 else 0,
+        'percentual_evadidos': (evadidos / registros * 100) if registros > 0 else 0,
+        'por_profissional': por_profissional,
+    }
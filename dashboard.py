@@ -1,14 +1,29 @@
 """
 Dashboard de Produtividade - USF São Cristóvão
 """
+import os
 import pandas as pd
 import streamlit as st
 import altair as alt
-from io import BytesIO
-import re
 import matplotlib.pyplot as plt
 import matplotlib
 matplotlib.use('Agg')  # Para não precisar de interface gráfica
+from cache_planilha import caminho_arquivo, ler_cache, ler_metadados_cache, registrar_arquivo, salvar_cache
+from leitor_xlsx import PlanilhaSobDemanda
+from carregamento import adicionar_colunas_dia, adicionar_data_atendimento, consolidar_dados
+from cruzamento import TABELA_REGRAS, avaliar_regras, gerar_estatisticas_regras, marcar_passou_pelo_tecnico
+from especialidades import (PAPEL_MEDICO, PAPEL_MEDICO_ESF, PAPEL_TECNICO_ENFERMAGEM, PAPEL_TECNICO_ENFERMAGEM_ESF,
+                            classificar_especialidades)
+from indice_pacientes import FALTAS_RECORRENTES, IndicePacientes
+from cubo_atendimentos import contar, filtrar_cubo, indicadores, montar_cubo
+from indice_filtros import IndiceFiltros
+from status_atendimento import TABELA_STATUS, listar_status, marcar_realizados
+import historico
+
+# Fragmentos (st.fragment, Streamlit 1.37+) reexecutam só o próprio trecho quando
+# um controle dentro deles muda; em versões anteriores a página inteira é
+# reexecutada, como antes
+fragmento = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda funcao: funcao)
 
 # Configuração da página
 st.set_page_config(
@@ -24,151 +39,235 @@ with col_header1:
 with col_header2:
     if st.button("🔄 Recarregar Arquivo", key="btn_recarregar", help="Clique para carregar um novo arquivo"):
         # Limpar session_state relacionado ao arquivo
-        if 'arquivo_carregado' in st.session_state:
-            del st.session_state.arquivo_carregado
+        if 'hash_arquivo' in st.session_state:
+            del st.session_state.hash_arquivo
         if 'arquivo_nome' in st.session_state:
             del st.session_state.arquivo_nome
         st.rerun()
 
 st.markdown("---")
 
-# Função para carregar e consolidar dados e extrair mês
-@st.cache_data
-def carregar_dados(uploaded_file):
+# ========== FUNÇÕES DE CARREGAMENTO DOS DADOS ==========
+
+@st.cache_resource(max_entries=5, show_spinner=False)
+def abrir_planilha_sob_demanda(hash_arquivo):
+    """
+    Abre o arquivo registrado para leitura sob demanda das abas "Dia"
+    
+    Fica em cache pelo hash do arquivo e é compartilhada entre as sessões,
+    então cada aba é lida no máximo uma vez por arquivo. O arquivo é lido
+    da cópia guardada em disco (registrar_arquivo), não da memória da sessão.
     """
-    Carrega e consolida dados de todas as abas do Excel
+    return PlanilhaSobDemanda(caminho_arquivo(hash_arquivo), coluna_aba='Dia')
+
+def abrir_arquivo(hash_arquivo):
+    """
+    Lê apenas a estrutura do arquivo: lista de abas e mês (célula A1)
+    
+    Args:
+        hash_arquivo: Hash do arquivo, obtido em registrar_arquivo()
+    
+    Returns:
+        Tupla (lista de abas, mês ou None); (None, None) em caso de erro
     """
     try:
-        # Ler todas as abas
-        xls = pd.ExcelFile(uploaded_file)
-        
-        # Lista de nomes de meses em português
-        meses = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
-                 'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
-        
-        # Identificar aba de mês e extrair o mês
-        mes_do_arquivo = None
-        abas_conhecidas = ['Consolidado']
-        
-        for aba in xls.sheet_names:
-            # Se não começa com "Dia" e não é "Consolidado", pode ser uma aba de mês
-            if not aba.startswith("Dia") and aba not in abas_conhecidas:
-                try:
-                    # Ler apenas a primeira linha da coluna A
-                    df_mes = pd.read_excel(xls, sheet_name=aba, nrows=1, usecols=[0], header=None)
-                    if len(df_mes) > 0:
-                        valor_celula_a1 = df_mes.iloc[0, 0]
-                        
-                        # Tentar extrair o mês
-                        if pd.notna(valor_celula_a1):
-                            # Se for uma data (Timestamp)
-                            if isinstance(valor_celula_a1, pd.Timestamp) or hasattr(valor_celula_a1, 'month'):
-                                mes_numero = valor_celula_a1.month
-                                mes_do_arquivo = meses[mes_numero - 1]
-                            else:
-                                # Tentar converter string para data
-                                try:
-                                    data = pd.to_datetime(valor_celula_a1)
-                                    mes_numero = data.month
-                                    mes_do_arquivo = meses[mes_numero - 1]
-                                except:
-                                    # Verificar se é um mês em texto
-                                    valor_str = str(valor_celula_a1).strip()
-                                    if valor_str in meses:
-                                        mes_do_arquivo = valor_str
-                except:
-                    pass  # Ignorar erros na leitura da aba de mês
-        
-        dados_consolidados = []
-        
-        for aba in xls.sheet_names:
-            # Ignorar abas que não são de dias (ex: "Consolidado")
-            if aba.startswith("Dia"):
-                df = pd.read_excel(xls, sheet_name=aba)
-                
-                # Adicionar coluna Dia
-                df['Dia'] = aba
-                
-                # Adicionar coluna Mês se foi identificado
-                if mes_do_arquivo:
-                    df['Mês'] = mes_do_arquivo
-                else:
-                    df['Mês'] = 'Não informado'
-                
-                # Remover coluna Unnamed: 0 se existir
-                if 'Unnamed: 0' in df.columns:
-                    df = df.drop(columns=['Unnamed: 0'])
-                
-                dados_consolidados.append(df)
+        # Arquivo já processado antes: a estrutura está nos metadados do cache em disco
+        metadados = ler_metadados_cache(hash_arquivo)
+        if metadados is not None:
+            return metadados['abas'], metadados['mes']
+        
+        if caminho_arquivo(hash_arquivo) is None:
+            st.error("O arquivo não está mais disponível no servidor. Clique em 🔄 Recarregar Arquivo e envie-o novamente.")
+            return None, None
         
-        # Concatenar todos os DataFrames
-        df_consolidado = pd.concat(dados_consolidados, ignore_index=True)
+        planilha = abrir_planilha_sob_demanda(hash_arquivo)
+        return planilha.abas, planilha.mes
+    
+    except Exception as e:
+        st.error(f"Erro ao carregar arquivo: {str(e)}")
+        return None, None
+
+@st.cache_data(max_entries=20, show_spinner=False)
+def _ler_parquet_completo(hash_arquivo):
+    """DataFrame do mês inteiro guardado no cache em disco (ou None)"""
+    df_cache, _, _ = ler_cache(hash_arquivo)
+    return df_cache
+
+def _ler_cache_completo(hash_arquivo):
+    """
+    DataFrame do mês inteiro guardado no cache em disco (ou None)
+    
+    A ausência do cache não fica guardada no st.cache_data: o Parquet gravado
+    depois (quando o mês inteiro for lido) passa a ser usado neste processo.
+    """
+    if ler_metadados_cache(hash_arquivo) is None:
+        return None
+    return _ler_parquet_completo(hash_arquivo)
+
+@st.cache_data(max_entries=20, show_spinner=False)
+def _consolidar_abas(hash_arquivo, abas, _planilha):
+    """DataFrame consolidado das abas indicadas, em cache por arquivo e conjunto de abas"""
+    return consolidar_dados(_planilha.carregar(list(abas)), _planilha.mes)
+
+def carregar_dados(hash_arquivo, dias=None):
+    """
+    Carrega e consolida os dados das abas "Dia" do Excel
+    
+    As abas são lidas sob demanda: só os dias pedidos que ainda não foram lidos
+    são processados, e o DataFrame devolvido traz todos os dias já lidos deste
+    arquivo (os filtros da sidebar selecionam os dias exibidos). Quando o mês
+    inteiro foi lido, o resultado é guardado em disco (Parquet) pelo hash
+    SHA-256 do arquivo, e outras sessões ou o servidor reiniciado não precisam
+    ler o arquivo novamente.
+    
+    Ao carregar uma nova versão do mesmo arquivo (ex.: o mês exportado de novo
+    com um dia a mais), as abas que não mudaram vêm do cache por aba e só as
+    abas novas ou alteradas são lidas.
+    
+    Args:
+        hash_arquivo: Hash do arquivo, obtido em registrar_arquivo()
+        dias: Abas "Dia" necessárias (None = todas)
+    
+    Returns:
+        DataFrame consolidado ou None em caso de erro
+    """
+    try:
+        # Verificar se este arquivo já foi processado inteiro antes
+        df_cache = _ler_cache_completo(hash_arquivo)
+        if df_cache is not None:
+            return df_cache
         
-        # Limpar dados: tratar valores NaN e converter para string para evitar tipos mistos
-        df_consolidado['Profissional'] = df_consolidado['Profissional'].fillna('Não informado')
-        df_consolidado['Profissional'] = df_consolidado['Profissional'].astype(str).replace('nan', 'Não informado')
+        planilha = abrir_planilha_sob_demanda(hash_arquivo)
         
-        df_consolidado['Especialidade'] = df_consolidado['Especialidade'].fillna('Não informado')
-        df_consolidado['Especialidade'] = df_consolidado['Especialidade'].astype(str).replace('nan', 'Não informado')
+        # Dias pedidos + dias já lidos (a lista de profissionais/equipes não encolhe)
+        pedidas = set(planilha.abas_dia if dias is None else dias) | set(planilha.abas_lidas)
+        abas = tuple(aba for aba in planilha.abas_dia if aba in pedidas)
         
-        # Consolidar status: criar nova coluna Status_Consolidado
-        def consolidar_status(status):
-            if pd.isna(status):
-                return 'Não informado'
-            status_upper = str(status).upper()
-            
-            # Status que devem ser consolidados em "Atendimento realizado"
-            if status_upper in ['AGENDADO', 'AGUARDANDO ATENDIMENTO', 'ATENDIMENTO FINALIZADO', 
-                                'REALIZANDO PROCEDIMENTO/EXAME']:
-                return 'Atendimento realizado'
-            # Status que permanecem separados
-            elif status_upper == 'EVADIDO':
-                return 'Evadido'
-            elif status_upper == 'FALTOSO':
-                return 'Faltoso'
-            else:
-                return 'Atendimento realizado'  # Por padrão, outros status também consolidados
+        df_consolidado = _consolidar_abas(hash_arquivo, abas, planilha)
         
-        df_consolidado['Status_Consolidado'] = df_consolidado['Status'].apply(consolidar_status)
+        # Mês inteiro lido: guardar no cache em disco para as próximas cargas deste arquivo
+        if len(abas) == len(planilha.abas_dia) and ler_metadados_cache(hash_arquivo) is None:
+            salvar_cache(hash_arquivo, df_consolidado, planilha.abas, planilha.mes, planilha.impressoes)
         
-        return df_consolidado, xls.sheet_names
+        return df_consolidado
     
     except Exception as e:
         st.error(f"Erro ao carregar arquivo: {str(e)}")
-        return None, None
+        return None
 
-# ========== FUNÇÕES DE CRUZAMENTO DE ATENDIMENTOS ==========
+@st.cache_data(max_entries=20, show_spinner=False)
+def carregar_historico(meses, assinatura):
+    """
+    Lê do histórico apenas os meses indicados
+    
+    O filtro de mês é aplicado nas partições do dataset, então os outros
+    meses não são lidos para a memória da sessão. A assinatura
+    (historico.assinatura) entra na chave: um mês substituído ou acrescido
+    de outro arquivo é lido de novo.
+    """
+    return historico.consultar(meses=list(meses))
+
+def exibir_entrada_historico():
+    """
+    Mostra o upload de arquivos mensais para o histórico e a escolha dos meses
+    
+    Returns:
+        Lista com os meses escolhidos para análise (vazia se não houver histórico)
+    """
+    arquivos_novos = st.file_uploader(
+        "📁 Adicione arquivos Excel mensais ao histórico",
+        type=['xlsx'],
+        accept_multiple_files=True,
+        key="uploader_historico"
+    )
+    
+    # Arquivos já processados nesta sessão (o uploader os mantém entre os reruns)
+    if 'arquivos_historico' not in st.session_state:
+        st.session_state.arquivos_historico = set()
+    
+    for arquivo in arquivos_novos or []:
+        chave_arquivo = (arquivo.name, arquivo.size)
+        if chave_arquivo in st.session_state.arquivos_historico:
+            continue
+        
+        # Mês que já está no histórico (de outro arquivo): só substitui ou acrescenta se o usuário escolher
+        chave_botoes = f"{arquivo.name}_{arquivo.size}"
+        mes_existente = 'recusar'
+        if st.session_state.get(f"substituir_mes_{chave_botoes}"):
+            mes_existente = 'substituir'
+        elif st.session_state.get(f"acrescentar_mes_{chave_botoes}"):
+            mes_existente = 'acrescentar'
+        
+        try:
+            with st.spinner(f"🔄 Adicionando {arquivo.name} ao histórico..."):
+                mes, registros, adicionado = historico.adicionar_planilha(
+                    arquivo, nome=arquivo.name, mes_existente=mes_existente
+                )
+            if adicionado:
+                st.success(f"✅ {arquivo.name}: {registros} registros adicionados em {mes}")
+                carregar_historico.clear()
+            else:
+                st.info(f"ℹ️ {arquivo.name} já estava no histórico ({mes})")
+            st.session_state.arquivos_historico.add(chave_arquivo)
+        except historico.MesJaNoHistorico as e:
+            st.warning(f"⚠️ {arquivo.name}: {e}")
+            col_substituir, col_acrescentar = st.columns(2)
+            with col_substituir:
+                st.button(f"🔁 Substituir {e.mes}", key=f"substituir_mes_{chave_botoes}")
+            with col_acrescentar:
+                st.button(f"➕ Acrescentar a {e.mes} (outra unidade)", key=f"acrescentar_mes_{chave_botoes}")
+        except Exception as e:
+            st.error(f"Erro ao adicionar {arquivo.name}: {str(e)}")
+    
+    meses_disponiveis = historico.listar_meses()
+    if len(meses_disponiveis) == 0:
+        st.info("👆 Adicione arquivos Excel ao histórico para começar a análise.")
+        return []
+    
+    st.sidebar.subheader("🗄️ Histórico")
+    meses = st.sidebar.multiselect(
+        "Meses para análise:",
+        options=meses_disponiveis,
+        default=meses_disponiveis[-1:],
+        key="multiselect_meses_historico",
+        placeholder="Selecione os meses..."
+    )
+    st.sidebar.caption(f"🗄️ {len(meses)} de {len(meses_disponiveis)} mês(es) do histórico carregado(s)")
+    st.sidebar.markdown("---")
+    
+    # Ao trocar os meses carregados, o filtro de mês volta a marcar todos eles
+    if st.session_state.get('meses_historico_carregados') != meses:
+        st.session_state.meses_historico_carregados = meses
+        st.session_state.pop('meses_selecionados', None)
+        st.session_state.pop('multiselect_meses', None)
+    
+    return meses
 
-def extrair_dia_aba(nome_aba):
-    """Extrai o número do dia do nome da aba (ex: 'Dia 01' -> 1, 'Dia 24' -> 24)"""
-    match = re.search(r'[Dd]ia\s*(\d+)', nome_aba)
-    if match:
-        return int(match.group(1))
-    return None
+# ========== FUNÇÕES DE CRUZAMENTO DE ATENDIMENTOS ==========
 
 def preparar_dados_para_cruzamento(df):
     """
     Prepara os dados do DataFrame do dashboard para o cruzamento,
-    adicionando coluna Dia_Atendimento extraída do nome da aba
+    adicionando coluna Dia_Atendimento extraída do nome da aba e
+    Data_Atendimento (dia + mês, em dias) para a janela de dias
     """
     df_cruzamento = df.copy()
     
     # Criar coluna Dia_Atendimento a partir da coluna Dia (nome da aba)
-    def extrair_dia_atendimento(nome_aba):
-        dia_num = extrair_dia_aba(nome_aba)
-        if dia_num:
-            return f"Dia {dia_num:02d}"
-        return nome_aba
-    
     if 'Dia' in df_cruzamento.columns:
-        df_cruzamento['Dia_Atendimento'] = df_cruzamento['Dia'].apply(extrair_dia_atendimento)
+        adicionar_colunas_dia(df_cruzamento, coluna_aba='Dia')
+        adicionar_data_atendimento(df_cruzamento, coluna_aba='Dia')
+        
+        # Com vários meses do histórico, "Dia 01" de meses diferentes não é o mesmo dia
+        if 'Mês' in df_cruzamento.columns and df_cruzamento['Mês'].nunique() > 1:
+            df_cruzamento['Dia_Atendimento'] = df_cruzamento['Mês'].astype(str) + ' - ' + df_cruzamento['Dia_Atendimento'].astype(str)
     
     return df_cruzamento
 
-def cruzar_atendimentos_streamlit(df):
+def cruzar_atendimentos_streamlit(df, janela_dias=0):
     """
     Cruza os atendimentos para identificar quais pacientes foram ao médico
-    sem passar pelo técnico no mesmo dia
+    sem passar pelo técnico no mesmo dia (ou nos janela_dias dias anteriores)
     
     IMPORTANTE: Considera apenas atendimentos REALIZADOS (status: 
     'ATENDIMENTO FINALIZADO' ou 'REALIZANDO PROCEDIMENTO/EXAME')
@@ -183,87 +282,66 @@ def cruzar_atendimentos_streamlit(df):
     if colunas_faltando:
         return None, None, None, f"Colunas faltando: {', '.join(colunas_faltando)}"
     
-    # Buscar especialidades de técnico e médico de forma flexível
-    especialidades_unicas = df_prep['Especialidade'].dropna().unique()
-    
-    # Buscar especialidade de médico (case-insensitive, busca parcial)
-    especialidade_medico = None
-    especialidade_tecnico = None
-    
-    for esp in especialidades_unicas:
-        esp_upper = str(esp).upper()
-        if 'MEDICO' in esp_upper or 'MÉDICO' in esp_upper or 'MEDICINA' in esp_upper:
-            if 'FAMILIA' in esp_upper or 'FAMÍLIA' in esp_upper or 'ESF' in esp_upper:
-                especialidade_medico = esp
-        if 'TECNICO' in esp_upper or 'TÉCNICO' in esp_upper:
-            if 'ENFERMAGEM' in esp_upper:
-                if 'FAMILIA' in esp_upper or 'FAMÍLIA' in esp_upper or 'ESF' in esp_upper:
-                    especialidade_tecnico = esp
-    
-    # Se não encontrou, tentar padrões mais específicos
-    if not especialidade_medico:
-        for esp in especialidades_unicas:
-            esp_upper = str(esp).upper()
-            if 'MEDICO' in esp_upper or 'MÉDICO' in esp_upper:
-                especialidade_medico = esp
-                break
-    
-    if not especialidade_tecnico:
-        for esp in especialidades_unicas:
-            esp_upper = str(esp).upper()
-            if 'TECNICO' in esp_upper or 'TÉCNICO' in esp_upper:
-                especialidade_tecnico = esp
-                break
-    
-    if not especialidade_medico:
-        return None, None, None, f"Especialidade de médico não encontrada. Especialidades disponíveis: {', '.join([str(e) for e in especialidades_unicas[:10]])}"
+    # Papéis de médico e técnico (especialidades.py: nomes comparados sem acentos e
+    # maiúsculas). Normalmente a coluna Papel já vem da carga dos dados.
+    if 'Papel' not in df_prep.columns:
+        df_prep['Papel'] = classificar_especialidades(df_prep['Especialidade'])
+    papeis_presentes = set(df_prep['Papel'].dropna().unique())
+    
+    # Preferir os papéis da Estratégia de Saúde da Família; senão, qualquer médico/técnico de enfermagem
+    papel_medico = next((papel for papel in (PAPEL_MEDICO_ESF, PAPEL_MEDICO) if papel in papeis_presentes), None)
+    papel_tecnico = next((papel for papel in (PAPEL_TECNICO_ENFERMAGEM_ESF, PAPEL_TECNICO_ENFERMAGEM)
+                          if papel in papeis_presentes), None)
     
-    # Status que indicam atendimento realizado (case-insensitive)
-    status_realizados = ['ATENDIMENTO FINALIZADO', 'REALIZANDO PROCEDIMENTO/EXAME']
+    if not papel_medico:
+        especialidades_unicas = df_prep['Especialidade'].dropna().unique()
+        return None, None, None, f"Especialidade de médico não encontrada. Especialidades disponíveis: {', '.join([str(e) for e in especialidades_unicas[:10]])}"
     
-    # Converter Status para string e fazer comparação case-insensitive
-    df_prep['Status_Upper'] = df_prep['Status'].astype(str).str.upper()
-    status_realizados_upper = [s.upper() for s in status_realizados]
+    # Status que indicam atendimento realizado (tabela status_atendimento.csv,
+    # comparação sem diferenciar maiúsculas); normalmente já vem da carga dos dados
+    if 'Realizado' not in df_prep.columns:
+        df_prep['Realizado'] = marcar_realizados(df_prep['Status'])
     
     # Filtrar apenas atendimentos de médico que foram REALIZADOS
     df_medicos = df_prep[
-        (df_prep['Especialidade'] == especialidade_medico) &
-        (df_prep['Status_Upper'].isin(status_realizados_upper))
+        (df_prep['Papel'] == papel_medico) &
+        df_prep['Realizado']
     ].copy()
     
     if len(df_medicos) == 0:
         # Verificar se há médicos mas sem status realizado
-        total_medicos = len(df_prep[df_prep['Especialidade'] == especialidade_medico])
-        status_medicos = df_prep[df_prep['Especialidade'] == especialidade_medico]['Status'].value_counts().to_dict()
+        total_medicos = len(df_prep[df_prep['Papel'] == papel_medico])
+        status_medicos = df_prep[df_prep['Papel'] == papel_medico]['Status'].value_counts()
+        # Em colunas categóricas o value_counts lista também as categorias sem registros
+        status_medicos = status_medicos[status_medicos > 0].to_dict()
         return None, None, None, f"Nenhum atendimento médico realizado encontrado. Total de registros médicos: {total_medicos}. Status encontrados: {status_medicos}"
     
     # Filtrar atendimentos de técnico que foram REALIZADOS
-    if especialidade_tecnico:
+    if papel_tecnico:
         df_tecnicos = df_prep[
-            (df_prep['Especialidade'] == especialidade_tecnico) &
-            (df_prep['Status_Upper'].isin(status_realizados_upper))
+            (df_prep['Papel'] == papel_tecnico) &
+            df_prep['Realizado']
         ].copy()
     else:
         df_tecnicos = pd.DataFrame()
     
-    # Função para verificar se passou pelo técnico
-    def verificar_passou_tecnico(row):
-        prontuario = row['Número Prontuário']
-        dia_atendimento = row['Dia_Atendimento']
-        
-        # Verificar se existe atendimento do técnico para o mesmo paciente no mesmo dia
-        passou = len(df_tecnicos[
-            (df_tecnicos['Número Prontuário'] == prontuario) &
-            (df_tecnicos['Dia_Atendimento'] == dia_atendimento)
-        ]) > 0
-        
-        return passou
-    
-    # Aplicar verificação
-    df_medicos['Passou_Pelo_Tecnico'] = df_medicos.apply(verificar_passou_tecnico, axis=1)
+    # Mesmo dia: o indicador Passou_Pelo_Tecnico já vem calculado na carga dos dados
+    # (para os papéis da Estratégia de Saúde da Família). Senão, verificar se existe atendimento do técnico
+    # para o mesmo paciente no mesmo dia (junção pelas chaves prontuário + dia, sem
+    # percorrer os técnicos para cada médico) ou, com janela, nos dias anteriores
+    # (junção as-of pela data)
+    indicador_pronto = (
+        janela_dias == 0 and 'Passou_Pelo_Tecnico' in df_medicos.columns and
+        papel_medico == PAPEL_MEDICO_ESF and papel_tecnico == PAPEL_TECNICO_ENFERMAGEM_ESF
+    )
+    if not indicador_pronto:
+        df_medicos['Passou_Pelo_Tecnico'] = marcar_passou_pelo_tecnico(df_medicos, df_tecnicos, janela_dias)
     
-    # Gerar estatísticas
-    stats = df_medicos.groupby('Profissional').agg({
+    return df_medicos, gerar_estatisticas_cruzamento(df_medicos), df_tecnicos, None
+
+def gerar_estatisticas_cruzamento(df_medicos):
+    """Estatísticas por médico do cruzamento (total, passou e não passou pelo técnico)"""
+    stats = df_medicos.groupby('Profissional', observed=True).agg({
         'Número Prontuário': 'count',
         'Passou_Pelo_Tecnico': lambda x: (x == True).sum(),
     }).rename(columns={
@@ -276,31 +354,265 @@ def cruzar_atendimentos_streamlit(df):
     stats['Percentual_Nao_Passou'] = (stats['Nao_Passou_Pelo_Tecnico'] / stats['Total_Atendimentos'] * 100).round(2)
     stats = stats.sort_values('Total_Atendimentos', ascending=False)
     
-    return df_medicos, stats, df_tecnicos, None
+    return stats
+
+def versao_tabelas_regras():
+    """Data de modificação das tabelas de status e de regras de percurso (entra na chave do cache)"""
+    return os.path.getmtime(TABELA_STATUS), os.path.getmtime(TABELA_REGRAS)
+
+@st.cache_data(max_entries=10, show_spinner=False)
+def calcular_cruzamento(chave_dados, janela_dias, versao_tabelas, _df):
+    """
+    Cruzamento médico/técnico e regras de percurso, em cache
+    
+    O resultado fica em cache pela identificação dos dados (hash do arquivo ou
+    hashes dos arquivos dos meses do histórico), pela janela de dias e pela
+    versão das tabelas de regras: os reruns causados por outros widgets
+    (gráficos, filtros, seleção de médicos) não refazem o cruzamento nem
+    copiam o DataFrame de novo. O DataFrame (_df) não entra na chave. Guarda
+    no máximo 10 resultados.
+    
+    Os filtros da sidebar são aplicados depois, sobre o resultado (ver
+    exibir_pagina_cruzamento), então o cruzamento sempre enxerga todos os
+    atendimentos (ex.: os técnicos, mesmo com só os médicos selecionados).
+    
+    Returns:
+        Tupla (resultado de cruzar_atendimentos_streamlit, regras de percurso
+        avaliadas linha a linha ou None se faltarem colunas)
+    """
+    resultado = cruzar_atendimentos_streamlit(_df, janela_dias)
+    
+    regras_avaliadas = None
+    if {'Número Prontuário', 'Dia', 'Profissional', 'Especialidade', 'Status'}.issubset(_df.columns):
+        regras_avaliadas = avaliar_regras(preparar_dados_para_cruzamento(_df))
+    
+    return resultado, regras_avaliadas
+
+@st.cache_data(max_entries=20, show_spinner=False)
+def calcular_cubo(chave_dados, dias, versao_tabelas, _df):
+    """
+    Cubo de contagens (cubo_atendimentos) dos dados, em cache
+    
+    A chave é a identificação dos dados, os dias já carregados (no modo
+    arquivo o DataFrame cresce conforme os dias são lidos) e a versão das
+    tabelas de regras. Os filtros e gráficos da aba principal filtram e somam
+    o cubo em vez de percorrer os atendimentos a cada rerun.
+    """
+    return montar_cubo(_df)
+
+@st.cache_data(max_entries=50, show_spinner=False)
+def calcular_indicadores(chave_dados, dias, versao_tabelas, filtros, _cubo_filtrado):
+    """
+    Métricas principais (cubo_atendimentos.indicadores) do cubo filtrado, em cache
+    
+    A chave é a do cubo mais o estado dos filtros: voltar a uma combinação de
+    filtros já vista, ou rerun sem mudar filtros, não recalcula nada.
+    """
+    return indicadores(_cubo_filtrado)
+
+def percentual_por_profissional(por_profissional, status, coluna_quantidade):
+    """
+    Tabela dos expanders de faltosos/evadidos: quantidade e percentual do status por profissional
+    
+    Args:
+        por_profissional: Tabela cruzada de indicadores() (profissional × status, com Total)
+        status: Status consolidado (ex.: 'Faltoso')
+        coluna_quantidade: Nome da coluna da quantidade na tabela exibida
+    """
+    if status not in por_profissional.columns:
+        return pd.DataFrame(columns=['Profissional', coluna_quantidade, 'Percentual (%)'])
+    tabela = por_profissional.loc[por_profissional[status] > 0, [status, 'Total']].reset_index()
+    tabela['Percentual (%)'] = (tabela[status] / tabela['Total'] * 100).round(2)
+    tabela = tabela.sort_values('Percentual (%)', ascending=False)
+    return tabela[['Profissional', status, 'Percentual (%)']].rename(columns={status: coluna_quantidade})
+
+@st.cache_resource(max_entries=10, show_spinner=False)
+def montar_indice_filtros(chave_dados, dias, versao_tabelas, _df):
+    """
+    Índice de bitmaps dos filtros da sidebar (indice_filtros), em cache
+    
+    Mesma chave do cubo. Compartilhado entre as sessões, pois só é lido; as
+    combinações de filtros já usadas ficam guardadas no próprio índice.
+    """
+    return IndiceFiltros(_df)
+
+def dias_presentes(df):
+    """Dias presentes em df (Dia é categórica com os dias lidos: não percorre as linhas)"""
+    if isinstance(df['Dia'].dtype, pd.CategoricalDtype):
+        return tuple(df['Dia'].cat.categories)
+    return tuple(df['Dia'].unique().tolist())
+
+def obter_indice_filtros(chave_dados, dias, df):
+    """Índice de filtros de df; o do cache é montado de novo se não tiver as linhas de df"""
+    indice = montar_indice_filtros(chave_dados, dias, versao_tabelas_regras(), df)
+    if indice.linhas != len(df):
+        # Índice em cache montado com outros dados: as posições não valem para df
+        montar_indice_filtros.clear()
+        indice = montar_indice_filtros(chave_dados, dias, versao_tabelas_regras(), df)
+    return indice
+
+@fragmento
+def exibir_detalhe_regra(estatisticas):
+    """Tabela por profissional da regra de percurso escolhida (fragmento: trocar a regra não reexecuta a página)"""
+    regra = st.selectbox("Detalhar regra por profissional:", options=list(estatisticas), key="regra_percurso")
+    st.dataframe(
+        estatisticas[regra].reset_index().rename(columns={
+            'Total_Atendimentos': 'Total de Atendimentos',
+            'Nao_Passou': 'Não Passou',
+            'Percentual_Passou': '% Passou',
+            'Percentual_Nao_Passou': '% Não Passou'
+        }),
+        use_container_width=True,
+        hide_index=True
+    )
+
+def exibir_regras_percurso(estatisticas):
+    """Exibe o resultado de todas as regras de percurso (tabela regras_percurso.csv)"""
+    st.subheader("📐 Regras de Percurso")
+    st.caption("Cada regra verifica se o paciente atendido por um papel (ex.: Médico ESF) também foi atendido "
+               "pelo papel exigido no mesmo dia (regras na tabela regras_percurso.csv).")
+    
+    if estatisticas is None:
+        st.info("Os dados não têm as colunas necessárias para avaliar as regras.")
+        return
+    
+    if not estatisticas:
+        st.info("Nenhum atendimento realizado das especialidades das regras.")
+        return
+    
+    # Resumo: uma linha por regra
+    resumo = pd.DataFrame([
+        {
+            'Regra': regra,
+            'Atendimentos': int(stats['Total_Atendimentos'].sum()),
+            'Passou': int(stats['Passou'].sum()),
+            'Não Passou': int(stats['Nao_Passou'].sum()),
+        }
+        for regra, stats in estatisticas.items()
+    ])
+    resumo['% Passou'] = (resumo['Passou'] / resumo['Atendimentos'] * 100).round(2)
+    st.dataframe(resumo, use_container_width=True, hide_index=True)
+    
+    exibir_detalhe_regra(estatisticas)
+
+@fragmento
+def exibir_graficos_medicos(stats):
+    """
+    Gráficos e métricas individuais dos médicos escolhidos
+    
+    Fragmento: mudar a seleção de médicos reexecuta só esta parte, com as
+    estatísticas (stats, de gerar_estatisticas_cruzamento) da última execução.
+    """
+    medicos_selecionados = st.multiselect(
+        "Selecione os médicos para visualização individual:",
+        options=stats.index.tolist(),
+        default=stats.index.tolist()[:3] if len(stats) > 0 else []
+    )
+    
+    if len(medicos_selecionados) > 0:
+        cols = st.columns(min(len(medicos_selecionados), 3))
+        
+        for idx, medico in enumerate(medicos_selecionados):
+            col = cols[idx % 3]
+            
+            with col:
+                medico_stats = stats.loc[medico]
+                
+                # Dados para gráfico
+                dados_medico = pd.DataFrame({
+                    'Categoria': ['Passou pelo\nTécnico', 'Não Passou pelo\nTécnico'],
+                    'Quantidade': [
+                        medico_stats['Passou_Pelo_Tecnico'],
+                        medico_stats['Nao_Passou_Pelo_Tecnico']
+                    ]
+                })
+                
+                # Gráfico de barras
+                chart_medico = alt.Chart(dados_medico).mark_bar().encode(
+                    x=alt.X('Categoria:N', title=''),
+                    y=alt.Y('Quantidade:Q', title='Atendimentos'),
+                    color=alt.Color('Categoria:N',
+                                   scale=alt.Scale(domain=['Passou pelo\nTécnico', 'Não Passou pelo\nTécnico'],
+                                                  range=['#2ecc71', '#e74c3c']),
+                                   legend=None),
+                    tooltip=['Categoria', 'Quantidade']
+                ).properties(
+                    height=300,
+                    title=f"{medico[:30]}..." if len(medico) > 30 else medico
+                )
+                
+                st.altair_chart(chart_medico, use_container_width=True)
+                
+                # Métricas
+                st.metric("Total", int(medico_stats['Total_Atendimentos']))
+                st.metric("Passou", f"{int(medico_stats['Passou_Pelo_Tecnico'])} ({medico_stats['Percentual_Passou']}%)")
+                st.metric("Não Passou", f"{int(medico_stats['Nao_Passou_Pelo_Tecnico'])} ({medico_stats['Percentual_Nao_Passou']}%)")
 
-def exibir_pagina_cruzamento(df):
-    """Exibe a página de cruzamento de atendimentos no Streamlit"""
+def exibir_pagina_cruzamento(df, chave_dados, filtros=None):
+    """
+    Exibe a página de cruzamento de atendimentos no Streamlit
+    
+    Args:
+        df: DataFrame com os atendimentos
+        chave_dados: Identificação dos dados de df (hash do arquivo ou hashes
+            dos arquivos dos meses do histórico), usada no cache do cruzamento
+        filtros: Filtros da sidebar ({coluna: valores}), aplicados aos
+            atendimentos exibidos
+    """
     st.header("🔍 Cruzamento de Atendimentos")
-    st.markdown("""
+    st.markdown(f"""
     **Análise de Fluxo de Atendimento**
     
     Esta análise identifica pacientes que foram atendidos pelo **Médico da Estratégia de Saúde da Família**
     sem ter passado primeiro pelo **Técnico de Enfermagem da Estratégia de Saúde da Família** no mesmo dia.
     
-    ⚠️ **Importante:** Apenas atendimentos **REALIZADOS** são considerados (status: ATENDIMENTO FINALIZADO ou REALIZANDO PROCEDIMENTO/EXAME).
+    ⚠️ **Importante:** Apenas atendimentos **REALIZADOS** são considerados (status: {' ou '.join(listar_status(realizado=True))}).
     """)
     
+    janela_dias = st.number_input(
+        "Janela (dias antes do médico em que o técnico ainda conta):",
+        min_value=0,
+        max_value=31,
+        value=0,
+        step=1,
+        key="janela_dias_cruzamento",
+        help="0 = técnico no mesmo dia do médico. Com 2, por exemplo, vale também o técnico até 2 dias antes."
+    )
+    texto_periodo = "no mesmo dia" if janela_dias == 0 else f"no mesmo dia ou até {janela_dias} dia(s) antes"
+    
     st.markdown("---")
     
     # Processar cruzamento
     with st.spinner("🔄 Processando cruzamento de atendimentos..."):
-        resultado = cruzar_atendimentos_streamlit(df)
+        resultado, regras_avaliadas = calcular_cruzamento(chave_dados, janela_dias, versao_tabelas_regras(), df)
         if len(resultado) == 4:
             df_medicos, stats, df_tecnicos, mensagem_erro = resultado
         else:
             df_medicos, stats, df_tecnicos = resultado
             mensagem_erro = None
     
+    # Filtros da sidebar: só filtram e recontam as linhas já cruzadas. A máscara
+    # das linhas de df vem do índice de bitmaps; as regras avaliadas e os médicos
+    # guardam o índice (rótulo) da linha de df
+    if filtros:
+        filtradas = obter_indice_filtros(chave_dados, dias_presentes(df), df).mascara(filtros)
+    
+    estatisticas_regras = None
+    if regras_avaliadas is not None:
+        if filtros:
+            regras_avaliadas = regras_avaliadas[filtradas[df.index.get_indexer(regras_avaliadas['Linha'])]]
+        estatisticas_regras = gerar_estatisticas_regras(regras_avaliadas)
+    
+    if df_medicos is not None and filtros:
+        df_medicos = df_medicos[filtradas[df.index.get_indexer(df_medicos.index)]]
+        if len(df_medicos) == 0:
+            st.info("ℹ️ Nenhum atendimento médico realizado com os filtros selecionados na barra lateral.")
+            # As regras de percurso não dependem dos médicos: continuam sendo exibidas
+            st.markdown("---")
+            exibir_regras_percurso(estatisticas_regras)
+            return
+        stats = gerar_estatisticas_cruzamento(df_medicos)
+    
     if df_medicos is None:
         st.warning("⚠️ Nenhum atendimento médico realizado encontrado nos dados!")
         if mensagem_erro:
@@ -320,6 +632,8 @@ def exibir_pagina_cruzamento(df):
                     st.markdown("### 📋 Status encontrados:")
                     status = df['Status'].value_counts()
                     st.dataframe(status.reset_index().rename(columns={'index': 'Status', 'Status': 'Quantidade'}), hide_index=True)
+        st.markdown("---")
+        exibir_regras_percurso(estatisticas_regras)
         return
     
     # Métricas principais
@@ -399,56 +713,13 @@ def exibir_pagina_cruzamento(df):
     # Gráficos individuais por médico
     st.subheader("📊 Análise Individual por Médico")
     
-    medicos_selecionados = st.multiselect(
-        "Selecione os médicos para visualização individual:",
-        options=stats.index.tolist(),
-        default=stats.index.tolist()[:3] if len(stats) > 0 else []
-    )
-    
-    if len(medicos_selecionados) > 0:
-        cols = st.columns(min(len(medicos_selecionados), 3))
-        
-        for idx, medico in enumerate(medicos_selecionados):
-            col = cols[idx % 3]
-            
-            with col:
-                medico_stats = stats.loc[medico]
-                
-                # Dados para gráfico
-                dados_medico = pd.DataFrame({
-                    'Categoria': ['Passou pelo\nTécnico', 'Não Passou pelo\nTécnico'],
-                    'Quantidade': [
-                        medico_stats['Passou_Pelo_Tecnico'],
-                        medico_stats['Nao_Passou_Pelo_Tecnico']
-                    ]
-                })
-                
-                # Gráfico de barras
-                chart_medico = alt.Chart(dados_medico).mark_bar().encode(
-                    x=alt.X('Categoria:N', title=''),
-                    y=alt.Y('Quantidade:Q', title='Atendimentos'),
-                    color=alt.Color('Categoria:N',
-                                   scale=alt.Scale(domain=['Passou pelo\nTécnico', 'Não Passou pelo\nTécnico'],
-                                                  range=['#2ecc71', '#e74c3c']),
-                                   legend=None),
-                    tooltip=['Categoria', 'Quantidade']
-                ).properties(
-                    height=300,
-                    title=f"{medico[:30]}..." if len(medico) > 30 else medico
-                )
-                
-                st.altair_chart(chart_medico, use_container_width=True)
-                
-                # Métricas
-                st.metric("Total", int(medico_stats['Total_Atendimentos']))
-                st.metric("Passou", f"{int(medico_stats['Passou_Pelo_Tecnico'])} ({medico_stats['Percentual_Passou']}%)")
-                st.metric("Não Passou", f"{int(medico_stats['Nao_Passou_Pelo_Tecnico'])} ({medico_stats['Percentual_Nao_Passou']}%)")
+    exibir_graficos_medicos(stats)
     
     st.markdown("---")
     
     # Pacientes para investigação
     st.subheader("📋 Pacientes para Investigação")
-    st.markdown("Pacientes que foram ao médico sem passar pelo técnico no mesmo dia:")
+    st.markdown(f"Pacientes que foram ao médico sem passar pelo técnico {texto_periodo}:")
     
     # Filtrar apenas os que NÃO passaram pelo técnico
     df_nao_passou = df_medicos[df_medicos['Passou_Pelo_Tecnico'] == False].copy()
@@ -485,61 +756,457 @@ def exibir_pagina_cruzamento(df):
     
     st.markdown("---")
     
+    exibir_regras_percurso(estatisticas_regras)
+    
+    st.markdown("---")
+    
     # Informações adicionais
     with st.expander("ℹ️ Informações sobre o Filtro"):
-        st.markdown("""
+        status_considerados = '\n'.join(f"        - {status}" for status in listar_status(realizado=True))
+        status_excluidos = '\n'.join(f"        - {status}" for status in listar_status(realizado=False))
+        st.markdown(f"""
         **Status Considerados:**
-        - ATENDIMENTO FINALIZADO
-        - REALIZANDO PROCEDIMENTO/EXAME
+{status_considerados}
         
         **Status Excluídos:**
-        - AGENDADO
-        - AGUARDANDO ATENDIMENTO
-        - FALTOSO
-        - EVADIDO
+{status_excluidos}
         
         Apenas atendimentos **realizados** são considerados para garantir que os dados reflitam
         o fluxo real de atendimento dos pacientes.
         """)
 
-# Controlar se mostra o upload ou não
-mostrar_upload = True
-if 'arquivo_carregado' in st.session_state:
-    mostrar_upload = False
+# ========== GRÁFICOS DA ABA PRINCIPAL ==========
+# Cada gráfico com seu seletor de tipo é um fragmento: trocar o tipo reexecuta
+# só o fragmento, com os dados que recebeu na última execução da página, e não
+# o script inteiro (leitura, filtros da sidebar, outros gráficos).
 
-# Widget para upload de arquivo (só mostra se não houver arquivo carregado)
-uploaded_file = None
-if mostrar_upload:
-    uploaded_file = st.file_uploader(
-        "📁 Carregue o arquivo Excel com os dados de produtividade",
-        type=['xlsx', 'xls'],
-        key="file_uploader"
+@fragmento
+def exibir_grafico_profissionais(cubo_finalizados):
+    """Gráfico de atendimentos realizados por profissional, com seletor do tipo de gráfico"""
+    # Opção de tipo de gráfico acima do gráfico
+    tipo_grafico_profissional = st.selectbox(
+        "Tipo de gráfico:",
+        ["Barras", "Pizza", "Linhas"],
+        key="tipo_graf_prof",
+        index=0
     )
     
-    if uploaded_file is not None:
-        # Marcar que arquivo foi carregado (armazenar em bytes para persistir)
-        st.session_state.arquivo_carregado = uploaded_file.read()
-        st.session_state.arquivo_nome = uploaded_file.name
-        # Resetar posição do arquivo
-        uploaded_file.seek(0)
-        st.rerun()
-elif 'arquivo_carregado' in st.session_state:
-    # Recriar objeto UploadedFile a partir dos bytes armazenados
-    from io import BytesIO
-    uploaded_file = BytesIO(st.session_state.arquivo_carregado)
-    uploaded_file.name = st.session_state.get('arquivo_nome', 'arquivo.xlsx')
+    st.subheader("Atendimentos por Profissional")
+    
+    # Contagem por profissional
+    atendimentos_profissional = contar(cubo_finalizados, 'Profissional').reset_index(name='Qtd Atendimentos')
+    atendimentos_profissional = atendimentos_profissional.sort_values('Qtd Atendimentos', ascending=False)
+    
+    # Criar campo combinado com profissional e quantidade para a legenda (todos os tipos de gráfico)
+    atendimentos_profissional_com_legenda = atendimentos_profissional.copy()
+    atendimentos_profissional_com_legenda['Profissional_Completo'] = atendimentos_profissional_com_legenda.apply(
+        lambda row: f"{row['Profissional']} ({row['Qtd Atendimentos']} atendimentos)", 
+        axis=1
+    )
+    
+    # Criar gráfico baseado na seleção
+    if tipo_grafico_profissional == "Barras":
+        chart_profissional = alt.Chart(atendimentos_profissional_com_legenda).mark_bar().encode(
+            x=alt.X('Qtd Atendimentos:Q', title='Quantidade de Atendimentos'),
+            y=alt.Y('Profissional:N', sort='-x', title='Profissional'),
+            color=alt.Color('Qtd Atendimentos:Q', scale=alt.Scale(scheme='blues')),
+            tooltip=[alt.Tooltip('Profissional:N', title='Profissional'), 
+                    alt.Tooltip('Qtd Atendimentos:Q', title='Atendimentos')]
+        ).properties(height=400)
+    elif tipo_grafico_profissional == "Pizza":
+        chart_profissional = alt.Chart(atendimentos_profissional_com_legenda).mark_arc(innerRadius=0).encode(
+            theta=alt.Theta('Qtd Atendimentos:Q', stack=True),
+            color=alt.Color('Profissional_Completo:N', 
+                          scale=alt.Scale(scheme='category20'),
+                          legend=alt.Legend(title='Profissional', 
+                                          orient='right',
+                                          labelLimit=500,  # Valor alto para evitar truncamento
+                                          labelFontSize=14,  # Fonte maior
+                                          titleFontSize=16,  # Título da legenda maior
+                                          offset=10,  # Espaçamento próximo ao gráfico
+                                          padding=10,  # Espaçamento interno
+                                          columnPadding=5)),  # Espaçamento entre itens
+            tooltip=[alt.Tooltip('Profissional:N', title='Profissional'), 
+                    alt.Tooltip('Qtd Atendimentos:Q', title='Atendimentos')]
+        ).properties(height=400, width=500).configure_view(strokeWidth=0)
+    else:  # Linhas
+        chart_profissional = alt.Chart(atendimentos_profissional_com_legenda).mark_line(point=True).encode(
+            x=alt.X('Profissional:N', sort='-y', title='Profissional'),
+            y=alt.Y('Qtd Atendimentos:Q', title='Quantidade de Atendimentos'),
+            tooltip=[alt.Tooltip('Profissional:N', title='Profissional'), 
+                    alt.Tooltip('Qtd Atendimentos:Q', title='Atendimentos')]
+        ).properties(height=400)
+    
+    st.altair_chart(chart_profissional, use_container_width=True)
+    
+    # Estatísticas abaixo do gráfico
+    if len(atendimentos_profissional) > 0:
+        st.caption(f"📊 **Total:** {atendimentos_profissional['Qtd Atendimentos'].sum()} atendimentos | "
+                  f"**Média:** {atendimentos_profissional['Qtd Atendimentos'].mean():.1f} | "
+                  f"**Máximo:** {atendimentos_profissional['Qtd Atendimentos'].max()}")
+
+@fragmento
+def exibir_grafico_especialidades(cubo_finalizados):
+    """Gráfico de atendimentos realizados por especialidade, com seletor do tipo de gráfico"""
+    # Opção de tipo de gráfico acima do gráfico
+    tipo_grafico_equipe = st.selectbox(
+        "Tipo de gráfico:",
+        ["Barras", "Pizza", "Linhas"],
+        key="tipo_graf_equipe",
+        index=0
+    )
+    
+    st.subheader("Atendimentos por Especialidades")
+    
+    # Contagem por equipe (Especialidade)
+    atendimentos_equipe = contar(cubo_finalizados, 'Especialidade').reset_index(name='Qtd Atendimentos')
+    atendimentos_equipe = atendimentos_equipe.sort_values('Qtd Atendimentos', ascending=False)
+    
+    # Criar campo combinado com especialidade e quantidade para a legenda (todos os tipos de gráfico)
+    atendimentos_equipe_com_legenda = atendimentos_equipe.copy()
+    atendimentos_equipe_com_legenda['Especialidade_Completa'] = atendimentos_equipe_com_legenda.apply(
+        lambda row: f"{row['Especialidade']} ({row['Qtd Atendimentos']} atendimentos)", 
+        axis=1
+    )
+    
+    # Criar gráfico baseado na seleção
+    if tipo_grafico_equipe == "Barras":
+        chart_equipe = alt.Chart(atendimentos_equipe_com_legenda).mark_bar().encode(
+            x=alt.X('Qtd Atendimentos:Q', title='Quantidade de Atendimentos'),
+            y=alt.Y('Especialidade:N', sort='-x', title='Especialidade'),
+            color=alt.Color('Qtd Atendimentos:Q', scale=alt.Scale(scheme='greens')),
+            tooltip=[alt.Tooltip('Especialidade:N', title='Especialidade'), 
+                    alt.Tooltip('Qtd Atendimentos:Q', title='Atendimentos')]
+        ).properties(height=400)
+    elif tipo_grafico_equipe == "Pizza":
+        chart_equipe = alt.Chart(atendimentos_equipe_com_legenda).mark_arc(innerRadius=0).encode(
+            theta=alt.Theta('Qtd Atendimentos:Q', stack=True),
+            color=alt.Color('Especialidade_Completa:N', 
+                          scale=alt.Scale(scheme='category10'),
+                          legend=alt.Legend(title='Especialidade', 
+                                          orient='right',
+                                          labelLimit=500,  # Valor alto para evitar truncamento
+                                          labelFontSize=14,  # Fonte maior
+                                          titleFontSize=16,  # Título da legenda maior
+                                          offset=10,  # Espaçamento próximo ao gráfico
+                                          padding=10,  # Espaçamento interno
+                                          columnPadding=5)),  # Espaçamento entre itens
+            tooltip=[alt.Tooltip('Especialidade:N', title='Especialidade'), 
+                    alt.Tooltip('Qtd Atendimentos:Q', title='Atendimentos')]
+        ).properties(height=400, width=500).configure_view(strokeWidth=0)
+    else:  # Linhas
+        chart_equipe = alt.Chart(atendimentos_equipe_com_legenda).mark_line(point=True).encode(
+            x=alt.X('Especialidade:N', sort='-y', title='Especialidade'),
+            y=alt.Y('Qtd Atendimentos:Q', title='Quantidade de Atendimentos'),
+            tooltip=[alt.Tooltip('Especialidade:N', title='Especialidade'), 
+                    alt.Tooltip('Qtd Atendimentos:Q', title='Atendimentos')]
+        ).properties(height=400)
+    
+    st.altair_chart(chart_equipe, use_container_width=True)
+    
+    # Estatísticas abaixo do gráfico
+    if len(atendimentos_equipe) > 0:
+        st.caption(f"📊 **Total:** {atendimentos_equipe['Qtd Atendimentos'].sum()} atendimentos")
+
+@fragmento
+def exibir_grafico_evolucao(cubo_filtrado, cubo_finalizados, profissionais_selecionados):
+    """
+    Gráfico da evolução diária dos atendimentos realizados por profissional
+    
+    Args:
+        cubo_filtrado: Cubo com os filtros da sidebar (define os dias exibidos)
+        cubo_finalizados: Parte de cubo_filtrado com os atendimentos realizados
+        profissionais_selecionados: Profissionais escolhidos na sidebar (uma linha por profissional)
+    """
+    st.subheader("📈 Evolução dos Atendimentos por Dia")
+    
+    # Seletor de tipo de gráfico
+    tipo_grafico_temporal = st.selectbox(
+        "Tipo de gráfico:",
+        ["Linhas", "Barras"],
+        key="tipo_graf_temporal",
+        index=0
+    )
+    
+    # Obter todos os dias disponíveis nos dados filtrados (não apenas finalizados)
+    todos_dias_disponiveis = sorted(cubo_filtrado['Dia'].unique())
+    
+    # Contagem por dia e profissional (apenas finalizados)
+    atendimentos_por_dia_prof = contar(cubo_finalizados, ['Dia', 'Profissional']).reset_index(name='Qtd Atendimentos')
+    
+    # Criar estrutura completa: todos os dias x todos os profissionais
+    # Isso garante que todos os dias apareçam, mesmo sem atendimentos
+    from itertools import product
+    
+    if len(profissionais_selecionados) > 0 and len(todos_dias_disponiveis) > 0:
+        # Criar todas as combinações de dia e profissional
+        combinacoes = pd.DataFrame(
+            list(product(todos_dias_disponiveis, profissionais_selecionados)),
+            columns=['Dia', 'Profissional']
+        )
+        
+        # Fazer merge com os dados reais, preenchendo com 0 onde não houver dados
+        atendimentos_completo = combinacoes.merge(
+            atendimentos_por_dia_prof,
+            on=['Dia', 'Profissional'],
+            how='left'
+        ).fillna(0)
+        
+        # Garantir que Qtd Atendimentos seja inteiro
+        atendimentos_completo['Qtd Atendimentos'] = atendimentos_completo['Qtd Atendimentos'].astype(int)
+        
+        # Ordenar por dia
+        atendimentos_completo = atendimentos_completo.sort_values('Dia')
+        
+        # Calcular média para exibição
+        media_atendimentos = atendimentos_completo['Qtd Atendimentos'].mean() if len(atendimentos_completo) > 0 else 0
+        
+        # Criar gráfico baseado na seleção
+        if tipo_grafico_temporal == "Linhas":
+            # Criar gráfico base
+            chart_base = alt.Chart(atendimentos_completo).encode(
+                x=alt.X('Dia:N', sort='x', title='Dia'),
+                y=alt.Y('Qtd Atendimentos:Q', title='Quantidade de Atendimentos'),
+                tooltip=['Dia', 'Profissional', 'Qtd Atendimentos']
+            )
+            
+            # Linha para cada profissional (com cores diferentes)
+            chart_temporal = chart_base.mark_line(
+                point=True,
+                strokeWidth=3
+            ).encode(
+                color=alt.Color(
+                    'Profissional:N',
+                    scale=alt.Scale(scheme='category20'),
+                    legend=alt.Legend(title='Profissional', orient='right')
+                )
+            ).properties(
+                height=400,
+                width=800
+            )
+        else:  # Barras
+            # Gráfico de barras agrupadas por dia (lado a lado)
+            # No Altair, barras agrupadas são criadas usando x para categoria principal
+            # e color para subcategoria, o que automaticamente cria barras lado a lado
+            chart_temporal = alt.Chart(atendimentos_completo).mark_bar(
+                cornerRadiusTopLeft=3,
+                cornerRadiusTopRight=3
+            ).encode(
+                x=alt.X('Dia:N', sort='x', title='Dia', axis=alt.Axis(labelAngle=-45)),
+                y=alt.Y('Qtd Atendimentos:Q', title='Quantidade de Atendimentos', scale=alt.Scale(domain=[0, None])),
+                color=alt.Color(
+                    'Profissional:N',
+                    scale=alt.Scale(scheme='category20'),
+                    legend=alt.Legend(title='Profissional', orient='right')
+                ),
+                tooltip=['Dia', 'Profissional', 'Qtd Atendimentos']
+            ).properties(
+                height=400,
+                width=800
+            )
+        
+        st.altair_chart(chart_temporal, use_container_width=True)
+        
+        # Informações sobre os profissionais
+        num_profissionais = len(profissionais_selecionados)
+        if num_profissionais > 0:
+            st.caption(f"📊 **{num_profissionais} profissional(is) selecionado(s)** | "
+                      f"**Média de atendimentos por dia:** {media_atendimentos:.1f} | "
+                      f"**Total de dias:** {len(todos_dias_disponiveis)}")
+    else:
+        st.warning("Nenhum dado disponível para exibir o gráfico temporal.")
+
+@fragmento
+def exibir_dados_filtrados(df, indice_filtros, filtros):
+    """Tabela e CSV das linhas filtradas, montados só quando pedidos"""
+    with st.expander("📋 Visualizar Dados Filtrados"):
+        # Montar a tabela (e o CSV) só quando pedido: com vários meses são muitas linhas
+        if st.toggle("Mostrar os dados", key="mostrar_dados_filtrados"):
+            df_filtrado = df.iloc[indice_filtros.posicoes(filtros)]
+            st.dataframe(
+                df_filtrado,
+                use_container_width=True,
+                height=400
+            )
+            
+            # Botão para download
+            csv = df_filtrado.to_csv(index=False).encode('utf-8-sig')
+            st.download_button(
+                label="📥 Baixar dados filtrados (CSV)",
+                data=csv,
+                file_name="dados_filtrados.csv",
+                mime="text/csv"
+            )
+        else:
+            st.caption(f"{indice_filtros.contar(filtros)} registros com os filtros atuais")
+
+# ========== BUSCA DE PACIENTES ==========
+
+@st.cache_resource(max_entries=10, show_spinner=False)
+def montar_indice_pacientes(chave_dados, versao_tabelas, _df):
+    """
+    Índice de pacientes (indice_pacientes) dos dados, em cache
+    
+    Montado uma vez por arquivo ou conteúdo dos meses do histórico (e versão
+    das tabelas de regras) e compartilhado entre as sessões, pois só é lido.
+    As buscas fatiam o índice em vez de filtrar o DataFrame inteiro. O
+    DataFrame (_df) não entra na chave.
+    """
+    return IndicePacientes(_df)
+
+@fragmento
+def exibir_busca_paciente(df, indice, resumo):
+    """
+    Campo de busca e atendimentos do paciente encontrado
+    
+    Fragmento: digitar uma busca reexecuta só esta parte, com o índice e o
+    resumo (IndicePacientes.resumo()) da última execução.
+    """
+    texto = st.text_input(
+        "Prontuário ou nome do paciente:",
+        key="busca_paciente",
+        placeholder="Digite o prontuário ou parte do nome..."
+    )
+    
+    if texto.strip():
+        encontrados = indice.buscar(texto)
+        
+        if not encontrados:
+            st.info("Nenhum paciente encontrado.")
+        else:
+            if len(encontrados) > 1:
+                prontuario = st.selectbox(
+                    f"{len(encontrados)} pacientes encontrados:",
+                    options=encontrados,
+                    format_func=lambda prontuario: f"{prontuario} - {resumo.at[prontuario, 'Paciente']}",
+                    key="paciente_selecionado"
+                )
+            else:
+                prontuario = encontrados[0]
+            
+            dados_paciente = resumo.loc[prontuario]
+            st.subheader(f"{dados_paciente['Paciente']} (prontuário {prontuario})")
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Atendimentos", int(dados_paciente['Atendimentos']))
+            with col2:
+                st.metric("Realizados", int(dados_paciente['Realizados']))
+            with col3:
+                st.metric("Faltas", int(dados_paciente['Faltas']))
+            
+            if dados_paciente['Faltoso_Recorrente']:
+                st.warning(f"⚠️ Faltoso recorrente: {int(dados_paciente['Faltas'])} faltas no período.")
+            
+            # Atendimentos do paciente, em ordem de dia
+            atendimentos = indice.atendimentos_paciente(df, prontuario)
+            colunas = [coluna for coluna in ['Mês', 'Dia', 'Profissional', 'Especialidade', 'Status', 'Status_Consolidado']
+                       if coluna in atendimentos.columns]
+            st.dataframe(atendimentos[colunas], use_container_width=True, hide_index=True)
+
+def exibir_pagina_pacientes(df, chave_dados):
+    """
+    Exibe a busca de pacientes por prontuário ou nome
+    
+    Args:
+        df: DataFrame com os atendimentos (todos os dias, sem os filtros da sidebar)
+        chave_dados: Identificação dos dados de df, usada no cache do índice
+    """
+    st.header("👤 Busca de Paciente")
+    
+    if 'Número Prontuário' not in df.columns:
+        st.warning("⚠️ Os dados não têm a coluna 'Número Prontuário'.")
+        return
+    
+    indice = montar_indice_pacientes(chave_dados, versao_tabelas_regras(), df)
+    if indice.linhas != len(df):
+        # Índice em cache montado com outros dados: as posições não valem para df
+        montar_indice_pacientes.clear()
+        indice = montar_indice_pacientes(chave_dados, versao_tabelas_regras(), df)
+    resumo = indice.resumo()
+    faltosos = indice.faltosos_recorrentes()
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("Pacientes", len(indice))
+    with col2:
+        st.metric(f"Faltosos Recorrentes ({FALTAS_RECORRENTES} ou mais faltas)", len(faltosos))
+    
+    exibir_busca_paciente(df, indice, resumo)
+    
+    with st.expander(f"📋 Faltosos Recorrentes ({len(faltosos)})"):
+        st.dataframe(
+            faltosos.drop(columns='Faltoso_Recorrente').reset_index().rename(columns={'Número Prontuário': 'Prontuário'}),
+            use_container_width=True,
+            hide_index=True
+        )
+
+# ========== SEÇÕES DO DASHBOARD ==========
+SECAO_PRINCIPAL = "📊 Dashboard Principal"
+SECAO_CRUZAMENTO = "🔍 Cruzamento de Atendimentos"
+SECAO_PACIENTES = "👤 Pacientes"
+SECOES_DASHBOARD = [SECAO_PRINCIPAL, SECAO_CRUZAMENTO, SECAO_PACIENTES]
+
+# Controles de dentro das seções: o Streamlit apaga o estado de widgets que não
+# foram desenhados no rerun, então estes são mantidos enquanto a seção está fechada
+CONTROLES_SECOES = [
+    "tipo_graf_prof", "tipo_graf_equipe", "tipo_graf_temporal", "mostrar_dados_filtrados",
+    "janela_dias_cruzamento", "regra_percurso", "busca_paciente", "paciente_selecionado",
+]
+
+# ========== FONTE DOS DADOS ==========
+# "Arquivo": um arquivo Excel por vez | "Histórico": vários meses guardados em disco
+fonte_dados = st.sidebar.radio(
+    "🗂️ Fonte dos dados",
+    ["Arquivo", "Histórico"],
+    key="fonte_dados",
+    horizontal=True
+)
 
-if uploaded_file is not None:
-    # Carregar dados
-    df, todas_abas = carregar_dados(uploaded_file)
+hash_arquivo = None
+meses_historico = []
+assinatura_historico = ()
+if fonte_dados == "Histórico":
+    meses_historico = exibir_entrada_historico()
+    # Conteúdo dos meses escolhidos (hashes dos arquivos): chave dos caches dos dados do histórico
+    assinatura_historico = historico.assinatura(meses_historico)
+else:
+    # Controlar se mostra o upload ou não
+    mostrar_upload = True
+    if 'hash_arquivo' in st.session_state:
+        mostrar_upload = False
+
+    # Widget para upload de arquivo (só mostra se não houver arquivo carregado)
+    if mostrar_upload:
+        uploaded_file = st.file_uploader(
+            "📁 Carregue o arquivo Excel com os dados de produtividade",
+            type=['xlsx', 'xls'],
+            key="file_uploader"
+        )
     
-    if df is not None:
+        if uploaded_file is not None:
+            # Guardar o arquivo em disco pelo hash (calculado uma única vez); a sessão
+            # guarda só o hash, e os caches dos dados usam o hash como chave
+            with st.spinner("🔄 Recebendo arquivo..."):
+                st.session_state.hash_arquivo = registrar_arquivo(uploaded_file)
+            st.session_state.arquivo_nome = uploaded_file.name
+            st.rerun()
+    else:
+        hash_arquivo = st.session_state.hash_arquivo
+
+if hash_arquivo is not None or meses_historico:
+    if fonte_dados == "Histórico":
+        # Histórico: a estrutura vem das partições, sem ler os dados
+        todas_abas = historico.listar_dias(meses_historico)
+        mes_do_arquivo = ', '.join(meses_historico)
+    else:
+        # Ler a estrutura do arquivo (abas e mês); as abas "Dia" são lidas sob demanda
+        todas_abas, mes_do_arquivo = abrir_arquivo(hash_arquivo)
+    
+    if todas_abas is not None:
         # ========== EXIBIR MÊS DE REFERÊNCIA ==========
-        # Extrair o mês do DataFrame (pegar o primeiro mês único que não seja "Não informado")
-        meses_no_df = [m for m in df['Mês'].unique() if pd.notna(m) and m != 'Não informado']
-        if len(meses_no_df) > 0:
-            mes_referencia = sorted(meses_no_df)[0]  # Pega o primeiro mês alfabeticamente
-            st.subheader(f"📅 Mês de Referência: {mes_referencia}")
+        if mes_do_arquivo:
+            st.subheader(f"📅 Mês de Referência: {mes_do_arquivo}")
         else:
             st.subheader("📅 Mês de Referência: Não informado")
         
@@ -550,9 +1217,15 @@ if uploaded_file is not None:
         st.sidebar.subheader("📅 Período")
         dias_disponiveis = sorted([aba for aba in todas_abas if aba.startswith("Dia")])
         
-        # Inicializar session_state para dias se não existir
+        # Inicializar session_state para dias se não existir. No modo arquivo a
+        # primeira tela mostra só o último dia: as abas são lidas sob demanda, e
+        # marcar todos os dias obrigaria a ler o mês inteiro antes de exibir algo
+        # (o botão "Todos" seleciona o mês inteiro)
         if 'dias_selecionados' not in st.session_state:
-            st.session_state.dias_selecionados = dias_disponiveis.copy()
+            if fonte_dados == "Histórico":
+                st.session_state.dias_selecionados = dias_disponiveis.copy()
+            else:
+                st.session_state.dias_selecionados = dias_disponiveis[-1:]
         
         # Botões de seleção rápida para dias
         col_btn1, col_btn2 = st.sidebar.columns(2)
@@ -591,6 +1264,15 @@ if uploaded_file is not None:
         # Informação sobre dias selecionados
         st.sidebar.caption(f"📅 {len(dias_selecionados)} de {len(dias_disponiveis)} dias selecionados")
         
+        if fonte_dados == "Histórico":
+            # Ler do histórico apenas os meses escolhidos
+            df = carregar_historico(tuple(meses_historico), assinatura_historico)
+        else:
+            # Carregar os dados dos dias selecionados (cada aba é lida só na primeira vez)
+            df = carregar_dados(hash_arquivo, dias_selecionados)
+        if df is None:
+            st.stop()
+        
         st.sidebar.markdown("---")
         
         # ========== FILTRO POR MÊS ==========
@@ -633,11 +1315,13 @@ if uploaded_file is not None:
         
         # Lista de profissionais e equipes disponíveis
         profissionais_disponiveis = sorted([p for p in df['Profissional'].unique() if pd.notna(p)])
-        equipes_disponiveis = sorted([e for e in df['Especialidade'].unique() if pd.notna(e)])
+        # As equipes são os papéis das especialidades (especialidades.py): variações
+        # de escrita da mesma especialidade ficam numa equipe só
+        equipes_disponiveis = sorted([e for e in df['Papel'].unique() if pd.notna(e)])
         
-        # Criar mapeamento de Profissional -> Especialidade
-        mapeamento_prof_equipe = df[['Profissional', 'Especialidade']].drop_duplicates(subset='Profissional')
-        mapeamento_prof_equipe = dict(zip(mapeamento_prof_equipe['Profissional'], mapeamento_prof_equipe['Especialidade']))
+        # Criar mapeamento de Profissional -> Papel
+        mapeamento_prof_equipe = df[['Profissional', 'Papel']].drop_duplicates(subset='Profissional')
+        mapeamento_prof_equipe = dict(zip(mapeamento_prof_equipe['Profissional'], mapeamento_prof_equipe['Papel']))
         
         # Inicializar session_state para profissionais se não existir
         if 'profissionais_selecionados' not in st.session_state:
@@ -868,44 +1552,61 @@ if uploaded_file is not None:
             key="multiselect_status"
         )
         
-        # Aplicar filtros
-        condicao = (
-            (df['Dia'].isin(dias_selecionados)) &
-            (df['Profissional'].isin(profissionais_selecionados)) &
-            (df['Especialidade'].isin(equipes_selecionadas)) &
-            (df['Status_Consolidado'].isin(status_selecionados))
-        )
+        # Aplicar filtros (os mesmos valem para a aba de cruzamento)
+        filtros = {
+            'Dia': dias_selecionados,
+            'Profissional': profissionais_selecionados,
+            'Papel': equipes_selecionadas,
+            'Status_Consolidado': status_selecionados,
+        }
         
         # Adicionar filtro de mês se houver meses selecionados
         if len(meses_selecionados) > 0:
-            condicao = condicao & (df['Mês'].isin(meses_selecionados))
+            filtros['Mês'] = meses_selecionados
         
-        df_filtrado = df[condicao].copy()
+        # Identificação dos dados carregados (chave dos caches do cubo, do cruzamento e dos índices)
+        chave_dados = ("Histórico", assinatura_historico) if fonte_dados == "Histórico" else hash_arquivo
+        # Dias já lidos (no modo arquivo df cresce conforme os dias são escolhidos)
+        dias_carregados = dias_presentes(df)
         
         st.markdown("---")
         
-        # ========== TABS PARA NAVEGAÇÃO ==========
-        tab1, tab2 = st.tabs(["📊 Dashboard Principal", "🔍 Cruzamento de Atendimentos"])
+        # ========== NAVEGAÇÃO ==========
+        # Só a seção escolhida é executada (com st.tabs o código de todas as abas rodava
+        # a cada rerun); os resultados das seções ficam em cache, então voltar a uma
+        # seção já aberta é imediato
+        for chave in CONTROLES_SECOES:
+            if chave in st.session_state:
+                st.session_state[chave] = st.session_state[chave]
+        
+        secao = st.radio(
+            "Seção:",
+            SECOES_DASHBOARD,
+            horizontal=True,
+            key="secao_dashboard",
+            label_visibility="collapsed"
+        )
         
-        with tab1:
+        if secao == SECAO_PRINCIPAL:
+            # Cubo de contagens dos dados carregados, com os filtros da sidebar
+            cubo = calcular_cubo(chave_dados, dias_carregados, versao_tabelas_regras(), df)
+            cubo_filtrado = filtrar_cubo(cubo, filtros)
+            # As linhas filtradas só são montadas quando a tabela de dados é aberta
+            indice_filtros = obter_indice_filtros(chave_dados, dias_carregados, df)
+            
             # ========== MÉTRICAS KPIs ==========
             st.header("📈 Métricas Principais")
             
             col1, col2, col3, col4 = st.columns(4)
             
-            # Calcular métricas usando Status_Consolidado
-            total_atendimentos_realizados = len(df_filtrado[df_filtrado['Status_Consolidado'] == 'Atendimento realizado'])
-            total_faltosos = len(df_filtrado[df_filtrado['Status_Consolidado'] == 'Faltoso'])
-            total_evadidos = len(df_filtrado[df_filtrado['Status_Consolidado'] == 'Evadido'])
-            total_registros = len(df_filtrado)
-            
-            # Percentuais
-            percentual_faltosos = (total_faltosos / total_registros * 100) if total_registros > 0 else 0
-            percentual_evadidos = (total_evadidos / total_registros * 100) if total_registros > 0 else 0
-            
-            # Média de atendimentos por dia
-            dias_unicos = df_filtrado['Dia'].nunique()
-            media_por_dia = (total_atendimentos_realizados / dias_unicos) if dias_unicos > 0 else 0
+            # Todas as métricas (e as tabelas por profissional) de uma vez, em cache pelos filtros
+            kpis = calcular_indicadores(chave_dados, dias_carregados, versao_tabelas_regras(), filtros, cubo_filtrado)
+            total_atendimentos_realizados = kpis['realizados']
+            total_faltosos = kpis['faltosos']
+            total_evadidos = kpis['evadidos']
+            percentual_faltosos = kpis['percentual_faltosos']
+            percentual_evadidos = kpis['percentual_evadidos']
+            media_por_dia = kpis['media_por_dia']
             
             with col1:
                 st.metric(
@@ -942,30 +1643,10 @@ if uploaded_file is not None:
                 
                 # Expander com detalhes por profissional
                 with st.expander("📊 Ver percentual de faltosos por profissional"):
-                    # Calcular faltosos por profissional
-                    df_faltosos = df_filtrado[df_filtrado['Status_Consolidado'] == 'Faltoso']
-                    
-                    if len(df_faltosos) > 0:
-                        # Contagem de faltosos por profissional
-                        faltosos_por_prof = df_faltosos.groupby('Profissional').size().reset_index(name='Qtd Faltosos')
-                        
-                        # Contagem total de registros por profissional (todos os status) - apenas para calcular percentual
-                        total_por_prof = df_filtrado.groupby('Profissional').size().reset_index(name='Total Registros')
-                        
-                        # Calcular percentual
-                        percentual_por_prof = faltosos_por_prof.merge(total_por_prof, on='Profissional', how='left')
-                        percentual_por_prof['Percentual'] = (percentual_por_prof['Qtd Faltosos'] / percentual_por_prof['Total Registros'] * 100).round(2)
-                        percentual_por_prof = percentual_por_prof.sort_values('Percentual', ascending=False)
-                        
-                        # Exibir tabela - apenas Profissional, Quantidade de Faltosos e Percentual
+                    if total_faltosos > 0:
+                        # Quantidade e percentual de faltosos por profissional (sobre todos os registros dele)
                         st.dataframe(
-                            percentual_por_prof[['Profissional', 'Qtd Faltosos', 'Percentual']].rename(
-                                columns={
-                                    'Profissional': 'Profissional',
-                                    'Qtd Faltosos': 'Quantidade de Faltosos',
-                                    'Percentual': 'Percentual (%)'
-                                }
-                            ),
+                            percentual_por_profissional(kpis['por_profissional'], 'Faltoso', 'Quantidade de Faltosos'),
                             use_container_width=True,
                             hide_index=True
                         )
@@ -977,30 +1658,10 @@ if uploaded_file is not None:
                 
                 # Expander com detalhes por profissional
                 with st.expander("📊 Ver percentual de evadidos por profissional"):
-                    # Calcular evadidos por profissional
-                    df_evadidos = df_filtrado[df_filtrado['Status_Consolidado'] == 'Evadido']
-                    
-                    if len(df_evadidos) > 0:
-                        # Contagem de evadidos por profissional
-                        evadidos_por_prof = df_evadidos.groupby('Profissional').size().reset_index(name='Qtd Evadidos')
-                        
-                        # Contagem total de registros por profissional (todos os status) - apenas para calcular percentual
-                        total_por_prof = df_filtrado.groupby('Profissional').size().reset_index(name='Total Registros')
-                        
-                        # Calcular percentual
-                        percentual_por_prof = evadidos_por_prof.merge(total_por_prof, on='Profissional', how='left')
-                        percentual_por_prof['Percentual'] = (percentual_por_prof['Qtd Evadidos'] / percentual_por_prof['Total Registros'] * 100).round(2)
-                        percentual_por_prof = percentual_por_prof.sort_values('Percentual', ascending=False)
-                        
-                        # Exibir tabela - apenas Profissional, Quantidade de Evadidos e Percentual
+                    if total_evadidos > 0:
+                        # Quantidade e percentual de evadidos por profissional (sobre todos os registros dele)
                         st.dataframe(
-                            percentual_por_prof[['Profissional', 'Qtd Evadidos', 'Percentual']].rename(
-                                columns={
-                                    'Profissional': 'Profissional',
-                                    'Qtd Evadidos': 'Quantidade de Evadidos',
-                                    'Percentual': 'Percentual (%)'
-                                }
-                            ),
+                            percentual_por_profissional(kpis['por_profissional'], 'Evadido', 'Quantidade de Evadidos'),
                             use_container_width=True,
                             hide_index=True
                         )
@@ -1013,239 +1674,25 @@ if uploaded_file is not None:
             st.header("📊 Visualizações")
             
             # Preparar dados para gráficos (usando Status_Consolidado)
-            df_finalizados = df_filtrado[df_filtrado['Status_Consolidado'] == 'Atendimento realizado']
+            cubo_finalizados = cubo_filtrado[cubo_filtrado['Status_Consolidado'] == 'Atendimento realizado']
             
             # Gráfico 1: Atendimentos por Profissional (ocupando toda a largura)
-            # Opção de tipo de gráfico acima do gráfico
-            tipo_grafico_profissional = st.selectbox(
-                "Tipo de gráfico:",
-                ["Barras", "Pizza", "Linhas"],
-                key="tipo_graf_prof",
-                index=0
-            )
-            
-            st.subheader("Atendimentos por Profissional")
-            
-            # Contagem por profissional
-            atendimentos_profissional = df_finalizados.groupby('Profissional').size().reset_index(name='Qtd Atendimentos')
-            atendimentos_profissional = atendimentos_profissional.sort_values('Qtd Atendimentos', ascending=False)
-            
-            # Criar campo combinado com profissional e quantidade para a legenda (todos os tipos de gráfico)
-            atendimentos_profissional_com_legenda = atendimentos_profissional.copy()
-            atendimentos_profissional_com_legenda['Profissional_Completo'] = atendimentos_profissional_com_legenda.apply(
-                lambda row: f"{row['Profissional']} ({row['Qtd Atendimentos']} atendimentos)", 
-                axis=1
-            )
-            
-            # Criar gráfico baseado na seleção
-            if tipo_grafico_profissional == "Barras":
-                chart_profissional = alt.Chart(atendimentos_profissional_com_legenda).mark_bar().encode(
-                    x=alt.X('Qtd Atendimentos:Q', title='Quantidade de Atendimentos'),
-                    y=alt.Y('Profissional:N', sort='-x', title='Profissional'),
-                    color=alt.Color('Qtd Atendimentos:Q', scale=alt.Scale(scheme='blues')),
-                    tooltip=[alt.Tooltip('Profissional:N', title='Profissional'), 
-                            alt.Tooltip('Qtd Atendimentos:Q', title='Atendimentos')]
-                ).properties(height=400)
-            elif tipo_grafico_profissional == "Pizza":
-                chart_profissional = alt.Chart(atendimentos_profissional_com_legenda).mark_arc(innerRadius=0).encode(
-                    theta=alt.Theta('Qtd Atendimentos:Q', stack=True),
-                    color=alt.Color('Profissional_Completo:N', 
-                                  scale=alt.Scale(scheme='category20'),
-                                  legend=alt.Legend(title='Profissional', 
-                                                  orient='right',
-                                                  labelLimit=500,  # Valor alto para evitar truncamento
-                                                  labelFontSize=14,  # Fonte maior
-                                                  titleFontSize=16,  # Título da legenda maior
-                                                  offset=10,  # Espaçamento próximo ao gráfico
-                                                  padding=10,  # Espaçamento interno
-                                                  columnPadding=5)),  # Espaçamento entre itens
-                    tooltip=[alt.Tooltip('Profissional:N', title='Profissional'), 
-                            alt.Tooltip('Qtd Atendimentos:Q', title='Atendimentos')]
-                ).properties(height=400, width=500).configure_view(strokeWidth=0)
-            else:  # Linhas
-                chart_profissional = alt.Chart(atendimentos_profissional_com_legenda).mark_line(point=True).encode(
-                    x=alt.X('Profissional:N', sort='-y', title='Profissional'),
-                    y=alt.Y('Qtd Atendimentos:Q', title='Quantidade de Atendimentos'),
-                    tooltip=[alt.Tooltip('Profissional:N', title='Profissional'), 
-                            alt.Tooltip('Qtd Atendimentos:Q', title='Atendimentos')]
-                ).properties(height=400)
-            
-            st.altair_chart(chart_profissional, use_container_width=True)
-            
-            # Estatísticas abaixo do gráfico
-            if len(atendimentos_profissional) > 0:
-                st.caption(f"📊 **Total:** {atendimentos_profissional['Qtd Atendimentos'].sum()} atendimentos | "
-                          f"**Média:** {atendimentos_profissional['Qtd Atendimentos'].mean():.1f} | "
-                          f"**Máximo:** {atendimentos_profissional['Qtd Atendimentos'].max()}")
+            exibir_grafico_profissionais(cubo_finalizados)
             
             st.markdown("---")
             
             # Gráfico 2: Atendimentos por Especialidades (ocupando toda a largura, abaixo do anterior)
-            # Opção de tipo de gráfico acima do gráfico
-            tipo_grafico_equipe = st.selectbox(
-                "Tipo de gráfico:",
-                ["Barras", "Pizza", "Linhas"],
-                key="tipo_graf_equipe",
-                index=0
-            )
-            
-            st.subheader("Atendimentos por Especialidades")
-            
-            # Contagem por equipe (Especialidade)
-            atendimentos_equipe = df_finalizados.groupby('Especialidade').size().reset_index(name='Qtd Atendimentos')
-            atendimentos_equipe = atendimentos_equipe.sort_values('Qtd Atendimentos', ascending=False)
-            
-            # Criar campo combinado com especialidade e quantidade para a legenda (todos os tipos de gráfico)
-            atendimentos_equipe_com_legenda = atendimentos_equipe.copy()
-            atendimentos_equipe_com_legenda['Especialidade_Completa'] = atendimentos_equipe_com_legenda.apply(
-                lambda row: f"{row['Especialidade']} ({row['Qtd Atendimentos']} atendimentos)", 
-                axis=1
-            )
-            
-            # Criar gráfico baseado na seleção
-            if tipo_grafico_equipe == "Barras":
-                chart_equipe = alt.Chart(atendimentos_equipe_com_legenda).mark_bar().encode(
-                    x=alt.X('Qtd Atendimentos:Q', title='Quantidade de Atendimentos'),
-                    y=alt.Y('Especialidade:N', sort='-x', title='Especialidade'),
-                    color=alt.Color('Qtd Atendimentos:Q', scale=alt.Scale(scheme='greens')),
-                    tooltip=[alt.Tooltip('Especialidade:N', title='Especialidade'), 
-                            alt.Tooltip('Qtd Atendimentos:Q', title='Atendimentos')]
-                ).properties(height=400)
-            elif tipo_grafico_equipe == "Pizza":
-                chart_equipe = alt.Chart(atendimentos_equipe_com_legenda).mark_arc(innerRadius=0).encode(
-                    theta=alt.Theta('Qtd Atendimentos:Q', stack=True),
-                    color=alt.Color('Especialidade_Completa:N', 
-                                  scale=alt.Scale(scheme='category10'),
-                                  legend=alt.Legend(title='Especialidade', 
-                                                  orient='right',
-                                                  labelLimit=500,  # Valor alto para evitar truncamento
-                                                  labelFontSize=14,  # Fonte maior
-                                                  titleFontSize=16,  # Título da legenda maior
-                                                  offset=10,  # Espaçamento próximo ao gráfico
-                                                  padding=10,  # Espaçamento interno
-                                                  columnPadding=5)),  # Espaçamento entre itens
-                    tooltip=[alt.Tooltip('Especialidade:N', title='Especialidade'), 
-                            alt.Tooltip('Qtd Atendimentos:Q', title='Atendimentos')]
-                ).properties(height=400, width=500).configure_view(strokeWidth=0)
-            else:  # Linhas
-                chart_equipe = alt.Chart(atendimentos_equipe_com_legenda).mark_line(point=True).encode(
-                    x=alt.X('Especialidade:N', sort='-y', title='Especialidade'),
-                    y=alt.Y('Qtd Atendimentos:Q', title='Quantidade de Atendimentos'),
-                    tooltip=[alt.Tooltip('Especialidade:N', title='Especialidade'), 
-                            alt.Tooltip('Qtd Atendimentos:Q', title='Atendimentos')]
-                ).properties(height=400)
-            
-            st.altair_chart(chart_equipe, use_container_width=True)
-            
-            # Estatísticas abaixo do gráfico
-            if len(atendimentos_equipe) > 0:
-                st.caption(f"📊 **Total:** {atendimentos_equipe['Qtd Atendimentos'].sum()} atendimentos")
+            exibir_grafico_especialidades(cubo_finalizados)
             
             # Gráfico de Evolução dos Atendimentos por Dia e Profissional
             st.markdown("---")
-            st.subheader("📈 Evolução dos Atendimentos por Dia")
-            
-            # Seletor de tipo de gráfico
-            tipo_grafico_temporal = st.selectbox(
-                "Tipo de gráfico:",
-                ["Linhas", "Barras"],
-                key="tipo_graf_temporal",
-                index=0
-            )
-            
-            # Obter todos os dias disponíveis nos dados filtrados (não apenas finalizados)
-            todos_dias_disponiveis = sorted(df_filtrado['Dia'].unique())
-            
-            # Contagem por dia e profissional (apenas finalizados)
-            atendimentos_por_dia_prof = df_finalizados.groupby(['Dia', 'Profissional']).size().reset_index(name='Qtd Atendimentos')
-            
-            # Criar estrutura completa: todos os dias x todos os profissionais
-            # Isso garante que todos os dias apareçam, mesmo sem atendimentos
-            from itertools import product
-            
-            if len(profissionais_selecionados) > 0 and len(todos_dias_disponiveis) > 0:
-                # Criar todas as combinações de dia e profissional
-                combinacoes = pd.DataFrame(
-                    list(product(todos_dias_disponiveis, profissionais_selecionados)),
-                    columns=['Dia', 'Profissional']
-                )
-                
-                # Fazer merge com os dados reais, preenchendo com 0 onde não houver dados
-                atendimentos_completo = combinacoes.merge(
-                    atendimentos_por_dia_prof,
-                    on=['Dia', 'Profissional'],
-                    how='left'
-                ).fillna(0)
-                
-                # Garantir que Qtd Atendimentos seja inteiro
-                atendimentos_completo['Qtd Atendimentos'] = atendimentos_completo['Qtd Atendimentos'].astype(int)
-                
-                # Ordenar por dia
-                atendimentos_completo = atendimentos_completo.sort_values('Dia')
-                
-                # Calcular média para exibição
-                media_atendimentos = atendimentos_completo['Qtd Atendimentos'].mean() if len(atendimentos_completo) > 0 else 0
-                
-                # Criar gráfico baseado na seleção
-                if tipo_grafico_temporal == "Linhas":
-                    # Criar gráfico base
-                    chart_base = alt.Chart(atendimentos_completo).encode(
-                        x=alt.X('Dia:N', sort='x', title='Dia'),
-                        y=alt.Y('Qtd Atendimentos:Q', title='Quantidade de Atendimentos'),
-                        tooltip=['Dia', 'Profissional', 'Qtd Atendimentos']
-                    )
-                    
-                    # Linha para cada profissional (com cores diferentes)
-                    chart_temporal = chart_base.mark_line(
-                        point=True,
-                        strokeWidth=3
-                    ).encode(
-                        color=alt.Color(
-                            'Profissional:N',
-                            scale=alt.Scale(scheme='category20'),
-                            legend=alt.Legend(title='Profissional', orient='right')
-                        )
-                    ).properties(
-                        height=400,
-                        width=800
-                    )
-                else:  # Barras
-                    # Gráfico de barras agrupadas por dia (lado a lado)
-                    # No Altair, barras agrupadas são criadas usando x para categoria principal
-                    # e color para subcategoria, o que automaticamente cria barras lado a lado
-                    chart_temporal = alt.Chart(atendimentos_completo).mark_bar(
-                        cornerRadiusTopLeft=3,
-                        cornerRadiusTopRight=3
-                    ).encode(
-                        x=alt.X('Dia:N', sort='x', title='Dia', axis=alt.Axis(labelAngle=-45)),
-                        y=alt.Y('Qtd Atendimentos:Q', title='Quantidade de Atendimentos', scale=alt.Scale(domain=[0, None])),
-                        color=alt.Color(
-                            'Profissional:N',
-                            scale=alt.Scale(scheme='category20'),
-                            legend=alt.Legend(title='Profissional', orient='right')
-                        ),
-                        tooltip=['Dia', 'Profissional', 'Qtd Atendimentos']
-                    ).properties(
-                        height=400,
-                        width=800
-                    )
-                
-                st.altair_chart(chart_temporal, use_container_width=True)
-                
-                # Informações sobre os profissionais
-                num_profissionais = len(profissionais_selecionados)
-                if num_profissionais > 0:
-                    st.caption(f"📊 **{num_profissionais} profissional(is) selecionado(s)** | "
-                              f"**Média de atendimentos por dia:** {media_atendimentos:.1f} | "
-                              f"**Total de dias:** {len(todos_dias_disponiveis)}")
-            else:
-                st.warning("Nenhum dado disponível para exibir o gráfico temporal.")
+            exibir_grafico_evolucao(cubo_filtrado, cubo_finalizados, profissionais_selecionados)
             
             # Gráfico de Status
             st.markdown("---")
             st.subheader("Distribuição de Status")
             
-            status_counts = df_filtrado.groupby('Status_Consolidado').size().reset_index(name='Quantidade')
+            status_counts = contar(cubo_filtrado, 'Status_Consolidado').reset_index(name='Quantidade')
             status_counts = status_counts.sort_values('Quantidade', ascending=False)
             
             # Criar campo combinado com status e quantidade para a legenda
@@ -1282,10 +1729,10 @@ if uploaded_file is not None:
             
             # Gráfico de Status por Profissional (em linha completa)
             st.subheader("Status por Profissional (Top 10)")
-            status_prof = df_filtrado.groupby(['Profissional', 'Status_Consolidado']).size().reset_index(name='Quantidade')
+            status_prof = contar(cubo_filtrado, ['Profissional', 'Status_Consolidado']).reset_index(name='Quantidade')
             
             # Pegar os top 10 profissionais por quantidade total
-            total_por_prof = status_prof.groupby('Profissional')['Quantidade'].sum().reset_index(name='Total')
+            total_por_prof = status_prof.groupby('Profissional', observed=True)['Quantidade'].sum().reset_index(name='Total')
             top_10_profissionais = total_por_prof.nlargest(10, 'Total')['Profissional'].tolist()
             
             # Filtrar apenas os top 10 profissionais
@@ -1310,25 +1757,23 @@ if uploaded_file is not None:
             
             # ========== TABELA DE DADOS ==========
             st.markdown("---")
-            with st.expander("📋 Visualizar Dados Filtrados"):
-                st.dataframe(
-                    df_filtrado,
-                    use_container_width=True,
-                    height=400
-                )
-                
-                # Botão para download
-                csv = df_filtrado.to_csv(index=False).encode('utf-8-sig')
-                st.download_button(
-                    label="📥 Baixar dados filtrados (CSV)",
-                    data=csv,
-                    file_name="dados_filtrados.csv",
-                    mime="text/csv"
-                )
+            exibir_dados_filtrados(df, indice_filtros, filtros)
         
-        with tab2:
-            # ========== PÁGINA DE CRUZAMENTO DE ATENDIMENTOS ==========
-            exibir_pagina_cruzamento(df)
+        else:
+            # Cruzamento e busca de pacientes usam o mês inteiro: no modo arquivo lê as
+            # abas que ainda faltam (só quando uma dessas seções é aberta)
+            if fonte_dados == "Histórico":
+                df_completo = df
+            else:
+                df_completo = carregar_dados(hash_arquivo)
+            
+            if df_completo is not None:
+                if secao == SECAO_CRUZAMENTO:
+                    # ========== PÁGINA DE CRUZAMENTO DE ATENDIMENTOS ==========
+                    exibir_pagina_cruzamento(df_completo, chave_dados, filtros)
+                else:
+                    # ========== BUSCA DE PACIENTES ==========
+                    exibir_pagina_pacientes(df_completo, chave_dados)
         
         # Informações sobre o dataset
         st.sidebar.markdown("---")
@@ -1337,6 +1782,6 @@ if uploaded_file is not None:
         st.sidebar.info(f"👥 **Profissionais:** {len(profissionais_disponiveis)}")
         st.sidebar.info(f"🏥 **Equipes:** {len(equipes_disponiveis)}")
 
-else:
+elif fonte_dados == "Arquivo":
     st.info("👆 Por favor, carregue o arquivo Excel para começar a análise.")
 
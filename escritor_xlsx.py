@@ -0,0 +1,159 @@
+"""
+Escrita de planilhas XLSX em modo streaming (contraparte do leitor_xlsx)
+
+O pd.ExcelWriter com openpyxl monta a pasta de trabalho inteira em memória,
+uma célula por valor, antes de salvar. Aqui a pasta é aberta em modo somente
+escrita (write_only) e as linhas saem do DataFrame em blocos de TAMANHO_BLOCO:
+o openpyxl grava cada linha direto em um arquivo temporário, então a memória
+usada pela escrita não cresce com o tamanho da saída.
+
+Abas com mais linhas do que o Excel aceita continuam em "Nome (2)",
+"Nome (3)", ... Para saídas muito grandes, salvar_dados grava a mesma tabela
+em Parquet ou CSV, também em blocos.
+"""
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+# Linhas convertidas e gravadas de cada vez
+TAMANHO_BLOCO = 50_000
+
+# Máximo de linhas de uma aba do Excel (incluindo o cabeçalho)
+LIMITE_LINHAS_EXCEL = 1_048_576
+
+# Máximo de caracteres no nome de uma aba
+LIMITE_NOME_ABA = 31
+
+FORMATOS_DADOS = ('parquet', 'csv')
+
+# Resultados de pd.api.types.infer_dtype que o Arrow não grava em uma coluna só
+# (ex.: 123 e '0789' na mesma coluna de prontuário)
+TIPOS_MISTOS = ('mixed', 'mixed-integer')
+
+# Mesmo estilo de cabeçalho do pd.DataFrame.to_excel
+_BORDA = Side(style='thin')
+ESTILO_CABECALHO = {
+    'font': Font(bold=True),
+    'border': Border(left=_BORDA, right=_BORDA, top=_BORDA, bottom=_BORDA),
+    'alignment': Alignment(horizontal='center', vertical='top'),
+}
+
+
+def _blocos(df, tamanho_bloco):
+    """Fatias consecutivas do DataFrame com até tamanho_bloco linhas"""
+    for inicio in range(0, len(df), tamanho_bloco):
+        yield df.iloc[inicio:inicio + tamanho_bloco]
+
+
+def _linhas(bloco):
+    """Linhas do bloco como tuplas de valores Python (vazios viram None)"""
+    valores = bloco.astype(object)
+    return valores.where(bloco.notna(), None).itertuples(index=False, name=None)
+
+
+def _cabecalho(ws, colunas):
+    celulas = []
+    for coluna in colunas:
+        celula = WriteOnlyCell(ws, value=str(coluna))
+        celula.font = ESTILO_CABECALHO['font']
+        celula.border = ESTILO_CABECALHO['border']
+        celula.alignment = ESTILO_CABECALHO['alignment']
+        celulas.append(celula)
+    return celulas
+
+
+def _nome_continuacao(nome, parte):
+    """Nome da parte seguinte de uma aba grande (ex.: 'Atendimentos (2)')"""
+    sufixo = f" ({parte})"
+    return nome[:LIMITE_NOME_ABA - len(sufixo)] + sufixo
+
+
+def escrever_planilha(nome_arquivo, abas, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Grava DataFrames em abas de um arquivo .xlsx, em modo streaming
+
+    Args:
+        nome_arquivo: Caminho do arquivo de saída
+        abas: Dicionário {nome da aba: DataFrame}, na ordem das abas
+        tamanho_bloco: Linhas convertidas de cada vez
+
+    Returns:
+        Caminho do arquivo
+    """
+    linhas_por_aba = LIMITE_LINHAS_EXCEL - 1
+    wb = Workbook(write_only=True)
+
+    for nome, df in abas.items():
+        partes = range(0, max(len(df), 1), linhas_por_aba)
+        for parte, inicio in enumerate(partes, start=1):
+            ws = wb.create_sheet(nome if parte == 1 else _nome_continuacao(nome, parte))
+            ws.append(_cabecalho(ws, df.columns))
+            for bloco in _blocos(df.iloc[inicio:inicio + linhas_por_aba], tamanho_bloco):
+                for linha in _linhas(bloco):
+                    ws.append(linha)
+
+    # Gravar em arquivo temporário: uma falha no meio não deixa o arquivo antigo pela metade
+    temporario = nome_arquivo + '.tmp'
+    try:
+        wb.save(temporario)
+        os.replace(temporario, nome_arquivo)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+    return nome_arquivo
+
+
+def _colunas_parquet(df):
+    """DataFrame com as colunas de tipos mistos como texto (o Parquet exige um tipo por coluna)"""
+    mistas = {
+        coluna: df[coluna].astype('string')
+        for coluna in df.columns
+        if df[coluna].dtype == object and pd.api.types.infer_dtype(df[coluna], skipna=True) in TIPOS_MISTOS
+    }
+    return df.assign(**mistas) if mistas else df
+
+
+def salvar_dados(df, caminho, formato=None, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Grava o DataFrame em Parquet ou CSV, em blocos
+
+    Args:
+        df: DataFrame
+        caminho: Caminho do arquivo
+        formato: 'parquet' ou 'csv' (None usa a extensão do caminho). No
+            Parquet, colunas com tipos mistos são gravadas como texto
+        tamanho_bloco: Linhas gravadas de cada vez
+
+    Returns:
+        Caminho do arquivo
+    """
+    formato = formato or os.path.splitext(caminho)[1].lstrip('.').lower()
+    if formato not in FORMATOS_DADOS:
+        raise ValueError(f"Formato de dados inválido: '{formato}'. Use um destes: {', '.join(FORMATOS_DADOS)}")
+
+    temporario = caminho + '.tmp'
+    try:
+        if formato == 'parquet':
+            df = _colunas_parquet(df)
+            schema = pa.Schema.from_pandas(df, preserve_index=False)
+            with pq.ParquetWriter(temporario, schema) as writer:
+                for bloco in _blocos(df, tamanho_bloco):
+                    writer.write_table(pa.Table.from_pandas(bloco, schema=schema, preserve_index=False))
+        else:
+            # utf-8-sig para o Excel reconhecer os acentos (como nos downloads do dashboard)
+            with open(temporario, 'w', encoding='utf-8-sig', newline='') as f:
+                df.iloc[:0].to_csv(f, index=False)
+                for bloco in _blocos(df, tamanho_bloco):
+                    bloco.to_csv(f, index=False, header=False)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+    return caminho
@@ -0,0 +1,114 @@
+"""
+Classificação das especialidades em papéis (Médico ESF, Técnico de Enfermagem ESF, ...)
+
+Os nomes de especialidade variam entre exportações (com e sem acento,
+maiúsculas, espaços a mais). Cada nome é normalizado uma vez (sem acentos,
+casefold, espaços simples) e comparado com padrões já compilados, na ordem
+de PADROES_PAPEIS; o primeiro que casar define o papel. Especialidades que
+não casam com nenhum padrão ficam com o próprio nome como papel.
+
+A classificação é feita uma vez por valor distinto da coluna e aplicada a
+todas as linhas pelos códigos (como em status_atendimento).
+"""
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Papéis conhecidos
+PAPEL_MEDICO_ESF = 'Médico ESF'
+PAPEL_MEDICO = 'Médico'
+PAPEL_TECNICO_ENFERMAGEM_ESF = 'Técnico de Enfermagem ESF'
+PAPEL_TECNICO_ENFERMAGEM = 'Técnico de Enfermagem'
+PAPEL_ENFERMEIRO_ESF = 'Enfermeiro ESF'
+PAPEL_ENFERMEIRO = 'Enfermeiro'
+PAPEL_DENTISTA_ESF = 'Cirurgião-Dentista ESF'
+PAPEL_DENTISTA = 'Cirurgião-Dentista'
+PAPEL_SAUDE_BUCAL = 'Saúde Bucal'
+PAPEL_AGENTE_COMUNITARIO = 'Agente Comunitário de Saúde'
+
+# Especialidade "da família" (Estratégia de Saúde da Família)
+_ESF = r'(?=.*\b(?:familia|esf)\b)'
+
+# (papel, padrão sobre o nome normalizado), na ordem de prioridade
+PADROES_PAPEIS = [
+    (PAPEL_SAUDE_BUCAL, re.compile(r'\b(?:auxiliar|tecnico)\b.*\bsaude bucal\b')),
+    (PAPEL_AGENTE_COMUNITARIO, re.compile(r'\bagente comunitario\b')),
+    (PAPEL_TECNICO_ENFERMAGEM_ESF, re.compile(_ESF + r'.*\b(?:tecnico|auxiliar)\b.*\benfermagem\b')),
+    (PAPEL_TECNICO_ENFERMAGEM, re.compile(r'\b(?:tecnico|auxiliar)\b.*\benfermagem\b')),
+    (PAPEL_DENTISTA_ESF, re.compile(_ESF + r'.*\b(?:cirurgiao.dentista|dentista|odontolog)')),
+    (PAPEL_DENTISTA, re.compile(r'\b(?:cirurgiao.dentista|dentista|odontolog)')),
+    (PAPEL_ENFERMEIRO_ESF, re.compile(_ESF + r'.*\benfermeir[oa]\b')),
+    (PAPEL_ENFERMEIRO, re.compile(r'\benfermeir[oa]\b')),
+    (PAPEL_MEDICO_ESF, re.compile(_ESF + r'.*\bmedic(?:o|a|ina)\b')),
+    (PAPEL_MEDICO, re.compile(r'\bmedic(?:o|a|ina)\b')),
+]
+
+PAPEIS = [papel for papel, _ in PADROES_PAPEIS]
+
+
+def normalizar_texto(texto):
+    """Texto sem acentos, em casefold e com espaços simples (ex.: ' Médico  ESF' -> 'medico esf')"""
+    if texto is None or pd.isna(texto):
+        return ''
+    decomposto = unicodedata.normalize('NFKD', str(texto))
+    sem_acentos = ''.join(caractere for caractere in decomposto if not unicodedata.combining(caractere))
+    return ' '.join(sem_acentos.casefold().split())
+
+
+@lru_cache(maxsize=1024)
+def classificar_especialidade(especialidade):
+    """
+    Papel de uma especialidade
+
+    Returns:
+        Um dos PAPEIS, ou o próprio nome (sem espaços nas pontas) se nenhum
+        padrão casar; None para especialidade vazia
+    """
+    if especialidade is None or pd.isna(especialidade):
+        return None
+    normalizada = normalizar_texto(especialidade)
+    for papel, padrao in PADROES_PAPEIS:
+        if padrao.search(normalizada):
+            return papel
+    return str(especialidade).strip()
+
+
+@lru_cache(maxsize=64)
+def papel_canonico(papel):
+    """Nome oficial de um papel escrito de outra forma (ex.: 'medico esf' -> 'Médico ESF')"""
+    normalizado = normalizar_texto(papel)
+    for conhecido in PAPEIS:
+        if normalizar_texto(conhecido) == normalizado:
+            return conhecido
+    raise ValueError(f"Papel desconhecido: '{papel}'. Papéis conhecidos: {', '.join(PAPEIS)}")
+
+
+def classificar_especialidades(serie):
+    """
+    Papel de cada linha da coluna Especialidade
+
+    Args:
+        serie: Coluna Especialidade
+
+    Returns:
+        Série categórica (categorias em ordem alfabética) com o mesmo índice
+    """
+    # Códigos por linha (-1 = vazio) e valores distintos; em colunas categóricas
+    # os códigos já existem
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos, valores = serie.cat.codes.to_numpy(), serie.cat.categories
+    else:
+        codigos, valores = pd.factorize(serie)
+
+    papeis_por_valor = [classificar_especialidade(valor) for valor in valores]
+    usados = np.bincount(codigos[codigos >= 0], minlength=len(valores)) > 0
+    categorias = sorted({papel for papel, usado in zip(papeis_por_valor, usados) if usado and papel is not None})
+
+    # O código -1 (vazio) pega o último item
+    codigo_categoria = np.array([categorias.index(papel) if papel in categorias else -1
+                                 for papel in papeis_por_valor] + [-1], dtype=np.int64)
+    return pd.Series(pd.Categorical.from_codes(codigo_categoria[codigos], categories=categorias),
+                     index=serie.index)
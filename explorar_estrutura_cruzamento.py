@@ -2,9 +2,12 @@
 Script para explorar a estrutura das planilhas e identificar colunas
 necessárias para o cruzamento de atendimentos (Técnico vs Médico)
 """
-import pandas as pd
 import sys
 
+from carregamento import adicionar_colunas_dia, carregar_planilha, extrair_dia_aba
+from especialidades import (PAPEL_MEDICO, PAPEL_MEDICO_ESF, PAPEL_TECNICO_ENFERMAGEM, PAPEL_TECNICO_ENFERMAGEM_ESF,
+                            classificar_especialidade)
+
 # Verificar se o nome do arquivo foi passado como argumento
 if len(sys.argv) > 1:
     arquivo = sys.argv[1]
@@ -18,59 +21,31 @@ print(f"\n{'='*70}")
 print(f"EXPLORANDO ARQUIVO: {arquivo}")
 print(f"{'='*70}\n")
 
-# Função para extrair o número do dia do nome da aba
-def extrair_dia_aba(nome_aba):
-    """Extrai o número do dia do nome da aba (ex: 'Dia 01' -> 1, 'Dia 24' -> 24)"""
-    import re
-    # Procura por padrões como "Dia 01", "Dia 1", "Dia01", etc.
-    match = re.search(r'[Dd]ia\s*(\d+)', nome_aba)
-    if match:
-        return int(match.group(1))
-    return None
-
 try:
-    # Ler todas as abas
-    xls = pd.ExcelFile(arquivo)
+    # Ler todas as abas "Dia" pelo carregador comum (abas com erro são avisadas e ignoradas)
+    try:
+        df_consolidado, todas_abas, _ = carregar_planilha(arquivo, consolidar=False, ignorar_erros=True)
+    except ValueError:
+        print("⚠️ Nenhuma aba 'Dia' encontrada!")
+        sys.exit(1)
     
     print("=" * 70)
     print("ABAS ENCONTRADAS NO ARQUIVO:")
     print("=" * 70)
-    for i, aba in enumerate(xls.sheet_names, 1):
+    for i, aba in enumerate(todas_abas, 1):
         print(f"{i}. {aba}")
     
-    # Consolidar dados de todas as abas "Dia"
-    dados_consolidados = []
+    # Extrair o número do dia de cada aba
+    adicionar_colunas_dia(df_consolidado, coluna_aba='Dia')
     
     print("\n" + "=" * 70)
     print("CONSOLIDANDO DADOS DAS ABAS 'Dia':")
     print("=" * 70)
     
-    for aba in xls.sheet_names:
-        if aba.startswith("Dia"):
-            try:
-                df = pd.read_excel(xls, sheet_name=aba)
-                # Adicionar coluna com o nome completo da aba
-                df['Aba'] = aba
-                # Extrair o número do dia
-                dia_numero = extrair_dia_aba(aba)
-                if dia_numero:
-                    df['Dia_Numero'] = dia_numero
-                    df['Dia_Atendimento'] = f"Dia {dia_numero:02d}"
-                else:
-                    df['Dia_Numero'] = None
-                    df['Dia_Atendimento'] = aba
-                dados_consolidados.append(df)
-                dia_info = f" -> Dia {dia_numero}" if dia_numero else ""
-                print(f"✅ {aba}: {len(df)} registros{dia_info}")
-            except Exception as e:
-                print(f"❌ Erro ao ler {aba}: {e}")
-    
-    if not dados_consolidados:
-        print("⚠️ Nenhuma aba 'Dia' encontrada!")
-        sys.exit(1)
-    
-    # Concatenar todos
-    df_consolidado = pd.concat(dados_consolidados, ignore_index=True)
+    for aba, quantidade in df_consolidado['Dia'].value_counts(sort=False).items():
+        dia_numero = extrair_dia_aba(aba)
+        dia_info = f" -> Dia {dia_numero}" if dia_numero else ""
+        print(f"✅ {aba}: {quantidade} registros{dia_info}")
     
     print(f"\n{'='*70}")
     print(f"ESTRUTURA GERAL DO DATASET:")
@@ -102,23 +77,18 @@ try:
         print("IDENTIFICANDO ESPECIALIDADES DE TÉCNICO E MÉDICO:")
         print(f"{'='*70}")
         
-        tecnicos = []
-        medicos = []
-        
-        for esp in especialidades:
-            esp_str = str(esp).upper()
-            if 'TECNICO' in esp_str or 'TÉCNICO' in esp_str or 'ENFERMAGEM' in esp_str:
-                tecnicos.append(esp)
-            elif 'MEDICO' in esp_str or 'MÉDICO' in esp_str or 'MEDICINA' in esp_str:
-                medicos.append(esp)
+        # Papel de cada especialidade pelo classificador comum (especialidades.py)
+        papeis = {esp: classificar_especialidade(esp) for esp in especialidades}
+        tecnicos = [esp for esp, papel in papeis.items() if papel in (PAPEL_TECNICO_ENFERMAGEM_ESF, PAPEL_TECNICO_ENFERMAGEM)]
+        medicos = [esp for esp, papel in papeis.items() if papel in (PAPEL_MEDICO_ESF, PAPEL_MEDICO)]
         
         print(f"\n🔍 Possíveis especialidades de TÉCNICO:")
         for tec in tecnicos:
-            print(f"   - {tec}")
+            print(f"   - {tec} ({papeis[tec]})")
         
         print(f"\n🔍 Possíveis especialidades de MÉDICO:")
         for med in medicos:
-            print(f"   - {med}")
+            print(f"   - {med} ({papeis[med]})")
     else:
         print("⚠️ Coluna 'Especialidade' não encontrada!")
     
@@ -160,7 +130,7 @@ try:
     print(f"\n{'='*70}")
     print("EXEMPLOS DE NOMES DE ABAS E DIA EXTRAÍDO:")
     print(f"{'='*70}")
-    abas_dia = [aba for aba in xls.sheet_names if aba.startswith("Dia")]
+    abas_dia = [aba for aba in todas_abas if aba.startswith("Dia")]
     for aba in abas_dia[:10]:  # Mostrar primeiras 10 abas
         dia_num = extrair_dia_aba(aba)
         print(f"   '{aba}' -> Dia {dia_num if dia_num else 'NÃO ENCONTRADO'}")
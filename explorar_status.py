@@ -1,25 +1,13 @@
 """
 Script para explorar os valores de Status nos dados
 """
-import pandas as pd
+from carregamento import carregar_planilha
 
 # Nome do arquivo
 arquivo = "Estudo de produtividade Unidade de Saúda da Familia - Sao Cristovao.xlsx"
 
-# Ler todas as abas
-xls = pd.ExcelFile(arquivo)
-
-# Consolidar dados de todas as abas "Dia"
-dados_consolidados = []
-
-for aba in xls.sheet_names:
-    if aba.startswith("Dia"):
-        df = pd.read_excel(xls, sheet_name=aba)
-        df['Dia'] = aba
-        dados_consolidados.append(df)
-
-# Concatenar todos
-df_consolidado = pd.concat(dados_consolidados, ignore_index=True)
+# Ler todas as abas "Dia" pelo carregador comum, com os valores como estão na planilha
+df_consolidado, _, _ = carregar_planilha(arquivo, consolidar=False)
 
 print("=" * 60)
 print("VALORES ÚNICOS DE STATUS:")
@@ -0,0 +1,350 @@
+"""
+Gráficos do cruzamento "passou pelo técnico" (um por médico e o consolidado)
+
+Cada gráfico é desenhado a partir de um dicionário com os números que ele
+mostra. O hash desses números (com DPI e formato) fica salvo na pasta de
+saída em ARQUIVO_IMPRESSOES: na próxima execução, gráficos cujo hash não
+mudou e cujo arquivo ainda existe não são desenhados de novo. Gerar outra
+vez os gráficos de um mês sem alterações praticamente não custa nada.
+Gráficos registrados ali que não fazem parte da execução atual (médico que
+saiu dos dados, formato anterior) são apagados junto com o seu hash.
+
+Os gráficos que mudaram são distribuídos entre processos, como as abas em
+leitor_xlsx. Cada processo desenha sempre na mesma figura (limpa a cada
+gráfico) em vez de criar e destruir uma figura por gráfico.
+
+Formatos: png, svg ou pdf. Em pdf, gerar_graficos_por_medico junta todos os
+gráficos em um único documento de várias páginas (NOME_PDF).
+"""
+import hashlib
+import json
+import math
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')  # Para não precisar de interface gráfica
+import matplotlib.pyplot as plt
+import seaborn as sns
+from matplotlib.backends.backend_pdf import PdfPages
+
+from leitor_xlsx import WORKERS_PADRAO
+
+# Configurar estilo dos gráficos (também nos processos que desenham)
+try:
+    plt.style.use('seaborn-v0_8-darkgrid')
+except:
+    try:
+        plt.style.use('seaborn-darkgrid')
+    except:
+        plt.style.use('default')
+sns.set_palette("husl")
+
+FORMATOS = ('png', 'svg', 'pdf')
+
+# Resolução padrão (pode ser alterada por variável de ambiente)
+DPI_PADRAO = int(os.environ.get('GRAFICOS_DPI', 300))
+
+# Incrementar sempre que o desenho dos gráficos mudar,
+# para que os gráficos já gerados sejam desenhados de novo
+VERSAO_GRAFICOS = 1
+
+# Arquivo, na pasta de saída, com o hash de cada gráfico gerado
+ARQUIVO_IMPRESSOES = '.impressoes_graficos.json'
+
+NOME_CONSOLIDADO = 'Todos_Medicos'
+NOME_PDF = 'Graficos_Medicos.pdf'
+
+# Abaixo disso por processo, abrir outro processo custa mais do que desenhar
+GRAFICOS_POR_PROCESSO = 4
+
+COR_PASSOU = '#2ecc71'  # Verde para passou
+COR_NAO_PASSOU = '#e74c3c'  # Vermelho para não passou
+
+# Figura reaproveitada por tamanho, uma por processo
+_FIGURAS = {}
+
+
+def _figura(tamanho):
+    """Figura do tamanho pedido, limpa (criada só na primeira vez)"""
+    fig = _FIGURAS.get(tamanho)
+    if fig is None:
+        fig = _FIGURAS[tamanho] = plt.figure(figsize=tamanho)
+    else:
+        fig.clf()
+    return fig
+
+
+def nome_arquivo_grafico(nome):
+    """Nome de arquivo sem caracteres inválidos (ex.: 'DR A/B' -> 'DR A_B')"""
+    return re.sub(r'[<>:"/\\|?*]', '_', str(nome))
+
+
+def dados_grafico_medico(medico, medico_stats):
+    """Números do gráfico de um médico (linha das estatísticas por médico)"""
+    return {
+        'medico': str(medico),
+        'total': int(medico_stats['Total_Atendimentos']),
+        'passou': int(medico_stats['Passou_Pelo_Tecnico']),
+        'nao_passou': int(medico_stats['Nao_Passou_Pelo_Tecnico']),
+        'percentual_passou': float(medico_stats['Percentual_Passou']),
+        'percentual_nao_passou': float(medico_stats['Percentual_Nao_Passou']),
+    }
+
+
+def dados_grafico_consolidado(stats):
+    """Números do gráfico consolidado (estatísticas de todos os médicos)"""
+    return {
+        'medicos': [str(medico) for medico in stats.index],
+        'passou': [int(valor) for valor in stats['Passou_Pelo_Tecnico']],
+        'nao_passou': [int(valor) for valor in stats['Nao_Passou_Pelo_Tecnico']],
+        'total': [int(valor) for valor in stats['Total_Atendimentos']],
+    }
+
+
+def desenhar_grafico_medico(fig, dados):
+    """
+    Desenha o gráfico de um médico mostrando:
+    - Total de atendimentos
+    - Quantidade que passou pelo técnico
+    - Quantidade que não passou pelo técnico
+    """
+    ax = fig.add_subplot()
+
+    categorias = ['Passou pelo\nTécnico', 'Não passou pelo\nTécnico']
+    valores = [dados['passou'], dados['nao_passou']]
+    percentuais = [dados['percentual_passou'], dados['percentual_nao_passou']]
+
+    # Criar gráfico de barras
+    bars = ax.bar(categorias, valores, color=[COR_PASSOU, COR_NAO_PASSOU], alpha=0.8, edgecolor='black', linewidth=1.5)
+
+    # Adicionar valores nas barras
+    for bar, valor, percentual in zip(bars, valores, percentuais):
+        altura = bar.get_height()
+        ax.text(bar.get_x() + bar.get_width()/2., altura + max(valores)*0.01,
+               f'{valor}\n({percentual}%)',
+               ha='center', va='bottom', fontsize=12, fontweight='bold')
+
+    # Configurações do gráfico
+    ax.set_ylabel('Quantidade de Atendimentos', fontsize=12, fontweight='bold')
+    ax.set_title(f'Atendimentos Médicos - {dados["medico"]}\n'
+                f'Total: {dados["total"]} atendimentos',
+                fontsize=14, fontweight='bold', pad=20)
+    ax.grid(axis='y', alpha=0.3, linestyle='--')
+    ax.set_ylim(0, max(valores) * 1.2)
+
+    # Adicionar linha indicando total
+    ax.axhline(y=dados['total'], color='blue', linestyle='--',
+              linewidth=2, alpha=0.5, label=f'Total: {dados["total"]}')
+    ax.legend(loc='upper right')
+
+
+def desenhar_grafico_consolidado(fig, dados):
+    """Desenha o gráfico de barras empilhadas com todos os médicos"""
+    ax = fig.add_subplot()
+
+    medicos, passou, nao_passou, totais = dados['medicos'], dados['passou'], dados['nao_passou'], dados['total']
+    x = range(len(medicos))
+    width = 0.6
+
+    # Criar barras empilhadas
+    ax.bar(x, passou, width, label='Passou pelo Técnico', color=COR_PASSOU, alpha=0.8, edgecolor='black')
+    ax.bar(x, nao_passou, width, bottom=passou, label='Não passou pelo Técnico',
+           color=COR_NAO_PASSOU, alpha=0.8, edgecolor='black')
+
+    # Adicionar valores nas barras
+    for i, total in enumerate(totais):
+        ax.text(i, total + max(totais) * 0.01,
+               f'Total: {total}', ha='center', va='bottom', fontsize=10, fontweight='bold')
+
+    # Configurações
+    ax.set_xlabel('Médico', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Quantidade de Atendimentos', fontsize=12, fontweight='bold')
+    ax.set_title('Cruzamento de Atendimentos - Todos os Médicos\n'
+                f'Total de atendimentos médicos: {sum(totais)}',
+                fontsize=14, fontweight='bold', pad=20)
+    ax.set_xticks(x)
+    ax.set_xticklabels(medicos, rotation=45, ha='right', fontsize=10)
+    ax.legend(loc='upper right', fontsize=11)
+    ax.grid(axis='y', alpha=0.3, linestyle='--')
+
+
+# Tipo de gráfico -> (tamanho da figura, função de desenho)
+DESENHOS = {
+    'medico': ((10, 6), desenhar_grafico_medico),
+    'consolidado': ((14, 8), desenhar_grafico_consolidado),
+}
+
+
+def impressao_grafico(tipo, dados, dpi, formato):
+    """Hash do que define o gráfico: tipo, números, DPI, formato e VERSAO_GRAFICOS"""
+    conteudo = json.dumps([VERSAO_GRAFICOS, tipo, dados, dpi, formato], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+
+def _desenhar(tipo, dados):
+    """Desenha um gráfico na figura reaproveitada do seu tamanho e a devolve"""
+    tamanho, desenhar = DESENHOS[tipo]
+    fig = _figura(tamanho)
+    desenhar(fig, dados)
+    fig.tight_layout()
+    return fig
+
+
+def _renderizar(tarefas, dpi):
+    """Executado em cada processo: desenha e salva o seu lote de (tipo, dados, caminho)"""
+    for tipo, dados, caminho in tarefas:
+        _desenhar(tipo, dados).savefig(caminho, dpi=dpi, bbox_inches='tight')
+    return [caminho for _, _, caminho in tarefas]
+
+
+def _renderizar_paralelo(tarefas, dpi, workers):
+    """Distribui as tarefas entre processos (nunca menos de GRAFICOS_POR_PROCESSO por processo)"""
+    workers = max(1, min(workers, math.ceil(len(tarefas) / GRAFICOS_POR_PROCESSO)))
+    if workers == 1:
+        return _renderizar(tarefas, dpi)
+
+    # Distribuir de forma intercalada para equilibrar os lotes
+    lotes = [tarefas[i::workers] for i in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futuros = [executor.submit(_renderizar, lote, dpi) for lote in lotes]
+        return [caminho for futuro in futuros for caminho in futuro.result()]
+
+
+def _ler_impressoes(pasta_saida):
+    try:
+        with open(os.path.join(pasta_saida, ARQUIVO_IMPRESSOES), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _salvar_impressoes(pasta_saida, impressoes):
+    caminho = os.path.join(pasta_saida, ARQUIVO_IMPRESSOES)
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(impressoes, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(temporario, caminho)
+
+
+def _validar(formato):
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de gráfico inválido: '{formato}'. Use um destes: {', '.join(FORMATOS)}")
+
+
+def _gerar_arquivos(graficos, pasta_saida, dpi, formato, workers, forcar):
+    """
+    Gera um arquivo por gráfico, pulando os que não mudaram
+
+    Args:
+        graficos: Lista de (tipo, dados, nome do arquivo sem extensão)
+
+    Returns:
+        Tupla (caminhos gerados, caminhos mantidos)
+    """
+    os.makedirs(pasta_saida, exist_ok=True)
+    impressoes = _ler_impressoes(pasta_saida)
+
+    pendentes = []
+    mantidos = []
+    for tipo, dados, nome in graficos:
+        arquivo = f'{nome_arquivo_grafico(nome)}.{formato}'
+        caminho = os.path.join(pasta_saida, arquivo)
+        impressao = impressao_grafico(tipo, dados, dpi, formato)
+        if not forcar and impressoes.get(arquivo) == impressao and os.path.exists(caminho):
+            mantidos.append(caminho)
+        else:
+            pendentes.append((tipo, dados, caminho))
+            impressoes[arquivo] = impressao
+
+    gerados = _renderizar_paralelo(pendentes, dpi, workers) if pendentes else []
+    _salvar_impressoes(pasta_saida, impressoes)
+    return gerados, mantidos
+
+
+def _gerar_pdf(graficos, pasta_saida, dpi, forcar):
+    """Gera um único PDF com uma página por gráfico, se algum gráfico mudou"""
+    os.makedirs(pasta_saida, exist_ok=True)
+    impressoes = _ler_impressoes(pasta_saida)
+    caminho = os.path.join(pasta_saida, NOME_PDF)
+    impressao = impressao_grafico('pdf', [[tipo, dados] for tipo, dados, _ in graficos], dpi, 'pdf')
+
+    if not forcar and impressoes.get(NOME_PDF) == impressao and os.path.exists(caminho):
+        return [], [caminho]
+
+    # As páginas vão para o mesmo arquivo, então são desenhadas neste processo
+    with PdfPages(caminho) as pdf:
+        for tipo, dados, _ in graficos:
+            pdf.savefig(_desenhar(tipo, dados), dpi=dpi, bbox_inches='tight')
+
+    impressoes[NOME_PDF] = impressao
+    _salvar_impressoes(pasta_saida, impressoes)
+    return [caminho], []
+
+
+def _remover_antigos(pasta_saida, atuais):
+    """
+    Apaga os gráficos registrados em ARQUIVO_IMPRESSOES que não estão em atuais
+
+    Só arquivos que este módulo gerou (os que têm hash registrado) são
+    apagados; outros arquivos da pasta ficam como estão.
+
+    Returns:
+        Lista com os caminhos apagados
+    """
+    impressoes = _ler_impressoes(pasta_saida)
+    antigos = [arquivo for arquivo in impressoes if arquivo not in atuais]
+    if not antigos:
+        return []
+
+    removidos = []
+    for arquivo in antigos:
+        del impressoes[arquivo]
+        caminho = os.path.join(pasta_saida, os.path.basename(arquivo))
+        if os.path.exists(caminho):
+            os.remove(caminho)
+            removidos.append(caminho)
+
+    _salvar_impressoes(pasta_saida, impressoes)
+    return removidos
+
+
+def gerar_graficos_por_medico(stats, pasta_saida='graficos', dpi=DPI_PADRAO, formato='png', workers=None, forcar=False):
+    """
+    Gera o gráfico de cada médico e o gráfico consolidado
+
+    Args:
+        stats: DataFrame com estatísticas por médico
+        pasta_saida: Pasta onde salvar os gráficos
+        dpi: Resolução das imagens
+        formato: 'png', 'svg' ou 'pdf' (um único PDF com todos os gráficos)
+        workers: Quantidade de processos (None usa WORKERS_PADRAO; 1 desenha tudo no processo atual)
+        forcar: Se True, desenha de novo mesmo os gráficos que não mudaram
+
+    Returns:
+        Lista com os caminhos dos gráficos (gerados e mantidos)
+    """
+    _validar(formato)
+    graficos = [('medico', dados_grafico_medico(medico, stats.loc[medico]), medico) for medico in stats.index]
+    graficos.append(('consolidado', dados_grafico_consolidado(stats), NOME_CONSOLIDADO))
+
+    if formato == 'pdf':
+        gerados, mantidos = _gerar_pdf(graficos, pasta_saida, dpi, forcar)
+    else:
+        gerados, mantidos = _gerar_arquivos(graficos, pasta_saida, dpi, formato,
+                                            WORKERS_PADRAO if workers is None else workers, forcar)
+    removidos = _remover_antigos(pasta_saida, {os.path.basename(caminho) for caminho in gerados + mantidos})
+
+    for caminho in gerados:
+        if os.path.basename(caminho).startswith(f'{NOME_CONSOLIDADO}.'):
+            print(f"✅ Gráfico consolidado salvo: {caminho}")
+        else:
+            print(f"✅ Gráfico salvo: {caminho}")
+    if mantidos:
+        print(f"⏭️ {len(mantidos)} arquivo(s) de gráfico sem alterações desde a última execução (mantidos)")
+    if removidos:
+        print(f"🗑️ {len(removidos)} arquivo(s) de gráfico que não fazem mais parte dos dados (apagados)")
+
+    return gerados + mantidos
+
@@ -0,0 +1,370 @@
+"""
+Histórico de vários meses em um dataset Parquet particionado por Mês/Dia
+
+Cada arquivo mensal adicionado é consolidado (mesmo processo do dashboard) e
+gravado em .historico/Mês=<mês>/Dia=<aba>/<hash do arquivo>-N.parquet. As
+consultas filtram por mês e por dia direto nas partições, então apenas os
+meses/dias pedidos são lidos para a memória.
+
+As colunas são gravadas já com os tipos do carregamento: as categóricas como
+dicionário, os indicadores de papel e percurso (calculados uma vez, ao
+adicionar o arquivo) como booleanos. A consulta não refaz o cruzamento.
+"""
+import argparse
+import glob
+import json
+import os
+from urllib.parse import unquote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from cache_planilha import calcular_hash
+from carregamento import adicionar_indicadores, carregar_planilha, compactar_tipos
+from leitor_xlsx import MESES, abrir_planilha, extrair_mes
+
+# Pasta do histórico (pode ser alterada por variável de ambiente)
+PASTA_HISTORICO = os.environ.get('DASHBOARD_HISTORICO_DIR', '.historico')
+
+# Índice dos arquivos já adicionados (o prefixo "_" faz o pyarrow ignorá-lo)
+ARQUIVO_INDICE = '_arquivos.json'
+
+# Formato dos arquivos gravados (1 = todas as colunas como texto, sem indicadores)
+VERSAO_FORMATO = 2
+
+# Mês usado quando a célula A1 não identifica o mês (o mesmo de consolidar_dados)
+MES_NAO_INFORMADO = 'Não informado'
+
+# O que fazer quando o mês do arquivo já está no histórico, vindo de outro arquivo:
+# recusar (padrão), substituir os arquivos do mês ou acrescentar (ex.: outra unidade)
+MODOS_MES_EXISTENTE = ('recusar', 'substituir', 'acrescentar')
+
+# Partições no formato Mês=Outubro/Dia=Dia%2001 (valores codificados como URL)
+PARTICIONAMENTO = ds.HivePartitioning(pa.schema([('Mês', pa.string()), ('Dia', pa.string())]))
+
+# Tipo das colunas categóricas no Parquet (o mesmo em todos os arquivos)
+TIPO_CATEGORIA = pa.dictionary(pa.int32(), pa.string())
+
+
+class MesJaNoHistorico(ValueError):
+    """O mês do arquivo já está no histórico, vindo de outro arquivo"""
+
+    def __init__(self, mes, arquivos):
+        self.mes = mes
+        self.arquivos = arquivos
+        super().__init__(
+            f"O mês {mes} já está no histórico ({', '.join(arquivos)}). "
+            "Escolha substituir o mês ou acrescentar este arquivo a ele (ex.: outra unidade)."
+        )
+
+
+def _ler_indice():
+    """Lê o índice de arquivos já adicionados (hash -> informações)"""
+    caminho = os.path.join(PASTA_HISTORICO, ARQUIVO_INDICE)
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _salvar_indice(indice):
+    """Grava o índice de arquivos de forma atômica"""
+    caminho = os.path.join(PASTA_HISTORICO, ARQUIVO_INDICE)
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(indice, f, ensure_ascii=False, indent=2)
+    os.replace(temporario, caminho)
+
+
+def _como_texto(serie):
+    """
+    Converte a coluna para texto, para que todos os meses tenham o mesmo esquema
+
+    Números inteiros guardados como float (por causa de células vazias) viram
+    "123" e não "123.0".
+    """
+    if pd.api.types.is_float_dtype(serie) and (serie.dropna() % 1 == 0).all():
+        serie = serie.astype('Int64')
+    return serie.astype('string')
+
+
+def _tabela_historico(df):
+    """
+    Tabela Arrow do DataFrame consolidado, com o esquema do histórico
+
+    Categóricas viram dicionário de texto e booleanos ficam booleanos; as
+    demais colunas (prontuário, paciente, colunas extras da planilha) são
+    gravadas como texto, que é o único tipo comum a todos os arquivos.
+    Mês e Dia são as partições.
+    """
+    colunas = {}
+    for coluna in df.columns:
+        serie = df[coluna]
+        if coluna in ('Mês', 'Dia'):
+            colunas[str(coluna)] = serie.astype('string')
+        elif isinstance(serie.dtype, pd.CategoricalDtype):
+            colunas[str(coluna)] = serie.cat.rename_categories([str(categoria) for categoria in serie.cat.categories])
+        elif pd.api.types.is_bool_dtype(serie):
+            colunas[str(coluna)] = serie
+        else:
+            colunas[str(coluna)] = _como_texto(serie)
+
+    # Sem os metadados do pandas: a leitura não depende da versão que gravou
+    tabela = pa.Table.from_pandas(pd.DataFrame(colunas), preserve_index=False).replace_schema_metadata(None)
+    esquema = pa.schema([
+        pa.field(campo.name, TIPO_CATEGORIA) if pa.types.is_dictionary(campo.type) else campo
+        for campo in tabela.schema
+    ])
+    return tabela.cast(esquema)
+
+
+def _gravar(df, hash_arquivo):
+    """Grava o DataFrame consolidado de um arquivo nas partições do histórico"""
+    os.makedirs(PASTA_HISTORICO, exist_ok=True)
+    ds.write_dataset(
+        _tabela_historico(df),
+        PASTA_HISTORICO,
+        format='parquet',
+        partitioning=PARTICIONAMENTO,
+        basename_template=f"{hash_arquivo[:16]}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore'
+    )
+
+
+def _arquivos_gravados(hash_arquivo, mes):
+    """Arquivos Parquet gravados a partir do arquivo indicado, no mês indicado"""
+    pasta_mes = _pastas_particao(PASTA_HISTORICO, 'Mês').get(mes)
+    if not pasta_mes:
+        return []
+    return glob.glob(os.path.join(glob.escape(pasta_mes), '*', f"{hash_arquivo[:16]}-*.parquet"))
+
+
+def _remover(hash_arquivo, mes):
+    """Apaga os dados de um arquivo do histórico (e as pastas que ficarem vazias)"""
+    for caminho in _arquivos_gravados(hash_arquivo, mes):
+        os.remove(caminho)
+        pasta_dia = os.path.dirname(caminho)
+        if not os.listdir(pasta_dia):
+            os.rmdir(pasta_dia)
+
+    pasta_mes = _pastas_particao(PASTA_HISTORICO, 'Mês').get(mes)
+    if pasta_mes and not os.listdir(pasta_mes):
+        os.rmdir(pasta_mes)
+
+
+def _ler_gravados(caminhos):
+    """Lê arquivos Parquet do histórico (com Mês e Dia das partições) para um DataFrame"""
+    dataset = ds.dataset(caminhos, format='parquet', partitioning=PARTICIONAMENTO,
+                         partition_base_dir=PASTA_HISTORICO)
+    return dataset.to_table().to_pandas()
+
+
+def _atualizar_formato(indice):
+    """
+    Regrava no formato atual os arquivos adicionados por versões anteriores
+
+    No formato 1 todas as colunas eram texto e os indicadores eram calculados
+    a cada consulta. Os dados são relidos, recebem os tipos e os indicadores
+    e são gravados de novo, uma única vez.
+
+    Returns:
+        O índice atualizado
+    """
+    antigos = [hash_arquivo for hash_arquivo, info in indice.items()
+               if info.get('formato', 1) < VERSAO_FORMATO]
+    for hash_arquivo in antigos:
+        mes = indice[hash_arquivo]['mes']
+        caminhos = _arquivos_gravados(hash_arquivo, mes)
+        if caminhos:
+            df = compactar_tipos(_ler_gravados(caminhos))
+            if {'Número Prontuário', 'Dia', 'Especialidade', 'Status'}.issubset(df.columns):
+                df = adicionar_indicadores(df)
+            _remover(hash_arquivo, mes)
+            _gravar(df, hash_arquivo)
+        indice[hash_arquivo]['formato'] = VERSAO_FORMATO
+
+    if antigos:
+        _salvar_indice(indice)
+    return indice
+
+
+def adicionar_planilha(arquivo, nome=None, mes_existente='recusar'):
+    """
+    Adiciona um arquivo mensal ao histórico
+
+    Um arquivo idêntico a um já adicionado é ignorado. Se o mês do arquivo já
+    tiver dados de outro arquivo, o que acontece depende de mes_existente:
+    'recusar' levanta MesJaNoHistorico sem ler as abas (nada é apagado),
+    'substituir' apaga os arquivos anteriores desse mês (ex.: o mesmo mês
+    reexportado com mais dias) e 'acrescentar' mantém os dois (ex.: outra
+    unidade no mesmo mês; os indicadores de percurso de cada arquivo são
+    calculados só com as linhas dele).
+
+    Args:
+        arquivo: Caminho do arquivo ou objeto tipo arquivo
+        nome: Nome do arquivo para exibição (padrão: nome do caminho)
+        mes_existente: 'recusar', 'substituir' ou 'acrescentar'
+
+    Returns:
+        Tupla (mês, quantidade de registros, True se foi adicionado agora)
+    """
+    if mes_existente not in MODOS_MES_EXISTENTE:
+        raise ValueError(f"Opção inválida para mês existente: '{mes_existente}'. "
+                         f"Use uma destas: {', '.join(MODOS_MES_EXISTENTE)}")
+
+    hash_arquivo = calcular_hash(arquivo)
+    indice = _atualizar_formato(_ler_indice())
+    if hash_arquivo in indice:
+        return indice[hash_arquivo]['mes'], indice[hash_arquivo]['registros'], False
+
+    # O mês (célula A1) é conferido antes de ler as abas "Dia"
+    wb = abrir_planilha(arquivo)
+    try:
+        mes = extrair_mes(wb) or MES_NAO_INFORMADO
+    finally:
+        wb.close()
+
+    anteriores = [h for h, info in indice.items() if info['mes'] == mes]
+    if anteriores and mes_existente == 'recusar':
+        raise MesJaNoHistorico(mes, [indice[h]['nome'] for h in anteriores])
+
+    df, _, _ = carregar_planilha(arquivo)
+
+    if mes_existente == 'substituir':
+        for h in anteriores:
+            _remover(h, mes)
+            del indice[h]
+
+    _gravar(df, hash_arquivo)
+
+    indice[hash_arquivo] = {
+        'nome': nome or os.path.basename(str(getattr(arquivo, 'name', arquivo))),
+        'mes': mes,
+        'registros': len(df),
+        'formato': VERSAO_FORMATO,
+    }
+    _salvar_indice(indice)
+
+    return mes, len(df), True
+
+
+def _pastas_particao(pasta, campo):
+    """Mapeia o valor de cada partição "campo=valor" dentro da pasta para o seu caminho"""
+    if not os.path.isdir(pasta):
+        return {}
+    prefixo = f"{campo}="
+    return {
+        unquote(nome[len(prefixo):]): os.path.join(pasta, nome)
+        for nome in os.listdir(pasta)
+        if nome.startswith(prefixo) and os.path.isdir(os.path.join(pasta, nome))
+    }
+
+
+def listar_meses():
+    """Meses presentes no histórico, na ordem do calendário (sem ler os dados)"""
+    meses = _pastas_particao(PASTA_HISTORICO, 'Mês')
+    return sorted(meses, key=lambda mes: (MESES.index(mes) if mes in MESES else len(MESES), mes))
+
+
+def listar_dias(meses=None):
+    """Abas "Dia" presentes nos meses indicados (sem ler os dados)"""
+    pastas_meses = _pastas_particao(PASTA_HISTORICO, 'Mês')
+    dias = set()
+    for mes in (pastas_meses if meses is None else meses):
+        if mes in pastas_meses:
+            dias.update(_pastas_particao(pastas_meses[mes], 'Dia'))
+    return sorted(dias)
+
+
+def assinatura(meses=None):
+    """
+    Identificação do conteúdo dos meses indicados, sem ler os dados
+
+    Pares (mês, hash do arquivo) dos arquivos de cada mês, em ordem: muda
+    quando um mês é substituído ou recebe outro arquivo, então serve de chave
+    para caches de resultados calculados a partir do histórico.
+
+    Args:
+        meses: Lista de meses (None = todos)
+    """
+    return tuple(sorted(
+        (info['mes'], hash_arquivo)
+        for hash_arquivo, info in _ler_indice().items()
+        if meses is None or info['mes'] in meses
+    ))
+
+
+def consultar(meses=None, dias=None, colunas=None):
+    """
+    Lê do histórico apenas as linhas dos meses e dias indicados
+
+    Os filtros são aplicados nas partições, então os arquivos dos outros
+    meses/dias nem são abertos.
+
+    Args:
+        meses: Lista de meses (None = todos)
+        dias: Lista de abas "Dia" (None = todas)
+        colunas: Colunas a ler (None = todas)
+
+    Returns:
+        DataFrame com os registros encontrados, com os mesmos tipos compactos
+        e as mesmas colunas de papel e percurso do carregamento de um arquivo (ver
+        carregamento.compactar_tipos e carregamento.adicionar_indicadores)
+    """
+    if not listar_meses():
+        return pd.DataFrame()
+    _atualizar_formato(_ler_indice())
+
+    filtro = None
+    if meses is not None:
+        filtro = ds.field('Mês').isin(list(meses))
+    if dias is not None:
+        filtro_dias = ds.field('Dia').isin(list(dias))
+        filtro = filtro_dias if filtro is None else filtro & filtro_dias
+
+    dataset = ds.dataset(PASTA_HISTORICO, format='parquet', partitioning=PARTICIONAMENTO)
+    tabela = dataset.to_table(filter=filtro, columns=colunas)
+
+    # Mês e Dia (das partições) também como dicionário: viram categorias na conversão
+    for coluna in ('Mês', 'Dia'):
+        if coluna in tabela.column_names:
+            posicao = tabela.schema.get_field_index(coluna)
+            tabela = tabela.set_column(posicao, coluna, tabela.column(coluna).dictionary_encode())
+    df = tabela.to_pandas()
+
+    # Só as categorias dos meses/dias lidos, em ordem alfabética, como no carregamento
+    # de um arquivo; compactar_tipos ordena os dias e converte o prontuário
+    for coluna in df.columns:
+        if isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            usadas = df[coluna].cat.remove_unused_categories()
+            df[coluna] = usadas.cat.reorder_categories(sorted(usadas.cat.categories))
+    return compactar_tipos(df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Adiciona arquivos mensais ao histórico")
+    parser.add_argument('arquivos', nargs='+', help="Arquivos .xlsx ou padrões (ex.: dados/*.xlsx)")
+    opcoes_mes = parser.add_mutually_exclusive_group()
+    opcoes_mes.add_argument('--substituir', action='store_true',
+                            help="Substituir os dados de um mês que já está no histórico")
+    opcoes_mes.add_argument('--acrescentar', action='store_true',
+                            help="Acrescentar ao mês que já está no histórico (ex.: outra unidade)")
+    args = parser.parse_args()
+
+    mes_existente = 'substituir' if args.substituir else 'acrescentar' if args.acrescentar else 'recusar'
+    arquivos = sorted({caminho for padrao in args.arquivos for caminho in (glob.glob(padrao) or [padrao])})
+
+    for caminho in arquivos:
+        try:
+            mes, registros, adicionado = adicionar_planilha(caminho, mes_existente=mes_existente)
+            if adicionado:
+                print(f"✅ {caminho}: {registros} registros adicionados em {mes}")
+            else:
+                print(f"ℹ️ {caminho}: já estava no histórico ({mes})")
+        except MesJaNoHistorico as e:
+            print(f"⚠️ {caminho}: {e} (use --substituir ou --acrescentar)")
+        except Exception as e:
+            print(f"❌ {caminho}: {e}")
+
+    print(f"\n📆 Meses no histórico: {', '.join(listar_meses())}")
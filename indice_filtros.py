@@ -0,0 +1,128 @@
+"""
+Índice de bitmaps para os filtros da sidebar (Dia, Profissional, Papel, Status, Mês)
+
+Montado uma vez por conjunto de dados: para cada valor de cada coluna de
+filtro guarda um bitmap das linhas com aquele valor (np.packbits, 1 bit por
+linha). Uma combinação de filtros é respondida com operações de bits: OU
+entre os valores escolhidos de uma coluna e E entre as colunas, sem comparar
+os textos das linhas. Quando mais da metade dos valores de uma coluna está
+escolhida, usa-se o complemento (OU dos não escolhidos, invertido), que é o
+caso comum de "quase tudo selecionado".
+
+As linhas só são materializadas quando alguém precisa delas (posicoes());
+o resultado de cada combinação fica guardado para os reruns seguintes.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+COLUNAS_FILTRO = ['Dia', 'Profissional', 'Papel', 'Especialidade', 'Status_Consolidado', 'Mês']
+
+# Combinações de filtros guardadas (as últimas usadas)
+MAX_COMBINACOES = 32
+
+
+def _contar_bits(bitmap):
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(bitmap).sum())
+    return int(np.unpackbits(bitmap).sum())
+
+
+class IndiceFiltros:
+    """
+    Bitmaps das linhas por valor das colunas de filtro
+
+    Os filtros seguem a mesma regra de cubo_atendimentos.filtrar_cubo: em cada
+    coluna a linha precisa ter um dos valores escolhidos; linhas com a coluna
+    vazia nunca passam. As posições devolvidas são posições (iloc) do
+    DataFrame usado na montagem. Pode ser compartilhado entre threads.
+    """
+
+    def __init__(self, df, colunas=COLUNAS_FILTRO):
+        self.linhas = len(df)
+        self._tamanho = (self.linhas + 7) // 8
+        self._bitmaps = {}
+
+        for coluna in colunas:
+            if coluna not in df.columns:
+                continue
+            serie = df[coluna]
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                codigos, valores = serie.cat.codes.to_numpy(), serie.cat.categories
+            else:
+                codigos, valores = pd.factorize(serie)
+            self._bitmaps[coluna] = {
+                valor: np.packbits(codigos == codigo)
+                for codigo, valor in enumerate(valores)
+            }
+
+        self._combinacoes = OrderedDict()
+        self._trava = threading.Lock()
+
+    @property
+    def colunas(self):
+        return list(self._bitmaps)
+
+    def _todas(self):
+        return np.packbits(np.ones(self.linhas, dtype=bool))
+
+    def _bitmap_coluna(self, coluna, valores):
+        """Linhas com um dos valores na coluna"""
+        bitmaps = self._bitmaps[coluna]
+        escolhidos = set(valores)
+        dentro = [bitmap for valor, bitmap in bitmaps.items() if valor in escolhidos]
+        fora = [bitmap for valor, bitmap in bitmaps.items() if valor not in escolhidos]
+
+        if len(dentro) <= len(fora):
+            resultado = np.zeros(self._tamanho, dtype=np.uint8)
+            for bitmap in dentro:
+                resultado |= bitmap
+            return resultado
+
+        # Quase tudo escolhido: todas as linhas com valor, menos as dos valores não escolhidos
+        resultado = np.zeros(self._tamanho, dtype=np.uint8)
+        for bitmap in bitmaps.values():
+            resultado |= bitmap
+        for bitmap in fora:
+            resultado &= ~bitmap
+        return resultado
+
+    def bitmap(self, filtros):
+        """
+        Bitmap (np.packbits) das linhas que atendem aos filtros
+
+        Args:
+            filtros: Dicionário {coluna: valores selecionados}; as colunas
+                precisam estar no índice
+        """
+        chave = tuple(sorted((coluna, frozenset(valores)) for coluna, valores in filtros.items()))
+        with self._trava:
+            if chave in self._combinacoes:
+                self._combinacoes.move_to_end(chave)
+                return self._combinacoes[chave]
+
+        resultado = self._todas()
+        for coluna, valores in filtros.items():
+            if coluna not in self._bitmaps:
+                raise KeyError(f"Coluna '{coluna}' não está no índice de filtros")
+            resultado &= self._bitmap_coluna(coluna, valores)
+
+        with self._trava:
+            self._combinacoes[chave] = resultado
+            while len(self._combinacoes) > MAX_COMBINACOES:
+                self._combinacoes.popitem(last=False)
+        return resultado
+
+    def contar(self, filtros):
+        """Quantidade de linhas que atendem aos filtros (sem materializar as linhas)"""
+        return _contar_bits(self.bitmap(filtros))
+
+    def mascara(self, filtros):
+        """Máscara booleana (uma posição por linha) dos filtros"""
+        return np.unpackbits(self.bitmap(filtros), count=self.linhas).astype(bool)
+
+    def posicoes(self, filtros):
+        """Posições (iloc) das linhas que atendem aos filtros, em ordem"""
+        return np.flatnonzero(self.mascara(filtros))
@@ -0,0 +1,159 @@
+"""
+Índice dos atendimentos por paciente (Número Prontuário)
+
+Montado uma vez por conjunto de dados: os prontuários são codificados
+(pd.factorize) e as posições das linhas são ordenadas por paciente e por dia.
+As linhas de cada paciente ficam contíguas em um único vetor de posições,
+e o início de cada paciente fica em outro vetor (como numa matriz esparsa
+em linhas). Consultar um paciente é só fatiar esse vetor, sem percorrer
+o DataFrame inteiro; as contagens por paciente (atendimentos, realizados,
+faltas) saem de um np.bincount na montagem.
+
+As posições são posições de linha (iloc) do DataFrame usado na montagem:
+o índice só vale para esse DataFrame.
+"""
+import numpy as np
+import pandas as pd
+
+from carregamento import adicionar_data_atendimento
+from especialidades import normalizar_texto
+
+COLUNA_PRONTUARIO = 'Número Prontuário'
+
+# Status consolidado que conta como falta
+STATUS_FALTOSO = 'Faltoso'
+
+# A partir de quantas faltas o paciente é marcado como faltoso recorrente
+FALTAS_RECORRENTES = 2
+
+
+def _ordem_dias(df):
+    """Posição de cada linha no tempo (dia do ano; Dia/Mês viram Data_Atendimento)"""
+    if 'Data_Atendimento' in df.columns:
+        datas = df['Data_Atendimento']
+    elif 'Dia' in df.columns:
+        colunas = [coluna for coluna in ('Dia', 'Mês') if coluna in df.columns]
+        datas = adicionar_data_atendimento(df[colunas].copy())['Data_Atendimento']
+    else:
+        return np.zeros(len(df))
+    # Linhas sem data vão para o fim do paciente
+    return datas.to_numpy(dtype='float64', na_value=np.inf)
+
+
+class IndicePacientes:
+    """
+    Posições das linhas de cada paciente, ordenadas por dia
+
+    Atributos:
+        prontuarios: Prontuários distintos, em ordem (código -> prontuário)
+        posicoes: Posições (iloc) das linhas, agrupadas por paciente e ordenadas por dia
+        inicios: Onde começa cada paciente em posicoes (o último item é o total)
+        atendimentos, realizados, faltas: Contagens por paciente (mesma ordem de prontuarios)
+        linhas: Quantidade de linhas do DataFrame usado na montagem
+    """
+
+    def __init__(self, df):
+        self.linhas = len(df)
+        codigos, self.prontuarios = pd.factorize(df[COLUNA_PRONTUARIO], sort=True)
+        quantidade = len(self.prontuarios)
+
+        # Linhas sem prontuário (código -1) ficam fora do índice
+        validas = np.flatnonzero(codigos >= 0)
+        codigos_validos = codigos[validas]
+        ordem = np.lexsort((validas, _ordem_dias(df)[validas], codigos_validos))
+        self.posicoes = validas[ordem]
+
+        self.atendimentos = np.bincount(codigos_validos, minlength=quantidade)
+        self.inicios = np.concatenate([[0], np.cumsum(self.atendimentos)])
+
+        def contar(marcados):
+            return np.bincount(codigos_validos, weights=marcados[validas], minlength=quantidade).astype(np.int64)
+
+        realizados = df['Realizado'].to_numpy(dtype=bool) if 'Realizado' in df.columns else np.zeros(len(df), dtype=bool)
+        self.realizados = contar(realizados)
+        if 'Status_Consolidado' in df.columns:
+            self.faltas = contar((df['Status_Consolidado'] == STATUS_FALTOSO).to_numpy(dtype=bool))
+        else:
+            self.faltas = np.zeros(quantidade, dtype=np.int64)
+
+        # Nome do paciente no primeiro atendimento; a busca por nome compara
+        # os nomes normalizados (um por paciente, não por linha)
+        if 'Paciente' in df.columns and quantidade:
+            self.nomes = df['Paciente'].to_numpy(dtype=object)[self.posicoes[self.inicios[:-1]]]
+        else:
+            self.nomes = np.full(quantidade, None, dtype=object)
+        self._nomes_normalizados = [normalizar_texto(nome) for nome in self.nomes]
+
+    def __len__(self):
+        return len(self.prontuarios)
+
+    def codigo(self, prontuario):
+        """Código do prontuário no índice (-1 se não existir)"""
+        if pd.api.types.is_integer_dtype(self.prontuarios.dtype):
+            try:
+                prontuario = int(str(prontuario).strip())
+            except ValueError:
+                return -1
+        else:
+            prontuario = str(prontuario).strip()
+        return int(self.prontuarios.get_indexer([prontuario])[0])
+
+    def posicoes_paciente(self, prontuario):
+        """Posições (iloc) das linhas do paciente, em ordem de dia (vazio se não existir)"""
+        codigo = self.codigo(prontuario)
+        if codigo < 0:
+            return self.posicoes[:0]
+        return self.posicoes[self.inicios[codigo]:self.inicios[codigo + 1]]
+
+    def atendimentos_paciente(self, df, prontuario):
+        """Linhas do paciente em df (o mesmo DataFrame usado na montagem), em ordem de dia"""
+        if len(df) != self.linhas:
+            raise ValueError(f"O índice foi montado com {self.linhas} linhas, mas o DataFrame tem {len(df)}")
+        return df.iloc[self.posicoes_paciente(prontuario)]
+
+    def buscar(self, texto, limite=50):
+        """
+        Prontuários que correspondem ao texto
+
+        Um número é procurado só como prontuário exato; outro texto, como
+        prontuário exato e nos nomes dos pacientes (contém o texto, sem
+        diferenciar acentos e maiúsculas), até o limite.
+        """
+        texto = str(texto).strip()
+        if not texto:
+            return []
+
+        encontrados = []
+        codigo = self.codigo(texto)
+        if codigo >= 0:
+            encontrados.append(codigo)
+
+        if not texto.isdigit():
+            procurado = normalizar_texto(texto)
+            for codigo, nome in enumerate(self._nomes_normalizados):
+                if len(encontrados) >= limite:
+                    break
+                if procurado in nome and codigo not in encontrados:
+                    encontrados.append(codigo)
+
+        return self.prontuarios[encontrados].tolist()
+
+    def resumo(self, minimo_faltas=FALTAS_RECORRENTES):
+        """
+        Uma linha por paciente: nome, atendimentos, realizados, faltas e se é faltoso recorrente
+
+        Returns:
+            DataFrame indexado pelo prontuário
+        """
+        return pd.DataFrame({
+            'Paciente': self.nomes,
+            'Atendimentos': self.atendimentos,
+            'Realizados': self.realizados,
+            'Faltas': self.faltas,
+            'Faltoso_Recorrente': self.faltas >= minimo_faltas,
+        }, index=pd.Index(self.prontuarios, name=COLUNA_PRONTUARIO))
+
+    def faltosos_recorrentes(self, minimo_faltas=FALTAS_RECORRENTES):
+        """Pacientes com pelo menos minimo_faltas faltas, dos que mais faltaram para os que menos faltaram"""
+        resumo = self.resumo(minimo_faltas)
+        return resumo[resumo['Faltoso_Recorrente']].sort_values('Faltas', ascending=False, kind='stable')
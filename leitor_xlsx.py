@@ -0,0 +1,598 @@
+"""
+Leitor de planilhas XLSX em modo streaming para as abas "Dia"
+
+Lê as linhas com o openpyxl em modo somente leitura (read_only/values_only),
+acumula os valores direto em buffers por coluna e monta um único DataFrame
+no final, sem criar um DataFrame por aba nem fazer pd.concat. As abas podem
+ser distribuídas entre vários processos (ler_abas_paralelo).
+
+Com usar_cache=True, cada aba recebe uma impressão digital (hash do XML da
+aba dentro do .xlsx) e abas já lidas antes, em qualquer versão do arquivo,
+são reaproveitadas do cache em disco: quando o arquivo do mês é exportado
+de novo com um dia a mais, só a aba nova é lida.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from xml.etree import ElementTree
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from cache_planilha import ler_cache_aba, salvar_cache_aba
+
+# Lista de nomes de meses em português
+MESES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho',
+         'Julho', 'Agosto', 'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+
+# Abas que não são de dias nem de mês
+ABAS_CONHECIDAS = ['Consolidado']
+
+# Quantidade padrão de processos para ler as abas em paralelo
+# (LEITOR_XLSX_WORKERS=1 desativa o paralelismo)
+WORKERS_PADRAO = int(os.environ.get('LEITOR_XLSX_WORKERS', os.cpu_count() or 1))
+
+# Textos que o pd.read_excel trata como valor ausente (na_values padrão do pandas)
+VALORES_NA = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+              '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None',
+              'n/a', 'nan', 'null'}
+
+# Textos que o pd.read_excel converte em booleanos (coluna só com esses valores)
+VALORES_VERDADEIROS = {'True', 'TRUE', 'true'}
+VALORES_FALSOS = {'False', 'FALSE', 'false'}
+
+# Namespaces do formato .xlsx usados para localizar o XML de cada aba
+NS_PLANILHA = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+NS_RELACAO = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+# Índice de texto compartilhado de uma célula (<c ... t="s"><v>12</v></c>)
+RE_TEXTO_COMPARTILHADO = re.compile(rb't="s"[^>]*>\s*<(?:\w+:)?v>(\d+)<')
+RE_FIM_ITEM_TEXTO = re.compile(rb'</(?:\w+:)?si>')
+RE_INICIO_ITEM_TEXTO = re.compile(rb'<(?:\w+:)?si[\s>]')
+
+
+def abrir_planilha(arquivo):
+    """
+    Abre o arquivo Excel em modo somente leitura
+
+    Args:
+        arquivo: Caminho do arquivo ou objeto tipo arquivo (UploadedFile, BytesIO)
+
+    Returns:
+        Workbook do openpyxl (deve ser fechado com .close())
+    """
+    if hasattr(arquivo, 'seek'):
+        arquivo.seek(0)
+    return load_workbook(arquivo, read_only=True, data_only=True)
+
+
+def _converter_valor(valor):
+    """Converte o valor da célula da mesma forma que o pd.read_excel"""
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    if isinstance(valor, str) and valor in VALORES_NA:
+        return None
+    return valor
+
+
+def _nomes_colunas(cabecalho):
+    """Gera os nomes das colunas a partir da linha de cabeçalho (igual ao pandas)"""
+    nomes = []
+    vistos = {}
+    for i, valor in enumerate(cabecalho):
+        nome = _converter_valor(valor)
+        if nome is None:
+            nome = f"Unnamed: {i}"
+        # Nomes repetidos recebem sufixo .1, .2, ...
+        if nome in vistos:
+            vistos[nome] += 1
+            nome = f"{nome}.{vistos[nome]}"
+        else:
+            vistos[nome] = 0
+        nomes.append(nome)
+    return nomes
+
+
+def _ler_aba(ws):
+    """
+    Lê uma aba linha a linha e devolve (nomes das colunas, buffers por coluna)
+
+    Linhas em branco no meio da aba são mantidas (como no pd.read_excel),
+    mas as linhas em branco no final são descartadas.
+    """
+    ws.reset_dimensions()
+    linhas = ws.iter_rows(values_only=True)
+
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        return [], []
+
+    nomes = _nomes_colunas(cabecalho)
+    buffers = [[] for _ in nomes]
+    total_linhas = 0
+    linhas_em_branco = 0
+
+    for linha in linhas:
+        valores = [_converter_valor(v) for v in linha]
+        if all(v is None for v in valores):
+            linhas_em_branco += 1
+            continue
+
+        # Linhas em branco só entram quando aparece uma linha com dados depois delas
+        if linhas_em_branco:
+            for buffer in buffers:
+                buffer.extend([None] * linhas_em_branco)
+            total_linhas += linhas_em_branco
+            linhas_em_branco = 0
+
+        # Linha mais larga que o cabeçalho: criar colunas sem nome
+        while len(valores) > len(nomes):
+            nomes.append(f"Unnamed: {len(nomes)}")
+            buffers.append([None] * total_linhas)
+
+        for j, buffer in enumerate(buffers):
+            buffer.append(valores[j] if j < len(valores) else None)
+        total_linhas += 1
+
+    return nomes, buffers
+
+
+def _ler_abas_buffers(wb, abas, ignorar_erros=False):
+    """
+    Lê cada aba e devolve uma lista de (aba, nomes, buffers, erro)
+
+    Com ignorar_erros=True, a aba com erro vem com nomes/buffers vazios e a
+    mensagem em "erro"; caso contrário a exceção é propagada.
+    """
+    resultados = []
+    for aba in abas:
+        try:
+            nomes, buffers = _ler_aba(wb[aba])
+            resultados.append((aba, nomes, buffers, None))
+        except Exception as e:
+            if not ignorar_erros:
+                raise
+            resultados.append((aba, [], [], str(e)))
+    return resultados
+
+
+def _inferir_tipo(serie):
+    """
+    Tipo da coluna inferido como no pd.read_excel
+
+    Coluna de texto ou de tipos mistos vira numérica se todos os valores forem
+    números ou texto numérico ('123', '0789', ' 7 '); se não, vira booleana se
+    todos forem 'True'/'FALSE'/... (ou booleanos); só com datas vira data (NaT
+    nas vazias); se não, fica como está.
+    Colunas totalmente vazias ficam como float (NaN).
+    """
+    if not (serie.dtype == object or isinstance(serie.dtype, pd.StringDtype)):
+        return serie
+
+    try:
+        return pd.to_numeric(serie)
+    except (ValueError, TypeError):
+        pass
+
+    preenchidos = serie.dropna()
+    if len(preenchidos) and all(isinstance(valor, datetime) for valor in preenchidos):
+        return pd.to_datetime(serie)
+
+    verdadeiros = {True} | VALORES_VERDADEIROS
+    # Como no pandas, só converte se o primeiro valor for texto ('TRUE', True
+    # converte; True, 'FALSE' fica como está)
+    if (len(preenchidos) and isinstance(preenchidos.iloc[0], str)
+            and set(preenchidos.unique().tolist()) <= verdadeiros | {False} | VALORES_FALSOS):
+        serie = serie.map(lambda valor: valor in verdadeiros, na_action='ignore')
+        if serie.notna().all():
+            return serie.astype(bool)
+        serie = serie.astype(object)
+    if serie.dtype == object:
+        # Células vazias como NaN, não None
+        return serie.where(serie.notna(), np.nan)
+    return serie
+
+
+def _valores_aba(buffer):
+    """Valores de uma coluna de uma aba com os tipos que o pd.read_excel daria à aba"""
+    return _inferir_tipo(pd.Series(buffer, dtype=object)).tolist()
+
+
+def _montar_dataframe(resultados, coluna_aba):
+    """
+    Junta os buffers de cada aba (na ordem recebida) em um único DataFrame
+
+    Os tipos são inferidos em cada aba, como no pd.read_excel aba por aba
+    seguido de pd.concat: texto numérico vira número em vez de deixar a
+    coluna com 123 e '123' misturados.
+    """
+    colunas = {}
+    total_linhas = 0
+
+    for aba, nomes, buffers, erro in resultados:
+        if erro is not None:
+            print(f"⚠️ Erro ao ler {aba}: {erro}")
+            continue
+
+        linhas_aba = len(buffers[0]) if buffers else 0
+        nomes = nomes + [coluna_aba]
+        buffers = [_valores_aba(buffer) for buffer in buffers] + [[aba] * linhas_aba]
+
+        for nome, buffer in zip(nomes, buffers):
+            if nome not in colunas:
+                # Coluna nova: preencher as linhas das abas anteriores
+                colunas[nome] = [np.nan] * total_linhas
+            colunas[nome].extend(buffer)
+
+        # Colunas que não existem nesta aba ficam vazias
+        for nome, buffer in colunas.items():
+            if len(buffer) < total_linhas + linhas_aba:
+                buffer.extend([np.nan] * linhas_aba)
+
+        total_linhas += linhas_aba
+
+    # Colunas totalmente vazias ficam como float (NaN), igual ao pd.read_excel
+    return pd.DataFrame({nome: pd.Series(valores) for nome, valores in colunas.items()})
+
+
+def ler_abas(wb, abas, coluna_aba='Dia', ignorar_erros=False):
+    """
+    Lê as abas indicadas e consolida tudo em um único DataFrame
+
+    Args:
+        wb: Workbook aberto com abrir_planilha()
+        abas: Lista com os nomes das abas a ler (na ordem desejada)
+        coluna_aba: Nome da coluna que recebe o nome da aba de origem
+        ignorar_erros: Se True, abas com erro são avisadas e ignoradas
+
+    Returns:
+        DataFrame consolidado
+    """
+    resultados = _ler_abas_buffers(wb, abas, ignorar_erros)
+    return _montar_dataframe(resultados, coluna_aba)
+
+
+def _ler_lote(conteudo, abas, ignorar_erros):
+    """Executado em cada processo do pool: abre o arquivo e lê o seu lote de abas"""
+    wb = abrir_planilha(BytesIO(conteudo) if isinstance(conteudo, bytes) else conteudo)
+    try:
+        return _ler_abas_buffers(wb, abas, ignorar_erros)
+    finally:
+        wb.close()
+
+
+def _ler_abas_buffers_paralelo(conteudo, abas, ignorar_erros, workers):
+    """Versão paralela de _ler_abas_buffers(), com os resultados na ordem de abas"""
+    workers = max(1, min(workers, len(abas)))
+
+    # Distribuir as abas de forma intercalada para equilibrar os lotes
+    lotes = [abas[i::workers] for i in range(workers)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futuros = [executor.submit(_ler_lote, conteudo, lote, ignorar_erros) for lote in lotes]
+        resultados = [resultado for futuro in futuros for resultado in futuro.result()]
+
+    # Voltar para a ordem original das abas
+    ordem = {aba: i for i, aba in enumerate(abas)}
+    resultados.sort(key=lambda resultado: ordem[resultado[0]])
+    return resultados
+
+
+def ler_abas_paralelo(conteudo, abas, coluna_aba='Dia', ignorar_erros=False, workers=WORKERS_PADRAO):
+    """
+    Lê as abas em paralelo, distribuídas entre processos
+
+    Cada processo abre o arquivo uma única vez e lê o seu lote de abas. Os
+    resultados são juntados na ordem original das abas, então o DataFrame
+    final é idêntico ao de ler_abas().
+
+    Args:
+        conteudo: Bytes do arquivo ou caminho do arquivo
+        abas: Lista com os nomes das abas a ler (na ordem desejada)
+        coluna_aba: Nome da coluna que recebe o nome da aba de origem
+        ignorar_erros: Se True, abas com erro são avisadas e ignoradas
+        workers: Quantidade de processos
+
+    Returns:
+        DataFrame consolidado
+    """
+    resultados = _ler_abas_buffers_paralelo(conteudo, abas, ignorar_erros, workers)
+    return _montar_dataframe(resultados, coluna_aba)
+
+
+def _caminho_parte(pasta, alvo):
+    """Resolve o caminho de uma parte do .xlsx a partir do alvo de uma relação"""
+    if alvo.startswith('/'):
+        return alvo.lstrip('/')
+    return posixpath.normpath(posixpath.join(pasta, alvo))
+
+
+def _relacoes(zf, parte):
+    """Lê o arquivo de relações de uma parte: {id: (tipo, caminho da parte alvo)}"""
+    pasta, nome = posixpath.split(parte)
+    caminho_rels = posixpath.join(pasta, '_rels', nome + '.rels')
+    if caminho_rels not in zf.namelist():
+        return {}
+    raiz = ElementTree.fromstring(zf.read(caminho_rels))
+    return {
+        rel.get('Id'): (rel.get('Type', ''), _caminho_parte(pasta, rel.get('Target', '')))
+        for rel in raiz
+    }
+
+
+def impressoes_abas(arquivo):
+    """
+    Calcula a impressão digital (SHA-256) de cada aba do arquivo .xlsx
+
+    A impressão cobre o XML da aba, os textos compartilhados que ela usa e os
+    estilos (formatos de data), então só muda quando o conteúdo lido da aba
+    muda. O XML é apenas lido de dentro do zip, sem interpretar as células.
+
+    Args:
+        arquivo: Bytes, caminho do arquivo ou objeto tipo arquivo
+
+    Returns:
+        Dicionário {nome da aba: impressão em hexadecimal}
+    """
+    if isinstance(arquivo, (bytes, bytearray)):
+        arquivo = BytesIO(arquivo)
+    elif hasattr(arquivo, 'seek'):
+        arquivo.seek(0)
+
+    with zipfile.ZipFile(arquivo) as zf:
+        # Localizar o workbook.xml pela relação principal do pacote
+        parte_workbook = 'xl/workbook.xml'
+        for tipo, caminho in _relacoes(zf, '').values():
+            if tipo.endswith('/officeDocument'):
+                parte_workbook = caminho
+        relacoes = _relacoes(zf, parte_workbook)
+
+        itens_texto = []
+        estilos = b''
+        for tipo, caminho in relacoes.values():
+            if tipo.endswith('/sharedStrings'):
+                conteudo_textos = zf.read(caminho)
+                # Descartar o cabeçalho <sst count=...>, que muda a cada exportação
+                inicio = RE_INICIO_ITEM_TEXTO.search(conteudo_textos)
+                if inicio:
+                    itens_texto = RE_FIM_ITEM_TEXTO.split(conteudo_textos[inicio.start():])
+            elif tipo.endswith('/styles'):
+                estilos = zf.read(caminho)
+        hash_estilos = hashlib.sha256(estilos).digest()
+
+        impressoes = {}
+        raiz = ElementTree.fromstring(zf.read(parte_workbook))
+        for sheet in raiz.iter(f'{NS_PLANILHA}sheet'):
+            _, caminho = relacoes.get(sheet.get(f'{NS_RELACAO}id'), ('', None))
+            if caminho is None:
+                continue
+            conteudo_aba = zf.read(caminho)
+
+            sha = hashlib.sha256(conteudo_aba)
+            sha.update(hash_estilos)
+            indices = sorted({int(i) for i in RE_TEXTO_COMPARTILHADO.findall(conteudo_aba)})
+            for i in indices:
+                sha.update(itens_texto[i] if i < len(itens_texto) else b'?')
+                sha.update(b'\0')
+            impressoes[sheet.get('name')] = sha.hexdigest()
+
+    return impressoes
+
+
+def _ler_abas_com_cache(wb, conteudo, abas, impressoes, ignorar_erros, workers):
+    """
+    Lê as abas reaproveitando do cache as que têm a mesma impressão digital
+
+    Só as abas novas ou modificadas são lidas do arquivo (em paralelo se
+    workers > 1), e essas entram no cache para as próximas leituras.
+    """
+    resultados = {}
+    faltando = []
+    for aba in abas:
+        impressao = impressoes.get(aba)
+        lida = ler_cache_aba(impressao) if impressao else None
+        if lida is not None:
+            resultados[aba] = (aba, lida[0], lida[1], None)
+        else:
+            faltando.append(aba)
+
+    if workers > 1 and len(faltando) > 1:
+        lidas = _ler_abas_buffers_paralelo(conteudo, faltando, ignorar_erros, workers)
+    else:
+        lidas = _ler_abas_buffers(wb, faltando, ignorar_erros)
+
+    for aba, nomes, buffers, erro in lidas:
+        resultados[aba] = (aba, nomes, buffers, erro)
+        if erro is None and impressoes.get(aba):
+            salvar_cache_aba(impressoes[aba], nomes, buffers)
+
+    return [resultados[aba] for aba in abas]
+
+
+def _calcular_impressoes(conteudo):
+    """impressoes_abas() que não interrompe a leitura: sem impressões, sem cache"""
+    try:
+        return impressoes_abas(conteudo)
+    except Exception:
+        return {}
+
+
+def ler_celula_a1(ws):
+    """Lê apenas o valor da célula A1 da aba (None se a aba estiver vazia)"""
+    ws.reset_dimensions()
+    primeira_linha = next(ws.iter_rows(min_row=1, max_row=1, max_col=1, values_only=True), None)
+    return primeira_linha[0] if primeira_linha else None
+
+
+def extrair_mes(wb):
+    """
+    Identifica o mês do arquivo pela célula A1 das abas que não são de dia
+
+    Returns:
+        Nome do mês em português ou None se não for identificado
+    """
+    mes_do_arquivo = None
+
+    for aba in wb.sheetnames:
+        # Se não começa com "Dia" e não é "Consolidado", pode ser uma aba de mês
+        if aba.startswith("Dia") or aba in ABAS_CONHECIDAS:
+            continue
+        try:
+            valor_celula_a1 = ler_celula_a1(wb[aba])
+
+            if valor_celula_a1 is None or pd.isna(valor_celula_a1):
+                continue
+
+            # Se for uma data (datetime)
+            if hasattr(valor_celula_a1, 'month'):
+                mes_do_arquivo = MESES[valor_celula_a1.month - 1]
+            else:
+                # Tentar converter string para data
+                try:
+                    data = pd.to_datetime(valor_celula_a1)
+                    mes_do_arquivo = MESES[data.month - 1]
+                except Exception:
+                    # Verificar se é um mês em texto
+                    valor_str = str(valor_celula_a1).strip()
+                    if valor_str in MESES:
+                        mes_do_arquivo = valor_str
+        except Exception:
+            pass  # Ignorar erros na leitura da aba de mês
+
+    return mes_do_arquivo
+
+
+def ler_planilha(arquivo, coluna_aba='Dia', ignorar_erros=False, workers=None, usar_cache=False):
+    """
+    Lê todas as abas "Dia" do arquivo em um único DataFrame
+
+    Args:
+        arquivo: Caminho do arquivo ou objeto tipo arquivo
+        coluna_aba: Nome da coluna que recebe o nome da aba de origem
+        ignorar_erros: Se True, abas com erro são avisadas e ignoradas
+        workers: Quantidade de processos para ler as abas em paralelo
+            (None usa WORKERS_PADRAO; 1 lê tudo no processo atual)
+        usar_cache: Se True, reaproveita as abas já lidas antes (mesma
+            impressão digital) e guarda as abas novas no cache em disco
+
+    Returns:
+        Tupla (DataFrame consolidado, lista com todas as abas, mês ou None)
+    """
+    if workers is None:
+        workers = WORKERS_PADRAO
+
+    # Os processos do pool precisam do conteúdo do arquivo, não do objeto aberto
+    if hasattr(arquivo, 'read'):
+        arquivo.seek(0)
+        arquivo = arquivo.read()
+    conteudo = arquivo
+    if isinstance(conteudo, bytes):
+        arquivo = BytesIO(conteudo)
+
+    wb = abrir_planilha(arquivo)
+    try:
+        abas = list(wb.sheetnames)
+        abas_dia = [aba for aba in abas if aba.startswith("Dia")]
+
+        if not abas_dia:
+            raise ValueError("Nenhuma aba 'Dia' encontrada no arquivo!")
+
+        if usar_cache:
+            impressoes = _calcular_impressoes(conteudo)
+            resultados = _ler_abas_com_cache(wb, conteudo, abas_dia, impressoes, ignorar_erros, workers)
+            df = _montar_dataframe(resultados, coluna_aba)
+        elif workers > 1 and len(abas_dia) > 1:
+            df = ler_abas_paralelo(conteudo, abas_dia, coluna_aba=coluna_aba,
+                                   ignorar_erros=ignorar_erros, workers=workers)
+        else:
+            df = ler_abas(wb, abas_dia, coluna_aba=coluna_aba, ignorar_erros=ignorar_erros)
+        if coluna_aba not in df.columns:
+            raise ValueError("Nenhuma aba 'Dia' pôde ser lida!")
+
+        mes = extrair_mes(wb)
+    finally:
+        wb.close()
+
+    return df, abas, mes
+
+
+class PlanilhaSobDemanda:
+    """
+    Planilha aberta para leitura sob demanda das abas "Dia"
+
+    A lista de abas e o mês (célula A1) são lidos na abertura. Cada aba "Dia"
+    só é lida na primeira vez em que é pedida em carregar() e fica guardada
+    para as chamadas seguintes. Pode ser compartilhada entre threads.
+
+    Com usar_cache=True, as abas cuja impressão digital já está no cache em
+    disco (lidas de outra versão do mesmo arquivo) não são lidas de novo.
+    """
+
+    def __init__(self, arquivo, coluna_aba='Dia', usar_cache=True):
+        if hasattr(arquivo, 'read'):
+            arquivo.seek(0)
+            arquivo = arquivo.read()
+        self._conteudo = arquivo
+        self.coluna_aba = coluna_aba
+
+        self._wb = abrir_planilha(BytesIO(arquivo) if isinstance(arquivo, bytes) else arquivo)
+        self.abas = list(self._wb.sheetnames)
+        self.abas_dia = [aba for aba in self.abas if aba.startswith("Dia")]
+        self.mes = extrair_mes(self._wb)
+
+        if not self.abas_dia:
+            self._wb.close()
+            raise ValueError("Nenhuma aba 'Dia' encontrada no arquivo!")
+
+        # Impressão digital de cada aba (vazio se o cache não for usado)
+        self.impressoes = _calcular_impressoes(arquivo) if usar_cache else {}
+
+        # Buffers das abas já lidas: aba -> (aba, nomes, buffers, erro)
+        self._lidas = {}
+        self._trava = threading.Lock()
+
+    @property
+    def abas_lidas(self):
+        """Abas "Dia" que já foram lidas, na ordem do arquivo"""
+        return [aba for aba in self.abas_dia if aba in self._lidas]
+
+    def carregar(self, abas=None, ignorar_erros=False, workers=None):
+        """
+        Devolve o DataFrame consolidado das abas pedidas
+
+        Apenas as abas que ainda não foram lidas são processadas.
+
+        Args:
+            abas: Abas "Dia" desejadas (None = todas)
+            ignorar_erros: Se True, abas com erro são avisadas e ignoradas
+            workers: Processos para ler as abas que faltam (None usa WORKERS_PADRAO)
+
+        Returns:
+            DataFrame consolidado, com as abas na ordem do arquivo
+        """
+        if workers is None:
+            workers = WORKERS_PADRAO
+
+        pedidas = set(self.abas_dia if abas is None else abas)
+        abas = [aba for aba in self.abas_dia if aba in pedidas]
+
+        with self._trava:
+            faltando = [aba for aba in abas if aba not in self._lidas]
+            resultados = _ler_abas_com_cache(self._wb, self._conteudo, faltando, self.impressoes,
+                                             ignorar_erros, workers)
+
+            for resultado in resultados:
+                self._lidas[resultado[0]] = resultado
+
+        return _montar_dataframe([self._lidas[aba] for aba in abas], self.coluna_aba)
+
+    def fechar(self):
+        """Fecha o arquivo (as abas já lidas continuam disponíveis)"""
+        self._wb.close()
@@ -0,0 +1,138 @@
+"""
+Regras de status dos atendimentos, lidas da tabela status_atendimento.csv
+
+Cada linha da tabela diz, para um status da planilha, qual é o status
+consolidado exibido no dashboard e se o atendimento conta como REALIZADO no
+cruzamento. A linha "(vazio)" vale para células sem status e a linha "*"
+para qualquer status que não esteja na tabela. Para mudar as regras basta
+editar a tabela.
+
+O mapeamento é feito uma vez por valor distinto da coluna e depois aplicado
+a todas as linhas de uma vez (pd.factorize), sem chamar uma função por linha.
+"""
+import csv
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Tabela com as regras (pode ser alterada por variável de ambiente)
+TABELA_STATUS = os.environ.get(
+    'DASHBOARD_TABELA_STATUS',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'status_atendimento.csv')
+)
+
+# Chaves especiais da tabela
+STATUS_VAZIO = '(vazio)'
+STATUS_OUTROS = '*'
+
+
+def normalizar_status(status):
+    """
+    Forma usada para comparar os status: texto sem espaços nas pontas e em
+    maiúsculas; célula vazia ou só com espaços vira STATUS_VAZIO
+    """
+    if status is None or pd.isna(status):
+        return STATUS_VAZIO
+    return str(status).strip().upper() or STATUS_VAZIO
+
+
+@lru_cache(maxsize=4)
+def _ler_tabela(caminho, modificado_em):
+    """Lê a tabela (em cache até o arquivo ser modificado)"""
+    regras = {}
+    with open(caminho, encoding='utf-8', newline='') as f:
+        for linha in csv.DictReader(f):
+            status = linha['Status'].strip()
+            if status not in (STATUS_VAZIO, STATUS_OUTROS):
+                status = normalizar_status(status)
+            realizado = linha['Realizado'].strip().lower() in ('sim', 's', 'true', '1')
+            regras[status] = (linha['Status_Consolidado'].strip(), realizado)
+
+    for chave in (STATUS_VAZIO, STATUS_OUTROS):
+        if chave not in regras:
+            raise ValueError(f"A tabela de status {caminho} precisa de uma linha '{chave}'")
+    return regras
+
+
+def ler_tabela_status(caminho=None):
+    """
+    Lê as regras de status
+
+    Returns:
+        Dicionário {status normalizado: (status consolidado, realizado)},
+        incluindo as chaves STATUS_VAZIO e STATUS_OUTROS
+    """
+    caminho = caminho or TABELA_STATUS
+    return _ler_tabela(caminho, os.path.getmtime(caminho))
+
+
+def _mapear(serie, posicao, caminho=None):
+    """
+    Aplica um campo da regra (0 = consolidado, 1 = realizado) a cada linha da coluna
+
+    Returns:
+        Tupla (códigos por linha, resultado para cada código); o código -1
+        (status vazio) corresponde ao último item do resultado
+    """
+    regras = ler_tabela_status(caminho)
+
+    # Códigos por linha (-1 = vazio) e valores distintos da coluna; em colunas
+    # categóricas os códigos já existem
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos, valores = serie.cat.codes.to_numpy(), serie.cat.categories
+    else:
+        codigos, valores = pd.factorize(serie)
+
+    resultado_por_valor = [regras.get(normalizar_status(valor), regras[STATUS_OUTROS])[posicao]
+                           for valor in valores]
+    # O código -1 pega o último item: a regra de status vazio
+    resultado_por_valor.append(regras[STATUS_VAZIO][posicao])
+
+    return codigos, resultado_por_valor
+
+
+def consolidar_status(serie, caminho=None):
+    """
+    Status consolidado de cada linha (ex.: 'FALTOSO' -> 'Faltoso')
+
+    Args:
+        serie: Coluna Status
+        caminho: Tabela de regras (None usa TABELA_STATUS)
+
+    Returns:
+        Série categórica (categorias em ordem alfabética) com o mesmo índice
+    """
+    codigos, consolidados = _mapear(serie, 0, caminho)
+
+    # Montar a categoria direto pelos códigos, sem criar um texto por linha.
+    # Só entram as categorias que aparecem na coluna (posição 0 = código -1).
+    usados = np.bincount(codigos + 1, minlength=len(consolidados)) > 0
+    categorias = sorted({consolidado for consolidado, usado in zip(consolidados[-1:] + consolidados[:-1], usados)
+                         if usado})
+    codigo_categoria = np.array([categorias.index(consolidado) if consolidado in categorias else -1
+                                 for consolidado in consolidados])
+    return pd.Series(pd.Categorical.from_codes(codigo_categoria[codigos], categories=categorias),
+                     index=serie.index)
+
+
+def marcar_realizados(serie, caminho=None):
+    """
+    Indica, para cada linha, se o status conta como atendimento REALIZADO
+
+    Args:
+        serie: Coluna Status
+        caminho: Tabela de regras (None usa TABELA_STATUS)
+
+    Returns:
+        Série booleana com o mesmo índice da coluna
+    """
+    codigos, realizados = _mapear(serie, 1, caminho)
+    return pd.Series(np.array(realizados, dtype=bool)[codigos], index=serie.index)
+
+
+def listar_status(realizado=True, caminho=None):
+    """Status da tabela que contam (ou não, com realizado=False) como atendimento REALIZADO"""
+    return [status for status, (_, status_realizado) in ler_tabela_status(caminho).items()
+            if status_realizado == realizado and status not in (STATUS_VAZIO, STATUS_OUTROS)]
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Os módulos do projeto ficam na raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from carregamento import compactar_tipos  # noqa: E402
+
+PAPEIS = {'Médico ESF': 'Médico ESF', 'Técnico de Enfermagem ESF': 'Técnico ESF', 'Enfermeiro': 'Enfermeiro'}
+
+
+@pytest.fixture
+def atendimentos():
+    """Atendimentos sintéticos no formato consolidado, com valores vazios em algumas colunas"""
+    gerador = np.random.default_rng(7)
+    # Não múltiplo de 8: o último byte dos bitmaps fica incompleto
+    linhas = 403
+
+    def sortear(valores, vazios=0.0):
+        serie = pd.Series(gerador.choice(valores, size=linhas), dtype=object)
+        return serie.mask(gerador.random(linhas) < vazios)
+
+    especialidades = sortear(list(PAPEIS))
+    df = pd.DataFrame({
+        'Mês': sortear(['Março', 'Abril']),
+        'Dia': sortear([f'Dia {dia:02d}' for dia in (1, 2, 3, 10, 21)]),
+        'Profissional': sortear(['DR A', 'DR B', 'ENF C', 'TEC D'], vazios=0.05),
+        'Especialidade': especialidades,
+        'Papel': especialidades.map(PAPEIS),
+        'Status_Consolidado': sortear(['Atendimento realizado', 'Faltoso', 'Evadido'], vazios=0.05),
+        'Número Prontuário': sortear([str(numero) for numero in range(100, 160)], vazios=0.05),
+        'Paciente': sortear(['Ana', 'Bruno', 'Carla', 'Davi']),
+    })
+    df['Realizado'] = (df['Status_Consolidado'] == 'Atendimento realizado').to_numpy(dtype=bool)
+    return compactar_tipos(df)
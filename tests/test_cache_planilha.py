@@ -0,0 +1,81 @@
+import datetime
+import os
+
+import pandas as pd
+import pytest
+
+import cache_planilha
+from cache_planilha import calcular_hash, ler_cache, ler_cache_aba, salvar_cache, salvar_cache_aba
+from carregamento import carregar_planilha
+
+
+@pytest.fixture(autouse=True)
+def pasta_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_planilha, 'PASTA_CACHE', str(tmp_path))
+    monkeypatch.setattr(cache_planilha, 'PASTA_CACHE_ABAS', str(tmp_path / 'abas'))
+    return tmp_path / 'abas'
+
+
+def test_cache_de_aba_preserva_os_tipos(pasta_cache):
+    nomes = ['Número Prontuário', 'Data', 'Hora', 'Confirmado', 'Vazia', 'Mista', 7]
+    buffers = [
+        [123, '0789', None, 456.5],
+        [datetime.datetime(2024, 3, 1, 8, 30), None, 'ontem', datetime.datetime(2024, 3, 2)],
+        [datetime.time(8, 0), None, None, datetime.time(17, 45)],
+        [True, 'FALSE', False, None],
+        [None, None, None, None],
+        [1, True, '1', 1.5],
+        ['a', 'b', 'c', 'd'],
+    ]
+
+    assert salvar_cache_aba('abc', nomes, buffers)
+    lida_nomes, lidos = ler_cache_aba('abc')
+
+    assert lida_nomes == nomes
+    assert lidos == buffers
+    for lido, buffer in zip(lidos, buffers):
+        assert [type(valor) for valor in lido] == [type(valor) for valor in buffer]
+
+
+def test_aba_sem_colunas():
+    assert salvar_cache_aba('vazia', [], [])
+    assert ler_cache_aba('vazia') == ([], [])
+
+
+def test_arquivo_invalido_e_ignorado(pasta_cache):
+    assert ler_cache_aba('nao-existe') is None
+
+    pasta_cache.mkdir()
+    (pasta_cache / f'ruim_v{cache_planilha.VERSAO_CACHE}.arrow').write_bytes(b'\x80\x04conteudo qualquer')
+    assert ler_cache_aba('ruim') is None
+
+
+def test_valor_sem_tipo_arrow_nao_salva(pasta_cache):
+    assert not salvar_cache_aba('grande', ['Número'], [[2 ** 70, 1]])
+    assert ler_cache_aba('grande') is None
+    assert not pasta_cache.exists() or not list(pasta_cache.iterdir())
+
+
+def test_cache_consolidado_devolve_o_mes():
+    df = pd.DataFrame({'Número Prontuário': [1, 2], 'Dia': ['Dia 01', 'Dia 02']})
+
+    assert ler_cache('sem-cache') == (None, None, None)
+    assert salvar_cache('abc', df, ['Março', 'Dia 01', 'Dia 02'], 'Março')
+    df_cache, abas, mes = ler_cache('abc')
+
+    pd.testing.assert_frame_equal(df_cache, df)
+    assert abas == ['Março', 'Dia 01', 'Dia 02']
+    assert mes == 'Março'
+
+
+def test_carregar_planilha_usa_o_mes_do_cache():
+    # Conteúdo que não é um .xlsx: o resultado só pode vir do cache
+    conteudo = b'arquivo ja consolidado ' + os.urandom(8)
+    df = pd.DataFrame({'Número Prontuário': [1], 'Dia': ['Dia 01']})
+    salvar_cache(calcular_hash(conteudo), df, ['Dia 01'], None)
+
+    df_cache, abas, mes = carregar_planilha(conteudo)
+
+    pd.testing.assert_frame_equal(df_cache, df)
+    assert abas == ['Dia 01']
+    assert mes is None
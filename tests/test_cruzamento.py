@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from carregamento import adicionar_data_atendimento
+from cruzamento import marcar_encontrados, marcar_encontrados_janela, marcar_passou_pelo_tecnico
+
+CHAVES = ['Número Prontuário', 'Dia_Atendimento']
+
+
+def _vazio(valor):
+    return valor is None or valor is pd.NA or (isinstance(valor, float) and np.isnan(valor))
+
+
+def _encontrados_por_laco(origem, destino, chaves):
+    """Referência: procura cada linha de origem em todas as linhas de destino (== em cada chave)"""
+    linhas_destino = list(destino[chaves].itertuples(index=False, name=None))
+    return [
+        not any(_vazio(valor) for valor in linha) and any(
+            all(not _vazio(b) and a == b for a, b in zip(linha, outra)) for outra in linhas_destino
+        )
+        for linha in origem[chaves].itertuples(index=False, name=None)
+    ]
+
+
+def _atendimentos(prontuarios, dias, inicio_indice=0):
+    return pd.DataFrame({'Número Prontuário': prontuarios, 'Dia_Atendimento': dias},
+                        index=range(inicio_indice, inicio_indice + len(prontuarios)))
+
+
+CASOS = {
+    'chaves repetidas': (
+        _atendimentos([1, 1, 2, 2, 3, 4], ['Dia 01', 'Dia 01', 'Dia 02', 'Dia 03', 'Dia 01', 'Dia 05']),
+        _atendimentos([1, 1, 1, 2, 5], ['Dia 01', 'Dia 01', 'Dia 02', 'Dia 03', 'Dia 05']),
+    ),
+    'prontuário vazio': (
+        _atendimentos(pd.array([1, None, 2, None], dtype='Int64'), ['Dia 01', 'Dia 01', 'Dia 02', None]),
+        _atendimentos(pd.array([1, None, None, 2], dtype='Int64'), ['Dia 01', 'Dia 01', None, 'Dia 02']),
+    ),
+    'vazios em float e object': (
+        _atendimentos([1.0, np.nan, 3.0, None], ['Dia 01', 'Dia 01', np.nan, 'Dia 02']),
+        _atendimentos([np.nan, 1.0, 3.0, None], ['Dia 01', 'Dia 01', 'Dia 02', 'Dia 02']),
+    ),
+    'int e texto misturados': (
+        _atendimentos([123, '123', '0789', 789, 456, 456.0, 'abc'], ['Dia 01'] * 7),
+        _atendimentos(['123', 789, 456.0, 'ABC', None], ['Dia 01'] * 5),
+    ),
+    'tipos diferentes nas duas listas': (
+        _atendimentos([123, 789, 456], ['Dia 01', 'Dia 01', 'Dia 02']),
+        _atendimentos(['123', '789', 456], ['Dia 01', 'Dia 01', 'Dia 02']),
+    ),
+    'índices não sequenciais': (
+        _atendimentos([1, 2, 3], ['Dia 01', 'Dia 01', 'Dia 01'], inicio_indice=50),
+        _atendimentos([3, 1], ['Dia 01', 'Dia 02'], inicio_indice=7),
+    ),
+}
+
+
+@pytest.mark.parametrize('origem, destino', CASOS.values(), ids=CASOS.keys())
+def test_igual_ao_laco(origem, destino):
+    encontrados = marcar_encontrados(origem, destino, CHAVES)
+
+    assert encontrados.dtype == bool
+    assert encontrados.index.equals(origem.index)
+    assert encontrados.tolist() == _encontrados_por_laco(origem, destino, CHAVES)
+
+
+def test_aleatorio_igual_ao_laco():
+    gerador = np.random.default_rng(3)
+
+    def sortear(quantidade):
+        prontuarios = pd.Series(gerador.integers(1, 40, quantidade), dtype=object)
+        prontuarios[gerador.random(quantidade) < 0.05] = None
+        dias = pd.Series([f'Dia {dia:02d}' for dia in gerador.integers(1, 8, quantidade)], dtype=object)
+        return _atendimentos(prontuarios, dias)
+
+    origem, destino = sortear(300), sortear(200)
+    assert marcar_encontrados(origem, destino, CHAVES).tolist() == _encontrados_por_laco(origem, destino, CHAVES)
+
+
+def test_listas_vazias_ou_sem_chave():
+    origem = _atendimentos([1, 2], ['Dia 01', 'Dia 01'])
+
+    assert not marcar_encontrados(origem, origem.iloc[:0], CHAVES).any()
+    assert not marcar_encontrados(origem, origem[['Número Prontuário']], CHAVES).any()
+    assert marcar_encontrados(origem.iloc[:0], origem, CHAVES).empty
+
+
+def test_passou_pelo_tecnico_mesmo_dia():
+    medicos = _atendimentos([1, 2, 3], ['Dia 01', 'Dia 01', 'Dia 02'])
+    tecnicos = _atendimentos([1, 2, 3], ['Dia 01', 'Dia 02', 'Dia 02'])
+
+    assert marcar_passou_pelo_tecnico(medicos, tecnicos).tolist() == [True, False, True]
+
+
+# ========== JANELA DE DIAS (merge_asof) ==========
+
+def _encontrados_janela_por_laco(origem, destino, dias):
+    """Referência: algum destino do mesmo prontuário entre 0 e dias dias antes da origem"""
+    linhas_destino = list(destino[['Número Prontuário', 'Data_Atendimento']].itertuples(index=False, name=None))
+    return [
+        not _vazio(prontuario) and not _vazio(data) and any(
+            not _vazio(outro) and not _vazio(data_destino) and prontuario == outro and 0 <= data - data_destino <= dias
+            for outro, data_destino in linhas_destino
+        )
+        for prontuario, data in origem[['Número Prontuário', 'Data_Atendimento']].itertuples(index=False, name=None)
+    ]
+
+
+def _com_datas(prontuarios, datas, inicio_indice=0):
+    return pd.DataFrame({'Número Prontuário': prontuarios, 'Data_Atendimento': pd.array(datas, dtype='Int64')},
+                        index=range(inicio_indice, inicio_indice + len(prontuarios)))
+
+
+@pytest.mark.parametrize('dias, esperado', [
+    (0, [True, False, False, False, False]),
+    (2, [True, True, True, False, False]),
+    (3, [True, True, True, True, False]),
+])
+def test_bordas_da_janela(dias, esperado):
+    # Técnico nos dias 10 e 20; médicos no mesmo dia, 1, 2 e 3 dias depois e 1 dia antes do técnico
+    medicos = _com_datas([1, 1, 1, 2, 3], [10, 11, 12, 13, 19], inicio_indice=30)
+    tecnicos = _com_datas([1, 2, 3], [10, 10, 20])
+
+    encontrados = marcar_encontrados_janela(medicos, tecnicos, dias)
+
+    assert encontrados.index.equals(medicos.index)
+    assert encontrados.tolist() == esperado
+
+
+def test_janela_entre_meses():
+    # ANO_REFERENCIA é bissexto: 29 de fevereiro fica a 1 dia de 1º de março
+    def atendimentos(prontuarios, meses, dias):
+        df = pd.DataFrame({'Número Prontuário': prontuarios, 'Mês': meses, 'Dia': dias})
+        return adicionar_data_atendimento(df)
+
+    medicos = atendimentos([1, 2, 3, 4], ['Fevereiro', 'Março', 'Março', 'Janeiro'],
+                           ['Dia 01', 'Dia 01', 'Dia 01', 'Dia 31'])
+    tecnicos = atendimentos([1, 2, 3, 4], ['Janeiro', 'Fevereiro', 'Fevereiro', 'Fevereiro'],
+                            ['Dia 31', 'Dia 29', 'Dia 28', 'Dia 01'])
+
+    assert marcar_encontrados_janela(medicos, tecnicos, 1).tolist() == [True, True, False, False]
+    assert marcar_encontrados_janela(medicos, tecnicos, 2).tolist() == [True, True, True, False]
+
+
+def test_janela_com_data_ou_prontuario_vazio():
+    medicos = _com_datas(pd.array([1, 1, None, 2, 3], dtype='Int64'), [5, None, 5, 5, 5])
+    tecnicos = _com_datas(pd.array([1, None, 2, 3], dtype='Int64'), [5, 5, None, 4])
+
+    assert marcar_encontrados_janela(medicos, tecnicos, 1).tolist() == [True, False, False, False, True]
+    assert marcar_encontrados_janela(medicos, tecnicos, 1).tolist() == \
+        _encontrados_janela_por_laco(medicos, tecnicos, 1)
+
+
+@pytest.mark.parametrize('prontuarios_origem, prontuarios_destino', [
+    ([123, 789, 456], ['123', 789, 456.0]),
+    ([123, 789, 456], ['123', '789', '456']),
+    ([1.0, 2.0, 3.0], [1, 2, 5]),
+    (pd.array([1, 2, None], dtype='Int64'), [1, 2, 3]),
+], ids=['misturados', 'int e texto', 'float e int', 'Int64 e int64'])
+def test_janela_com_tipos_de_chave_diferentes(prontuarios_origem, prontuarios_destino):
+    medicos = _com_datas(prontuarios_origem, [5, 5, 5])
+    tecnicos = _com_datas(prontuarios_destino, [4, 4, 4])
+
+    assert marcar_encontrados_janela(medicos, tecnicos, 1).tolist() == \
+        _encontrados_janela_por_laco(medicos, tecnicos, 1)
+
+
+@pytest.mark.parametrize('dias', [0, 1, 3, 10])
+def test_janela_aleatoria_igual_ao_laco(dias):
+    gerador = np.random.default_rng(dias)
+
+    def sortear(quantidade):
+        datas = pd.array(gerador.integers(1, 60, quantidade), dtype='Int64')
+        datas[gerador.random(quantidade) < 0.05] = pd.NA
+        prontuarios = pd.array(gerador.integers(1, 30, quantidade), dtype='Int64')
+        prontuarios[gerador.random(quantidade) < 0.05] = pd.NA
+        return _com_datas(prontuarios, datas)
+
+    medicos, tecnicos = sortear(300), sortear(300)
+    assert marcar_encontrados_janela(medicos, tecnicos, dias).tolist() == \
+        _encontrados_janela_por_laco(medicos, tecnicos, dias)
+
+
+def test_janela_zero_igual_ao_mesmo_dia():
+    medicos = _com_datas([1, 2, 3, 3], [5, 5, 6, 7])
+    tecnicos = _com_datas([1, 2, 3], [5, 4, 7])
+    medicos['Dia_Atendimento'] = medicos['Data_Atendimento']
+    tecnicos['Dia_Atendimento'] = tecnicos['Data_Atendimento']
+
+    assert marcar_encontrados_janela(medicos, tecnicos, 0).tolist() == \
+        marcar_passou_pelo_tecnico(medicos, tecnicos).tolist()
+    assert marcar_passou_pelo_tecnico(medicos, tecnicos, janela_dias=2).tolist() == [True, True, False, True]
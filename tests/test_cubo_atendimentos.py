@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+from cubo_atendimentos import contar, filtrar_cubo, indicadores, montar_cubo
+
+FILTROS = {
+    'Profissional': ['DR A', 'ENF C', 'TEC D'],
+    'Status_Consolidado': ['Atendimento realizado', 'Faltoso'],
+    'Mês': ['Março'],
+}
+
+
+def _filtrar(df, filtros):
+    condicao = pd.Series(True, index=df.index)
+    for coluna, valores in filtros.items():
+        condicao &= df[coluna].isin(valores)
+    return df[condicao]
+
+
+@pytest.mark.parametrize('filtros', [{}, FILTROS])
+def test_contar_igual_ao_groupby(atendimentos, filtros):
+    cubo = filtrar_cubo(montar_cubo(atendimentos), filtros)
+    df = _filtrar(atendimentos, filtros)
+
+    assert contar(cubo) == len(df)
+    assert contar(cubo, Status_Consolidado='Faltoso') == int((df['Status_Consolidado'] == 'Faltoso').sum())
+    for por in ['Dia', 'Profissional', ['Dia', 'Status_Consolidado']]:
+        pd.testing.assert_series_equal(contar(cubo, por=por), df.groupby(por, observed=True).size(),
+                                       check_names=False, check_dtype=False)
+
+
+@pytest.mark.parametrize('filtros', [{}, FILTROS])
+def test_indicadores_igual_ao_groupby(atendimentos, filtros):
+    kpis = indicadores(filtrar_cubo(montar_cubo(atendimentos), filtros))
+    df = _filtrar(atendimentos, filtros)
+    por_status = df.groupby('Status_Consolidado', observed=True).size()
+
+    assert kpis['registros'] == len(df)
+    assert kpis['realizados'] == por_status.get('Atendimento realizado', 0)
+    assert kpis['faltosos'] == por_status.get('Faltoso', 0)
+    assert kpis['evadidos'] == por_status.get('Evadido', 0)
+    assert kpis['dias'] == df['Dia'].nunique()
+
+    cruzada = df.groupby(['Profissional', 'Status_Consolidado'], observed=True).size().unstack(fill_value=0)
+    por_profissional = kpis['por_profissional']
+    pd.testing.assert_frame_equal(por_profissional[list(cruzada.columns)], cruzada, check_names=False,
+                                  check_dtype=False, check_column_type=False, check_categorical=False)
+    pd.testing.assert_series_equal(por_profissional['Total'], df.groupby('Profissional', observed=True).size(),
+                                   check_names=False, check_dtype=False, check_categorical=False)
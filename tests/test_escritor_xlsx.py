@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+from escritor_xlsx import escrever_planilha, salvar_dados
+
+
+@pytest.fixture
+def dados():
+    return pd.DataFrame({
+        'Número Prontuário': [123, '0789', None] * 3,
+        'Paciente': ['Ana', 'Bruno', None] * 3,
+        'Idade': [30, 41.5, None] * 3,
+        'Realizado': [True, False, True] * 3,
+    })
+
+
+def test_parquet_com_coluna_de_tipos_mistos(dados, tmp_path):
+    caminho = salvar_dados(dados, str(tmp_path / 'dados.parquet'), tamanho_bloco=4)
+    lido = pd.read_parquet(caminho)
+
+    assert lido['Número Prontuário'].isna().tolist() == [False, False, True] * 3
+    assert lido['Número Prontuário'].dropna().tolist() == ['123', '0789'] * 3
+    pd.testing.assert_frame_equal(lido.drop(columns='Número Prontuário'), dados.drop(columns='Número Prontuário'),
+                                  check_dtype=False)
+
+
+def test_csv_igual_ao_to_csv(dados, tmp_path):
+    caminho = salvar_dados(dados, str(tmp_path / 'dados.csv'), tamanho_bloco=4)
+
+    with open(caminho, encoding='utf-8-sig') as f:
+        assert f.read() == dados.to_csv(index=False)
+
+
+def test_formato_invalido(dados, tmp_path):
+    with pytest.raises(ValueError):
+        salvar_dados(dados, str(tmp_path / 'dados.txt'))
+
+
+def test_planilha_com_aba_continuada(dados, tmp_path, monkeypatch):
+    monkeypatch.setattr('escritor_xlsx.LIMITE_LINHAS_EXCEL', 5)
+    caminho = escrever_planilha(str(tmp_path / 'saida.xlsx'), {'Atendimentos': dados}, tamanho_bloco=2)
+
+    wb = load_workbook(caminho, read_only=True)
+    assert wb.sheetnames == ['Atendimentos', 'Atendimentos (2)', 'Atendimentos (3)']
+    linhas = [linha for ws in wb for linha in list(ws.values)[1:]]
+    assert len(linhas) == len(dados)
+    assert linhas[1] == ('0789', 'Bruno', 41.5, False)
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from especialidades import (PAPEL_AGENTE_COMUNITARIO, PAPEL_DENTISTA, PAPEL_DENTISTA_ESF, PAPEL_ENFERMEIRO,
+                            PAPEL_ENFERMEIRO_ESF, PAPEL_MEDICO, PAPEL_MEDICO_ESF, PAPEL_SAUDE_BUCAL,
+                            PAPEL_TECNICO_ENFERMAGEM, PAPEL_TECNICO_ENFERMAGEM_ESF, classificar_especialidade,
+                            classificar_especialidades, normalizar_texto, papel_canonico)
+
+# Nomes como vêm nas exportações
+NOMES_EXPORTACAO = [
+    ('MÉDICO DA ESTRATÉGIA DE SAÚDE DA FAMÍLIA', PAPEL_MEDICO_ESF),
+    ('TÉCNICO DE ENFERMAGEM DA ESTRATÉGIA DE SAÚDE DA FAMÍLIA', PAPEL_TECNICO_ENFERMAGEM_ESF),
+    ('AUXILIAR DE ENFERMAGEM DA ESTRATÉGIA DE SAÚDE DA FAMÍLIA', PAPEL_TECNICO_ENFERMAGEM_ESF),
+    ('ENFERMEIRO DA ESTRATÉGIA DE SAÚDE DA FAMÍLIA', PAPEL_ENFERMEIRO_ESF),
+    ('CIRURGIÃO-DENTISTA DA ESTRATÉGIA DE SAÚDE DA FAMÍLIA', PAPEL_DENTISTA_ESF),
+    ('TÉCNICO EM SAÚDE BUCAL DA ESTRATÉGIA DE SAÚDE DA FAMÍLIA', PAPEL_SAUDE_BUCAL),
+    ('AUXILIAR EM SAÚDE BUCAL DA ESTRATÉGIA DE SAÚDE DA FAMÍLIA', PAPEL_SAUDE_BUCAL),
+    ('AGENTE COMUNITÁRIO DE SAÚDE', PAPEL_AGENTE_COMUNITARIO),
+    ('MÉDICO DE FAMÍLIA E COMUNIDADE', PAPEL_MEDICO_ESF),
+    ('MÉDICO CLÍNICO', PAPEL_MEDICO),
+    ('MÉDICO GINECOLOGISTA E OBSTETRA', PAPEL_MEDICO),
+    ('TÉCNICO DE ENFERMAGEM', PAPEL_TECNICO_ENFERMAGEM),
+    ('ENFERMEIRO', PAPEL_ENFERMEIRO),
+    ('CIRURGIÃO DENTISTA - CLÍNICO GERAL', PAPEL_DENTISTA),
+    ('Médico ESF', PAPEL_MEDICO_ESF),
+    ('Técnico de Enfermagem ESF', PAPEL_TECNICO_ENFERMAGEM_ESF),
+]
+
+# Mesma especialidade escrita de outras formas
+VARIACOES = [
+    'medico da estrategia de saude da familia',
+    'MEDICO DA ESTRATEGIA DE SAUDE DA FAMILIA',
+    '  Médico  da   Estratégia de Saúde da Família ',
+    'MÉDICO DA ESTRATÉGIA DE SAÚDE DA FAMÍLIA\t',
+    'Médico da Estratégia de Saúde da Família',
+    'médica da estratégia de saúde da família',
+]
+
+# Nomes parecidos que não podem virar Médico ESF (nem outro papel ESF)
+QUASE = [
+    ('TESTE DE ESFORÇO - MÉDICO', PAPEL_MEDICO),
+    ('MÉDICO DE TERAPIA FAMILIAR', PAPEL_MEDICO),
+    ('TÉCNICO DE ENFERMAGEM DO TRABALHO', PAPEL_TECNICO_ENFERMAGEM),
+    ('ENFERMEIRO OBSTÉTRICO', PAPEL_ENFERMEIRO),
+    ('ENFERMAGEM DA ESTRATÉGIA DE SAÚDE DA FAMÍLIA', 'ENFERMAGEM DA ESTRATÉGIA DE SAÚDE DA FAMÍLIA'),
+    ('PSICÓLOGO DA ESTRATÉGIA DE SAÚDE DA FAMÍLIA', 'PSICÓLOGO DA ESTRATÉGIA DE SAÚDE DA FAMÍLIA'),
+    ('TÉCNICO EM RADIOLOGIA', 'TÉCNICO EM RADIOLOGIA'),
+    ('  FARMACÊUTICO ', 'FARMACÊUTICO'),
+]
+
+
+@pytest.mark.parametrize('especialidade, papel', NOMES_EXPORTACAO)
+def test_nomes_da_exportacao(especialidade, papel):
+    assert classificar_especialidade(especialidade) == papel
+
+
+@pytest.mark.parametrize('especialidade', VARIACOES)
+def test_acentos_maiusculas_e_espacos(especialidade):
+    assert classificar_especialidade(especialidade) == PAPEL_MEDICO_ESF
+
+
+@pytest.mark.parametrize('especialidade, papel', QUASE)
+def test_nomes_parecidos_nao_casam(especialidade, papel):
+    assert classificar_especialidade(especialidade) == papel
+
+
+@pytest.mark.parametrize('vazio', [None, np.nan, pd.NA])
+def test_especialidade_vazia(vazio):
+    assert classificar_especialidade(vazio) is None
+
+
+def test_normalizar_texto():
+    assert normalizar_texto('  Cirurgião-Dentista   ESF ') == 'cirurgiao-dentista esf'
+    assert normalizar_texto(None) == ''
+
+
+def test_classificar_coluna_igual_a_cada_valor():
+    nomes = [nome for nome, _ in NOMES_EXPORTACAO + QUASE] + VARIACOES + [None]
+    serie = pd.Series(nomes * 3, index=range(100, 100 + 3 * len(nomes)))
+
+    for coluna in (serie, serie.astype('category')):
+        papeis = classificar_especialidades(coluna)
+        assert isinstance(papeis.dtype, pd.CategoricalDtype)
+        assert papeis.index.equals(serie.index)
+        assert papeis.astype(object).where(papeis.notna(), None).tolist() == [
+            classificar_especialidade(nome) for nome in serie
+        ]
+        assert list(papeis.cat.categories) == sorted(papeis.dropna().unique())
+
+
+def test_papel_canonico():
+    assert papel_canonico('medico esf') == PAPEL_MEDICO_ESF
+    assert papel_canonico(' TÉCNICO DE ENFERMAGEM ESF') == PAPEL_TECNICO_ENFERMAGEM_ESF
+    with pytest.raises(ValueError):
+        papel_canonico('Médico da Família')
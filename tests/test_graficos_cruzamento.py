@@ -0,0 +1,63 @@
+import json
+
+import pandas as pd
+import pytest
+
+from graficos_cruzamento import ARQUIVO_IMPRESSOES, NOME_CONSOLIDADO, NOME_PDF, gerar_graficos_por_medico
+
+
+def _estatisticas(medicos):
+    total = pd.Series([10 * (i + 1) for i in range(len(medicos))], index=medicos)
+    passou = total // 2
+    stats = pd.DataFrame({'Total_Atendimentos': total, 'Passou_Pelo_Tecnico': passou})
+    stats['Nao_Passou_Pelo_Tecnico'] = total - passou
+    stats['Percentual_Passou'] = (passou / total * 100).round(2)
+    stats['Percentual_Nao_Passou'] = 100 - stats['Percentual_Passou']
+    return stats
+
+
+def _impressoes(pasta):
+    return json.loads((pasta / ARQUIVO_IMPRESSOES).read_text(encoding='utf-8'))
+
+
+def _gerar(stats, pasta, formato='png'):
+    return gerar_graficos_por_medico(stats, str(pasta), dpi=20, formato=formato, workers=1)
+
+
+def test_graficos_mantidos_sem_alteracao(tmp_path):
+    stats = _estatisticas(['DR A', 'DR B'])
+    _gerar(stats, tmp_path)
+    datas = {caminho.name: caminho.stat().st_mtime_ns for caminho in tmp_path.glob('*.png')}
+
+    caminhos = _gerar(stats, tmp_path)
+
+    assert sorted(datas) == ['DR A.png', 'DR B.png', f'{NOME_CONSOLIDADO}.png']
+    assert len(caminhos) == 3
+    assert {caminho.name: caminho.stat().st_mtime_ns for caminho in tmp_path.glob('*.png')} == datas
+
+
+def test_medico_que_saiu_dos_dados_e_apagado(tmp_path):
+    _gerar(_estatisticas(['DR A', 'DR B', 'DR C']), tmp_path)
+    (tmp_path / 'anotacoes.txt').write_text('não é gráfico')
+
+    _gerar(_estatisticas(['DR A', 'DR C']), tmp_path)
+
+    assert sorted(caminho.name for caminho in tmp_path.glob('*.png')) == ['DR A.png', 'DR C.png',
+                                                                          f'{NOME_CONSOLIDADO}.png']
+    assert sorted(_impressoes(tmp_path)) == ['DR A.png', 'DR C.png', f'{NOME_CONSOLIDADO}.png']
+    # Arquivos que não foram gerados pelo módulo ficam
+    assert (tmp_path / 'anotacoes.txt').exists()
+
+
+@pytest.mark.parametrize('antes, depois', [('png', 'pdf'), ('pdf', 'svg')])
+def test_troca_de_formato_apaga_o_anterior(tmp_path, antes, depois):
+    stats = _estatisticas(['DR A'])
+    _gerar(stats, tmp_path, antes)
+
+    caminhos = _gerar(stats, tmp_path, depois)
+    esperados = [NOME_PDF] if depois == 'pdf' else [f'DR A.{depois}', f'{NOME_CONSOLIDADO}.{depois}']
+
+    assert sorted(caminho.name for caminho in tmp_path.iterdir() if caminho.name != ARQUIVO_IMPRESSOES) == \
+        sorted(esperados)
+    assert sorted(_impressoes(tmp_path)) == sorted(esperados)
+    assert len(caminhos) == len(esperados)
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from indice_filtros import IndiceFiltros
+
+
+def _mascara_isin(df, filtros):
+    condicao = pd.Series(True, index=df.index)
+    for coluna, valores in filtros.items():
+        condicao &= df[coluna].isin(valores)
+    return condicao.to_numpy()
+
+
+COMBINACOES = [
+    {},
+    # Poucos valores escolhidos: OU dos bitmaps escolhidos
+    {'Profissional': ['DR A']},
+    {'Profissional': ['DR B', 'TEC D'], 'Status_Consolidado': ['Faltoso']},
+    # Quase tudo escolhido: complemento (linhas com Profissional ou Status vazio não passam)
+    {'Profissional': ['DR A', 'DR B', 'ENF C'], 'Status_Consolidado': ['Atendimento realizado', 'Evadido']},
+    {'Dia': ['Dia 01', 'Dia 02', 'Dia 03', 'Dia 10'], 'Mês': ['Março', 'Abril'], 'Papel': ['Médico ESF']},
+    # Todos os valores escolhidos ou nenhum
+    {'Profissional': ['DR A', 'DR B', 'ENF C', 'TEC D']},
+    {'Status_Consolidado': []},
+    # Valor que não existe nos dados
+    {'Profissional': ['DR A', 'DR Z']},
+]
+
+
+@pytest.mark.parametrize('filtros', COMBINACOES)
+def test_posicoes_igual_a_mascara_isin(atendimentos, filtros):
+    indice = IndiceFiltros(atendimentos)
+    esperada = _mascara_isin(atendimentos, filtros)
+
+    np.testing.assert_array_equal(indice.mascara(filtros), esperada)
+    np.testing.assert_array_equal(indice.posicoes(filtros), np.flatnonzero(esperada))
+    assert indice.contar(filtros) == esperada.sum()
+    # A segunda consulta vem das combinações guardadas
+    np.testing.assert_array_equal(indice.posicoes(filtros), np.flatnonzero(esperada))
+
+
+def test_colunas_texto_com_vazios(atendimentos):
+    # Sem categorias (texto comum): os valores são codificados com pd.factorize
+    df = atendimentos.astype({'Profissional': object, 'Status_Consolidado': object})
+    indice = IndiceFiltros(df)
+    filtros = {'Profissional': ['DR A', 'DR B', 'ENF C'], 'Status_Consolidado': ['Faltoso']}
+
+    assert df['Profissional'].isna().any()
+    np.testing.assert_array_equal(indice.posicoes(filtros), np.flatnonzero(_mascara_isin(df, filtros)))
+
+
+def test_coluna_fora_do_indice(atendimentos):
+    indice = IndiceFiltros(atendimentos, colunas=['Dia'])
+
+    assert indice.linhas == len(atendimentos)
+    with pytest.raises(KeyError):
+        indice.posicoes({'Profissional': ['DR A']})
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from carregamento import adicionar_data_atendimento
+from indice_pacientes import COLUNA_PRONTUARIO, IndicePacientes
+
+
+def _posicoes_esperadas(df, prontuario):
+    """Filtro booleano do paciente, ordenado por dia (empates na ordem das linhas)"""
+    datas = adicionar_data_atendimento(df[['Dia', 'Mês']].copy())['Data_Atendimento']
+    mascara = (df[COLUNA_PRONTUARIO] == prontuario).fillna(False).to_numpy()
+    ordem = datas[mascara].reset_index(drop=True).sort_values(kind='stable', na_position='last').index
+    return np.flatnonzero(mascara)[ordem]
+
+
+def test_posicoes_paciente_igual_ao_filtro_ordenado_por_dia(atendimentos):
+    indice = IndicePacientes(atendimentos)
+
+    assert indice.linhas == len(atendimentos)
+    assert len(indice) == atendimentos[COLUNA_PRONTUARIO].nunique()
+    for prontuario in atendimentos[COLUNA_PRONTUARIO].dropna().unique():
+        np.testing.assert_array_equal(indice.posicoes_paciente(prontuario),
+                                      _posicoes_esperadas(atendimentos, prontuario))
+
+
+def test_prontuario_inexistente_ou_vazio(atendimentos):
+    indice = IndicePacientes(atendimentos)
+
+    assert len(indice.posicoes_paciente('999999')) == 0
+    assert len(indice.posicoes_paciente('abc')) == 0
+    # Linhas sem prontuário não pertencem a nenhum paciente
+    assert indice.atendimentos.sum() == atendimentos[COLUNA_PRONTUARIO].notna().sum()
+
+
+def test_resumo_e_faltosos_recorrentes(atendimentos):
+    indice = IndicePacientes(atendimentos)
+    resumo = indice.resumo()
+    grupos = atendimentos.groupby(COLUNA_PRONTUARIO)
+
+    assert resumo['Atendimentos'].to_dict() == grupos.size().to_dict()
+    assert resumo['Realizados'].to_dict() == grupos['Realizado'].sum().to_dict()
+    faltas = (atendimentos['Status_Consolidado'] == 'Faltoso').groupby(atendimentos[COLUNA_PRONTUARIO]).sum()
+    assert resumo['Faltas'].to_dict() == faltas.to_dict()
+
+    faltosos = indice.faltosos_recorrentes(minimo_faltas=3)
+    assert set(faltosos.index) == set(faltas[faltas >= 3].index)
+    assert faltosos['Faltas'].is_monotonic_decreasing
+
+
+def test_atendimentos_paciente_recusa_outro_dataframe(atendimentos):
+    indice = IndicePacientes(atendimentos)
+    prontuario = atendimentos[COLUNA_PRONTUARIO].dropna().iloc[0]
+
+    assert (indice.atendimentos_paciente(atendimentos, prontuario)[COLUNA_PRONTUARIO] == prontuario).all()
+    with pytest.raises(ValueError):
+        indice.atendimentos_paciente(atendimentos.iloc[:10], prontuario)
@@ -0,0 +1,80 @@
+import datetime
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+from leitor_xlsx import ler_planilha
+
+CABECALHO = ['Número Prontuário', 'Paciente', 'Idade', 'Valor', 'Confirmado', 'Data', 'Observação']
+
+ABAS = {
+    'Dia 01': [
+        [123, 'Ana', '45', 1.5, 'TRUE', datetime.datetime(2024, 3, 1), 'x'],
+        ['0789', 'Bruno', 30, '2.5', 'FALSE', None, 5],
+        [None, 'Carla', ' 7 ', 3, 'true', '2024-03-02', None],
+        ['456', 'NA', None, 4.0, 'False', None, 'y'],
+    ],
+    'Dia 02': [
+        ['789', 'Bruno', '31', '1e3', True, None, 'z'],
+        [123.0, 'Ana', 46, '', 'FALSE', datetime.datetime(2024, 3, 2), None],
+        ['0123', 'Davi', '-4', None, None, None, 7],
+    ],
+}
+
+
+@pytest.fixture
+def planilha(tmp_path):
+    """Planilha com texto numérico, booleanos em texto e colunas de tipos mistos"""
+    wb = Workbook()
+    wb.remove(wb.active)
+    mes = wb.create_sheet('Março')
+    mes['A1'] = datetime.datetime(2024, 3, 1)
+    for aba, linhas in ABAS.items():
+        ws = wb.create_sheet(aba)
+        ws.append(CABECALHO)
+        for linha in linhas:
+            ws.append(linha)
+    caminho = tmp_path / 'mes.xlsx'
+    wb.save(caminho)
+    return caminho
+
+
+def test_igual_ao_read_excel_por_aba(planilha):
+    df, abas, mes = ler_planilha(planilha, workers=1)
+    # pd.read_excel aba por aba e pd.concat, como o carregamento fazia antes do leitor em streaming
+    esperado = pd.concat([pd.read_excel(planilha, sheet_name=aba).assign(Dia=aba) for aba in ABAS],
+                         ignore_index=True)
+
+    assert mes == 'Março'
+    assert abas == ['Março', *ABAS]
+    pd.testing.assert_frame_equal(df, esperado)
+
+
+def test_prontuario_em_texto_vira_numero(planilha):
+    df, _, _ = ler_planilha(planilha, workers=1)
+    prontuarios = df['Número Prontuário']
+
+    assert pd.api.types.is_numeric_dtype(prontuarios)
+    # O mesmo paciente com prontuário em número e em texto ('0789' e '789')
+    assert (prontuarios == 789).sum() == 2
+    assert (prontuarios == 123).sum() == 3
+
+
+def test_leitura_paralela_igual(planilha):
+    sequencial, _, _ = ler_planilha(planilha, workers=1)
+    paralela, _, _ = ler_planilha(planilha, workers=2)
+
+    pd.testing.assert_frame_equal(paralela, sequencial)
+
+
+def test_leitura_do_cache_de_abas_igual(planilha, tmp_path, monkeypatch):
+    monkeypatch.setattr('cache_planilha.PASTA_CACHE_ABAS', str(tmp_path / 'abas'))
+    sem_cache, _, _ = ler_planilha(planilha, workers=1)
+    primeira, _, _ = ler_planilha(planilha, workers=1, usar_cache=True)
+    # A segunda leitura vem inteira do cache
+    segunda, _, _ = ler_planilha(planilha, workers=1, usar_cache=True)
+
+    assert len(list((tmp_path / 'abas').iterdir())) == len(ABAS)
+    pd.testing.assert_frame_equal(primeira, sem_cache)
+    pd.testing.assert_frame_equal(segunda, sem_cache)
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from status_atendimento import (STATUS_OUTROS, STATUS_VAZIO, consolidar_status, listar_status, ler_tabela_status,
+                                marcar_realizados, normalizar_status)
+
+TABELA = """Status,Status_Consolidado,Realizado
+ATENDIMENTO FINALIZADO,Atendimento realizado,sim
+ Faltoso ,Faltoso,não
+EVADIDO,Evadido,N
+(vazio),Não informado,não
+*,Outros,não
+"""
+
+STATUS = ['ATENDIMENTO FINALIZADO', '  atendimento finalizado ', 'Faltoso', 'faltoso\t', None, np.nan, '',
+          '   ', 'CANCELADO', 'evadido']
+CONSOLIDADOS = ['Atendimento realizado', 'Atendimento realizado', 'Faltoso', 'Faltoso', 'Não informado',
+                'Não informado', 'Não informado', 'Não informado', 'Outros', 'Evadido']
+REALIZADOS = [True, True, False, False, False, False, False, False, False, False]
+
+
+@pytest.fixture
+def tabela(tmp_path):
+    caminho = tmp_path / 'status.csv'
+    caminho.write_text(TABELA, encoding='utf-8')
+    return str(caminho)
+
+
+def _colunas():
+    serie = pd.Series(STATUS, index=range(50, 50 + len(STATUS)), dtype=object)
+    return [serie, serie.astype('category')]
+
+
+@pytest.mark.parametrize('serie', _colunas(), ids=['texto', 'categorica'])
+def test_consolidar_status(tabela, serie):
+    consolidados = consolidar_status(serie, tabela)
+
+    assert isinstance(consolidados.dtype, pd.CategoricalDtype)
+    assert consolidados.index.equals(serie.index)
+    assert consolidados.tolist() == CONSOLIDADOS
+    assert list(consolidados.cat.categories) == sorted(set(CONSOLIDADOS))
+
+
+@pytest.mark.parametrize('serie', _colunas(), ids=['texto', 'categorica'])
+def test_marcar_realizados(tabela, serie):
+    realizados = marcar_realizados(serie, tabela)
+
+    assert realizados.dtype == bool
+    assert realizados.index.equals(serie.index)
+    assert realizados.tolist() == REALIZADOS
+
+
+def test_status_desconhecido_usa_a_linha_asterisco(tabela):
+    serie = pd.Series(['REMARCADO', 'Em triagem'])
+
+    assert consolidar_status(serie, tabela).tolist() == ['Outros', 'Outros']
+    assert not marcar_realizados(serie, tabela).any()
+
+
+def test_coluna_so_com_vazios(tabela):
+    serie = pd.Series([None, np.nan, ''], dtype=object)
+
+    assert consolidar_status(serie, tabela).tolist() == ['Não informado'] * 3
+    assert list(consolidar_status(serie, tabela).cat.categories) == ['Não informado']
+    assert not marcar_realizados(serie, tabela).any()
+
+
+def test_normalizar_status():
+    assert normalizar_status('  Atendimento Finalizado ') == 'ATENDIMENTO FINALIZADO'
+    assert normalizar_status(None) == STATUS_VAZIO
+    assert normalizar_status(pd.NA) == STATUS_VAZIO
+    assert normalizar_status(' \t') == STATUS_VAZIO
+
+
+def test_ler_tabela(tabela):
+    regras = ler_tabela_status(tabela)
+
+    assert regras['FALTOSO'] == ('Faltoso', False)
+    assert regras[STATUS_OUTROS] == ('Outros', False)
+    assert listar_status(True, tabela) == ['ATENDIMENTO FINALIZADO']
+    assert listar_status(False, tabela) == ['FALTOSO', 'EVADIDO']
+
+
+def test_tabela_sem_linha_asterisco(tmp_path):
+    caminho = tmp_path / 'sem_outros.csv'
+    caminho.write_text('Status,Status_Consolidado,Realizado\n(vazio),Não informado,não\n', encoding='utf-8')
+
+    with pytest.raises(ValueError, match=r"\*"):
+        ler_tabela_status(str(caminho))
+
+
+def test_tabela_do_projeto():
+    serie = pd.Series(['Atendimento finalizado ', 'FALTOSO', None, 'desconhecido'])
+
+    assert consolidar_status(serie).tolist() == ['Atendimento realizado', 'Faltoso', 'Não informado',
+                                                 'Atendimento realizado']
+    assert marcar_realizados(serie).tolist() == [True, False, False, False]